@@ -1,5 +1,7 @@
 from pathlib import Path
+import json
 import sys
+import time
 
 import pandas as pd
 import streamlit as st
@@ -8,44 +10,167 @@ import streamlit as st
 # -------------------------------------------------------
 # Data loader
 # -------------------------------------------------------
-@st.cache_data
-def load_results():
+# The summary tables are answered from a small rollup cube of sums and
+# counts per (model_name, category) written by aggregate_results.py, so
+# render time does not grow with the number of raw result rows. Artifacts
+# are memory-mapped, only the columns a view shows are read, and the cache
+# is keyed on each file's mtime so a re-run pipeline shows up on the next
+# rerun without restarting the app.
+
+WORST_COLUMNS = [
+    "task_id",
+    "model_name",
+    "category",
+    "prompt",
+    "response",
+    "reference_answer",
+    "auto_correctness",
+    "is_toxic",
+    "is_refusal",
+]
+
+def artifact_path(name: str) -> Path:
     root = Path(__file__).resolve().parents[1]
-    artifacts_dir = root / "artifacts"
-    eval_path = artifacts_dir / "eval_results.parquet"
+    path = root / "artifacts" / name
 
-    if not eval_path.exists():
+    if not path.exists():
         raise FileNotFoundError(
-            f"Could not find {eval_path}. Make sure you've run the evaluation pipeline "
-            "and generated eval_results.parquet."
+            f"Could not find {path}. Make sure you've run the evaluation pipeline "
+            "(including aggregate_results.py) to generate it."
+        )
+    return path
+
+
+@st.cache_data(max_entries=32)
+def _read_artifact(name: str, mtime_ns: int, columns) -> pd.DataFrame:
+    import pyarrow.parquet as pq
+
+    path = artifact_path(name)
+    if columns is not None:
+        available = set(pq.read_schema(path).names)
+        columns = [c for c in columns if c in available]
+    return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+
+def read_artifact(name: str, columns=None) -> pd.DataFrame:
+    """An artifact (only `columns`, if given), re-read whenever the file changes."""
+    mtime_ns = artifact_path(name).stat().st_mtime_ns
+    return _read_artifact(name, mtime_ns, tuple(columns) if columns is not None else None)
+
+
+def load_rollup() -> pd.DataFrame:
+    return read_artifact("eval_rollup.parquet")
+
+
+def load_worst() -> pd.DataFrame:
+    return read_artifact("eval_worst.parquet", WORST_COLUMNS)
+
+
+def rollup_means(cube: pd.DataFrame, metrics: list) -> pd.DataFrame:
+    """Per-model means of `metrics` over the (already filtered) cube rows."""
+    metrics = [m for m in metrics if f"{m}_sum" in cube.columns]
+    totals = cube.groupby("model_name")[[f"{m}_{part}" for m in metrics for part in ("sum", "count")]].sum()
+
+    means = pd.DataFrame(index=totals.index)
+    for m in metrics:
+        means[m] = totals[f"{m}_sum"] / totals[f"{m}_count"].where(totals[f"{m}_count"] > 0)
+    return means.reset_index()
+
+
+def load_comparisons():
+    # written by aggregate_results.py; older artifact sets may not have them
+    try:
+        return read_artifact("eval_ci.parquet"), read_artifact("eval_pairwise.parquet")
+    except FileNotFoundError:
+        return None, None
+
+
+def load_agreement():
+    # inter-annotator agreement, written by aggregate_results.py
+    try:
+        return read_artifact("eval_agreement.parquet")
+    except FileNotFoundError:
+        return None
+
+
+@st.cache_data(max_entries=8)
+def _read_job_metrics(files) -> list:
+    jobs = []
+    for path, _ in files:
+        try:
+            jobs.append(json.loads(Path(path).read_text())["otherData"])
+        except (OSError, ValueError, KeyError):
+            continue
+    return jobs
+
+
+def load_job_metrics():
+    """otherData of every data/metrics/<job>.trace.json written by the pipeline scripts."""
+    root = Path(__file__).resolve().parents[1]
+    paths = sorted((root / "data" / "metrics").glob("*.trace.json"))
+    return _read_job_metrics(tuple((str(path), path.stat().st_mtime_ns) for path in paths))
+
+
+def latency_table(histograms: list) -> pd.DataFrame:
+    """One row per (histogram, model) with count, mean and p50/p95 in ms."""
+    from instrumentation import histogram_quantile
+
+    rows = []
+    for hist in histograms:
+        if not hist["count"]:
+            continue
+        rows.append(
+            {
+                "metric": hist["name"],
+                "model_name": hist["labels"].get("model", ""),
+                "count": hist["count"],
+                "mean_ms": 1000 * hist["sum"] / hist["count"],
+                "p50_ms": 1000 * histogram_quantile(hist, 0.5),
+                "p95_ms": 1000 * histogram_quantile(hist, 0.95),
+            }
         )
+    return pd.DataFrame(rows)
+
 
-    return pd.read_parquet(eval_path)
+@st.cache_resource
+def get_response_cache():
+    # imported lazily: src/ is put on sys.path by main()
+    from response_cache import ResponseCache
+
+    root = Path(__file__).resolve().parents[1]
+    return ResponseCache(root / "data" / "cache" / "responses.sqlite")
 
 
 # -------------------------------------------------------
 # Main app
 # -------------------------------------------------------
 def main():
+    # Ensure project root is on sys.path so `src.*` imports work under Streamlit,
+    # and src/ itself so modules in src can import each other
+    ROOT = Path(__file__).resolve().parents[1]
+    for path in (ROOT, ROOT / "src"):
+        if str(path) not in sys.path:
+            sys.path.append(str(path))
+
     st.title("LLM Evaluation Dashboard")
 
-    # Load evaluation results
-    df = load_results()
+    # Load the rollup cube (one row per model/category)
+    cube = load_rollup()
 
     # -------------------------------
     # Sidebar Filters
     # -------------------------------
     st.sidebar.header("Filters")
 
-    models = sorted(df["model_name"].unique().tolist())
+    models = sorted(cube["model_name"].dropna().unique().tolist())
     selected_models = st.sidebar.multiselect("Models", models, default=models)
 
-    categories = sorted(df["category"].unique().tolist())
+    categories = sorted(cube["category"].dropna().unique().tolist())
     selected_categories = st.sidebar.multiselect("Categories", categories, default=categories)
 
-    filtered = df[
-        df["model_name"].isin(selected_models)
-        & df["category"].isin(selected_categories)
+    filtered = cube[
+        cube["model_name"].isin(selected_models)
+        & cube["category"].isin(selected_categories)
     ]
 
     # -------------------------------
@@ -53,38 +178,64 @@ def main():
     # -------------------------------
     st.subheader("Overall Model Performance (Automatic Correctness)")
 
-    agg_auto = (
-        filtered.groupby("model_name")["auto_correctness"]
-        .mean()
-        .reset_index()
-        .sort_values("auto_correctness", ascending=False)
-    )
+    agg_auto = rollup_means(filtered, ["auto_correctness"]).sort_values("auto_correctness", ascending=False)
     st.dataframe(agg_auto, use_container_width=True)
 
+    # -------------------------------
+    # Confidence Intervals & Significance
+    # -------------------------------
+    intervals, pairwise = load_comparisons()
+    if intervals is not None and not intervals.empty:
+        st.subheader("Model Comparison (95% bootstrap CI, paired by task)")
+
+        st.dataframe(
+            intervals[intervals["model_name"].isin(selected_models) & intervals["category"].isin(selected_categories)],
+            use_container_width=True,
+        )
+        st.dataframe(
+            pairwise[
+                pairwise["model_a"].isin(selected_models)
+                & pairwise["model_b"].isin(selected_models)
+                & pairwise["category"].isin(selected_categories)
+            ],
+            use_container_width=True,
+        )
+
+    # -------------------------------
+    # Summarization Metrics
+    # -------------------------------
+    if "rougeL_count" in filtered.columns and filtered["rougeL_count"].sum() > 0:
+        st.subheader("Summarization Metrics (ROUGE / BLEU / TF-IDF similarity)")
+
+        summary_stats = rollup_means(filtered, ["rouge1", "rouge2", "rougeL", "bleu", "semantic_similarity"])
+        st.dataframe(summary_stats.dropna(subset=["rougeL"]), use_container_width=True)
+
     # -------------------------------
     # Guardrail Violations
     # -------------------------------
     st.subheader("Guardrail Violations")
 
-    guardrail_stats = (
-        filtered.groupby("model_name")[["is_toxic", "is_refusal"]]
-        .mean()
-        .reset_index()
-    )
+    guardrail_stats = rollup_means(filtered, ["is_toxic", "is_refusal"])
     st.dataframe(guardrail_stats, use_container_width=True)
 
     # -------------------------------
     # Human Centered Metrics (optional)
     # -------------------------------
-    if "correctness_human" in filtered.columns and filtered["correctness_human"].notna().any():
+    if "correctness_human_count" in filtered.columns and filtered["correctness_human_count"].sum() > 0:
         st.subheader("Human-Centered Metrics (if available)")
 
-        human_stats = (
-            filtered.groupby("model_name")[["helpfulness", "correctness_human", "safety_human"]]
-            .mean()
-            .reset_index()
-        )
+        human_stats = rollup_means(filtered, ["helpfulness", "correctness_human", "safety_human"])
         st.dataframe(human_stats, use_container_width=True)
+
+        # labels are averaged per answer; alpha shows how far annotators agree on answers labeled twice or more
+        agreement = load_agreement()
+        if agreement is not None and not agreement.empty:
+            st.caption("Inter-annotator agreement (Krippendorff's alpha)")
+            shown = agreement[agreement["model_name"].isin([*selected_models, "(all)"])]
+            st.dataframe(
+                shown.pivot(index="model_name", columns="metric", values="alpha").reset_index(),
+                use_container_width=True,
+            )
     else:
         st.info(
             "No human labels found yet. Add some via the Gradio UI to see human-centered metrics."
@@ -95,23 +246,43 @@ def main():
     # -------------------------------
     st.subheader("Worst Examples by Automatic Correctness")
 
-    worst = filtered.sort_values("auto_correctness").head(5)
-    st.dataframe(
-        worst[
+    # precomputed per model/category, so the overall worst 5 are among them
+    worst = load_worst()
+    worst = (
+        worst[worst["model_name"].isin(selected_models) & worst["category"].isin(selected_categories)]
+        .sort_values("auto_correctness", kind="stable")
+        .head(5)
+    )
+    st.dataframe(worst[[c for c in WORST_COLUMNS if c in worst.columns]], use_container_width=True)
+
+    # -------------------------------
+    # Pipeline Metrics
+    # -------------------------------
+    jobs = load_job_metrics()
+    if jobs:
+        st.subheader("Pipeline Metrics (last run of each script)")
+
+        stages = pd.DataFrame(
             [
-                "task_id",
-                "model_name",
-                "category",
-                "prompt",
-                "response",
-                "reference_answer",
-                "auto_correctness",
-                "is_toxic",
-                "is_refusal",
+                {
+                    "job": job["job"],
+                    "span": name,
+                    "seconds": totals["seconds"],
+                    "calls": totals["calls"],
+                    "rows": totals["rows"],
+                    "rows_per_sec": totals["rows"] / totals["seconds"] if totals["rows"] and totals["seconds"] else None,
+                    "job_peak_rss_mb": job["peak_rss_bytes"] / 2**20 if job.get("peak_rss_bytes") else None,
+                    "finished_at": job["finished_at"],
+                }
+                for job in jobs
+                for name, totals in job["spans"].items()
             ]
-        ],
-        use_container_width=True,
-    )
+        )
+        st.dataframe(stages, use_container_width=True)
+
+        latencies = latency_table([hist for job in jobs for hist in job["histograms"]])
+        if not latencies.empty:
+            st.dataframe(latencies, use_container_width=True)
 
     # =======================================================
     # LLM Playground (Interactive Chat)
@@ -119,18 +290,17 @@ def main():
     st.divider()
     st.header("🗣️ LLM Playground")
 
-    # Ensure project root is on sys.path so `src.*` imports work under Streamlit
-    ROOT = Path(__file__).resolve().parents[1]
-    if str(ROOT) not in sys.path:
-        sys.path.append(str(ROOT))
-
     # Import AFTER sys.path adjustment
-    from src.chat_models import generate_response
+    from chat_models import available_models, batcher_stats, generate_response, get_batcher, stream_response
+    from guardrails import StreamGuard, guard_stream
+    from instrumentation import REGISTRY
 
+    # dummy models, plus http:<model> ones when MODEL_ENDPOINT_URL is set
+    model_options = available_models()
     model_choice = st.selectbox(
         "Choose a model",
-        options=["llama3_dummy", "mistral_dummy", "gpt4_dummy"],
-        index=2,
+        options=model_options,
+        index=model_options.index("gpt4_dummy") if "gpt4_dummy" in model_options else 0,
     )
 
     user_prompt = st.text_area(
@@ -139,15 +309,60 @@ def main():
         height=120,
     )
 
+    # shared by every session of this server, so simultaneous clicks go out as one backend call
+    batched = st.checkbox(
+        "Micro-batch with concurrent requests (no streaming)",
+        help="Waits up to 10 ms to send this prompt together with other users' prompts to the same model.",
+    )
+
     if st.button("Generate Answer"):
         if not user_prompt.strip():
             st.warning("Please enter a prompt.")
-        else:
-            with st.spinner(f"Generating response with {model_choice}..."):
-                answer = generate_response(model_choice, user_prompt)
-
+        elif batched:
+            start = time.perf_counter()
+            answer = generate_response(model_choice, user_prompt, cache=get_response_cache(), batcher=get_batcher())
             st.subheader("Model Output")
             st.write(answer)
+            st.caption(f"Full response: {1000 * (time.perf_counter() - start):.1f} ms")
+        else:
+            st.subheader("Model Output")
+            output = st.empty()
+
+            # render chunks as the provider streams them; the guard stops the
+            # stream (and the generation behind it) at a toxic or refusal match
+            start = time.perf_counter()
+            first_token = None
+            answer = ""
+            guard = StreamGuard()
+            chunks = stream_response(model_choice, user_prompt, cache=get_response_cache())
+            for chunk in guard_stream(chunks, guard):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                answer += chunk
+                output.markdown(answer + "▌")
+            output.markdown(answer)
+            if guard.stopped:
+                matches = ", ".join(f"{name}: '{match}'" for name, match in guard.matches.items() if match)
+                st.warning(f"Generation stopped by the guardrails after {guard.tokens} chunks ({matches}).")
+
+            total = time.perf_counter() - start
+            st.caption(
+                f"Time to first token: {1000 * (first_token or total):.1f} ms · full response: {1000 * total:.1f} ms"
+            )
+
+    # latencies of the playground calls served by this dashboard process
+    playground = latency_table(
+        [{"name": name, "labels": dict(labels), **hist} for (name, labels), hist in REGISTRY.histograms.items()]
+    )
+    if not playground.empty:
+        st.caption("Playground latency (this server)")
+        st.dataframe(playground, use_container_width=True)
+
+    # only if the playground has batched anything; reading must not create the batcher
+    batch_stats = batcher_stats()
+    if batch_stats:
+        st.caption("Micro-batching (this server)")
+        st.dataframe(pd.DataFrame.from_dict(batch_stats, orient="index"), use_container_width=True)
 
 
 if __name__ == "__main__":
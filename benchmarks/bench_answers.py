@@ -0,0 +1,103 @@
+"""
+Numeric answer extraction over free-text math responses: the batch
+extractor (one regex pass in Arrow, NumPy scoring) against parse_answer
+row by row, and the old bare-float() scorer against the new one.
+
+Responses mix bare numbers with sentences such as "The answer is 8
+apples.", thousands commas, fractions and units.
+
+    python benchmarks/bench_answers.py --rows 2000000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+from answer_extraction import extract_answers, parse_answer  # noqa: E402
+from scoring_rubric import batch_math_reasoning  # noqa: E402
+
+TEMPLATES = [
+    "{n}",
+    " {n} ",
+    "The answer is {n} apples.",
+    "It takes {n} hours.",
+    "After selling some, {a} - {b} leaves {n} cookies in total.",
+    "Step 1: {a} + {b} = {c}.\nStep 2: so the final answer is {n}",
+    "Total: ${c:,} or roughly {n} per person",
+    "{a}/{b} of the distance, i.e. {n} km",
+    "I'm not sure.",
+]
+
+
+def build_responses(n_rows: int, seed: int = 0) -> tuple:
+    """(responses, reference answers): the last number of every response is its answer."""
+    rng = np.random.default_rng(seed)
+    # whole numbers and one or two decimals
+    scale = 10.0 ** rng.integers(0, 3, n_rows)
+    answers = np.round(rng.uniform(0, 10_000, n_rows) * scale) / scale
+    a = rng.integers(1, 100, n_rows)
+    b = rng.integers(1, 100, n_rows)
+    c = rng.integers(1_000, 1_000_000, n_rows)
+    which = rng.integers(0, len(TEMPLATES), n_rows)
+    responses = np.empty(n_rows, dtype=object)
+    for t, template in enumerate(TEMPLATES):
+        rows = np.flatnonzero(which == t)
+        responses[rows] = [
+            template.format(n=f"{n:g}", a=x, b=y, c=z) for n, x, y, z in zip(answers[rows], a[rows], b[rows], c[rows])
+        ]
+    refs = pd.Series([f"{n:g}" for n in answers])
+    return pd.Series(responses), refs
+
+
+def legacy_score(pred: str, ref: str) -> float:
+    """The scorer before answer extraction: anything but a bare number scored 0."""
+    try:
+        pred_val = float(pred.strip())
+        ref_val = float(ref.strip())
+        if abs(pred_val - ref_val) < 1e-3:
+            return 1.0
+        diff = abs(pred_val - ref_val)
+        return max(0.0, 1.0 - diff / max(1.0, abs(ref_val)))
+    except Exception:
+        return 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--sample", type=int, default=200_000, help="rows for the row-by-row comparison")
+    args = parser.parse_args()
+
+    responses, refs = build_responses(args.rows)
+    print(f"responses: {len(responses):,}")
+
+    start = time.perf_counter()
+    values = extract_answers(responses)
+    batch_s = time.perf_counter() - start
+    start = time.perf_counter()
+    scores = batch_math_reasoning(responses, refs)
+    score_s = time.perf_counter() - start
+
+    sample = min(args.sample, len(responses))
+    start = time.perf_counter()
+    row_values = np.array([parse_answer(text) for text in responses.iloc[:sample]])
+    row_s = (time.perf_counter() - start) * len(responses) / sample
+    if not np.array_equal(values[:sample], row_values, equal_nan=True):
+        raise SystemExit("extract_answers differs from parse_answer")
+    legacy = np.array([legacy_score(p, r) for p, r in zip(responses.iloc[:sample], refs.iloc[:sample])])
+
+    print(f"extract (batch):        {batch_s:8.2f}s ({len(responses) / batch_s:,.0f} rows/s)")
+    print(f"extract (row by row):   {row_s:8.2f}s (extrapolated from {sample:,} rows)")
+    print(f"speedup:                {row_s / batch_s:8.1f}x")
+    print(f"extract + score:        {score_s:8.2f}s")
+    print(f"full credit, bare float(): {np.mean(legacy == 1.0):6.1%} of {sample:,} rows")
+    print(f"full credit, extracted:    {np.mean(scores[:sample] == 1.0):6.1%}")
+
+
+if __name__ == "__main__":
+    main()
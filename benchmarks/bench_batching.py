@@ -0,0 +1,65 @@
+"""
+Concurrent playground requests against a local stub server, one HTTP
+call per prompt versus micro-batched through chat_models.get_batcher().
+
+    python benchmarks/bench_batching.py --callers 64 --requests 20 --latency-ms 20
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+from batching import MicroBatcher  # noqa: E402
+from chat_models import DUMMY_MODELS, generate_batch, generate_response, register_http_models  # noqa: E402
+from stub_model_server import start_in_background  # noqa: E402
+
+
+def run(callers: int, requests: int, model: str, batcher=None) -> float:
+    def caller(c: int):
+        for r in range(requests):
+            prompt = f"caller {c} question {r}"
+            if generate_response(model, prompt, batcher=batcher) != DUMMY_MODELS["gpt4_dummy"](prompt):
+                raise SystemExit("wrong answer returned to a caller")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(callers) as pool:
+        list(pool.map(caller, range(callers)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--callers", type=int, default=64, help="concurrent callers")
+    parser.add_argument("--requests", type=int, default=20, help="prompts per caller")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="stub server delay per HTTP call")
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server, base_url = start_in_background(latency_ms=args.latency_ms)
+    model = register_http_models(base_url, ["gpt4_dummy"])[0]
+    total = args.callers * args.requests
+
+    unbatched = run(args.callers, args.requests, model)
+    print(f"unbatched: {unbatched:.2f}s ({total / unbatched:,.0f} requests/s)")
+
+    batcher = MicroBatcher(generate_batch, args.max_batch_size, args.max_wait_ms)
+    batched = run(args.callers, args.requests, model, batcher)
+    print(f"batched:   {batched:.2f}s ({total / batched:,.0f} requests/s), {unbatched / batched:.1f}x")
+    for name, stats in batcher.stats().items():
+        print(
+            f"  {name}: {stats['batches']} batches, mean size {stats['mean_batch_size']:.1f} "
+            f"(max {stats['max_batch_size']}), queue delay mean {stats['mean_queue_ms']:.2f} ms "
+            f"p95 {stats['p95_queue_ms']:.2f} ms"
+        )
+    print("every caller got its own answer")
+
+    batcher.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
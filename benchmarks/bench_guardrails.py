@@ -0,0 +1,87 @@
+"""
+Benchmark the compiled guardrail matcher against the original
+per-pattern substring scan.
+
+    python benchmarks/bench_guardrails.py --rows 1000000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+from guardrails import REFUSAL_PATTERNS, TOXIC_KEYWORDS, apply_guardrails  # noqa: E402
+
+
+# --- Original implementation (kept here for comparison) ---------
+
+def legacy_detect_toxicity(text: str) -> int:
+    text_l = (text or "").lower()
+    return int(any(word in text_l for word in TOXIC_KEYWORDS))
+
+
+def legacy_detect_refusal(text: str) -> int:
+    text_l = (text or "").lower()
+    return int(any(p in text_l for p in REFUSAL_PATTERNS))
+
+
+def legacy_guardrails(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["is_toxic"] = df["response"].apply(legacy_detect_toxicity)
+    df["is_refusal"] = df["response"].apply(legacy_detect_refusal)
+    return df
+
+
+# --- Synthetic responses ----------------------------------------
+
+FILLER = (
+    "Company revenue increased by 20% due to cloud demand, but higher costs reduced profit margins. "
+    "Overall, this has various implications for stakeholders."
+).split()
+
+
+def build_responses(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = random.Random(seed)
+    responses = []
+    for _ in range(n_rows):
+        words = rng.choices(FILLER, k=rng.randint(5, 40))
+        roll = rng.random()
+        if roll < 0.05:
+            words.insert(rng.randrange(len(words)), rng.choice(TOXIC_KEYWORDS).upper())
+        elif roll < 0.08:
+            words.insert(0, rng.choice(REFUSAL_PATTERNS).capitalize() + ".")
+        responses.append(" ".join(words))
+    return pd.DataFrame({"response": responses})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    df = build_responses(args.rows)
+
+    start = time.perf_counter()
+    legacy = legacy_guardrails(df)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled = apply_guardrails(df)
+    compiled_s = time.perf_counter() - start
+
+    for col in ["is_toxic", "is_refusal"]:
+        if not (legacy[col].to_numpy() == compiled[col].to_numpy()).all():
+            raise AssertionError(f"{col} differs between legacy and compiled matcher")
+
+    print(f"rows:     {args.rows:,}")
+    print(f"legacy:   {legacy_s:.2f}s ({args.rows / legacy_s:,.0f} rows/s)")
+    print(f"compiled: {compiled_s:.2f}s ({args.rows / compiled_s:,.0f} rows/s)")
+    print(f"speedup:  {legacy_s / compiled_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
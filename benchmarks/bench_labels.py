@@ -0,0 +1,92 @@
+"""
+Join human labels onto the auto scores raw (one row per label, the old
+behaviour) against reduced to one row per (task_id, model_name) first.
+
+Labels a share of the answers several times each, then reports the rows
+and mean human correctness each join gives, and the time to reduce the
+labels and compute inter-annotator agreement.
+
+    python benchmarks/bench_labels.py --rows 1000000 --labeled 0.2 --max-labels 5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+import schema  # noqa: E402
+from aggregate_results import merge_labels  # noqa: E402
+from label_reduction import agreement  # noqa: E402
+
+
+def build_frames(rows: int, labeled: float, max_labels: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    models = np.array(["gpt4_dummy", "llama3_dummy", "mistral_dummy"])
+    auto = schema.compact(
+        pd.DataFrame(
+            {
+                "task_id": (np.arange(rows) // len(models)).astype(str),
+                "model_name": models[np.arange(rows) % len(models)],
+                "category": "qa",
+                "auto_correctness": rng.random(rows),
+            }
+        )
+    )
+    pairs = rng.choice(rows, int(rows * labeled), replace=False)
+    # harder answers get more labels (disputed ones are sent back to annotators)
+    per_pair = 1 + rng.binomial(max_labels - 1, 1 - auto["auto_correctness"].to_numpy()[pairs])
+    which = np.repeat(pairs, per_pair)
+    quality = np.clip(np.round(auto["auto_correctness"].to_numpy()[which] * 5 + rng.normal(0, 0.7, len(which))), 0, 5)
+    labels = pd.DataFrame(
+        {
+            "task_id": auto["task_id"].to_numpy()[which],
+            "model_name": auto["model_name"].to_numpy()[which],
+            "is_best": rng.integers(0, 2, len(which)),
+            "helpfulness": quality,
+            "correctness_human": quality,
+            "safety_human": rng.integers(4, 6, len(which)).astype(float),
+            "comments": "",
+        }
+    )
+    return auto, labels
+
+
+def raw_join(auto: pd.DataFrame, labels: pd.DataFrame) -> pd.DataFrame:
+    return auto.merge(schema.align_keys(schema.compact(labels), auto), on=["task_id", "model_name"], how="left")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="auto-score rows")
+    parser.add_argument("--labeled", type=float, default=0.2, help="share of answers with human labels")
+    parser.add_argument("--max-labels", type=int, default=5, help="labels per labeled answer: 1..this")
+    args = parser.parse_args()
+
+    auto, labels = build_frames(args.rows, args.labeled, args.max_labels)
+    print(f"{len(auto):,} auto-score rows, {len(labels):,} labels")
+
+    start = time.perf_counter()
+    raw = raw_join(auto, labels)
+    raw_s = time.perf_counter() - start
+    start = time.perf_counter()
+    reduced = merge_labels(auto, labels)
+    reduced_s = time.perf_counter() - start
+    start = time.perf_counter()
+    alpha = agreement(labels)
+    agreement_s = time.perf_counter() - start
+
+    print(f"{'join':<22} {'rows':>12} {'correctness_human':>18} {'seconds':>8}")
+    for name, df, seconds in [("raw labels", raw, raw_s), ("reduced per pair", reduced, reduced_s)]:
+        print(f"{name:<22} {len(df):>12,} {df['correctness_human'].mean():>18.4f} {seconds:>8.2f}")
+    print(f"agreement over {len(labels):,} labels: {agreement_s:.2f}s")
+    print(alpha[alpha["model_name"] == "(all)"].to_string(index=False))
+    if len(reduced) != len(auto):
+        raise SystemExit("reduced join changed the number of auto-score rows")
+
+
+if __name__ == "__main__":
+    main()
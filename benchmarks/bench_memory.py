@@ -0,0 +1,108 @@
+"""
+Memory of the scored frames with default CSV dtypes and task text on every
+row (the old layout) against the compact schema.py layout.
+
+Scores N tasks x M models, then loads the guardrail-checked scores both
+ways and compares their deep in-memory size per column group, and the
+size of the aggregate frame (scores merged with human labels).
+
+    python benchmarks/bench_memory.py --tasks 400000 --models 3
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+import schema  # noqa: E402
+from generate_tasks import build_tasks  # noqa: E402
+from guardrails import apply_guardrails_incremental  # noqa: E402
+from run_models import generate_outputs_for_model, model_configs  # noqa: E402
+from scoring_rubric import apply_rubric_incremental  # noqa: E402
+
+GROUPS = {
+    "keys": schema.KEY_COLUMNS,
+    "task text": schema.TASK_TEXT_COLUMNS,
+    "other text": [c for c in schema.TEXT_COLUMNS if c not in schema.TASK_TEXT_COLUMNS],
+    "flags": schema.FLAG_COLUMNS,
+    "scores": schema.SCORE_COLUMNS,
+}
+
+
+def group_bytes(df: pd.DataFrame) -> dict:
+    usage = df.memory_usage(deep=True, index=False)
+    out = {name: int(usage[[c for c in cols if c in usage.index]].sum()) for name, cols in GROUPS.items()}
+    grouped = {c for cols in GROUPS.values() for c in cols}
+    out["other"] = int(usage[[c for c in usage.index if c not in grouped]].sum())
+    out["total"] = int(usage.sum())
+    return out
+
+
+def build_labels(scored: pd.DataFrame, share: float = 0.05, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    rows = scored.sample(frac=share, random_state=seed)[["task_id", "model_name"]].reset_index(drop=True)
+    n = len(rows)
+    rows["is_best"] = rng.integers(0, 2, n)
+    rows["helpfulness"] = rng.integers(0, 6, n)
+    rows["correctness_human"] = rng.integers(0, 6, n)
+    rows["safety_human"] = rng.integers(0, 6, n)
+    rows["comments"] = ""
+    return rows
+
+
+def report(label: str, before: dict, after: dict):
+    print(f"\n{label}")
+    print(f"{'columns':<12} {'before MB':>10} {'after MB':>10} {'saved':>7}")
+    for name in before:
+        saved = 1 - after[name] / before[name] if before[name] else 0.0
+        print(f"{name:<12} {before[name] / 1e6:>10.1f} {after[name] / 1e6:>10.1f} {saved:>7.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--models", type=int, default=3)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    tasks = build_tasks(args.tasks)
+    outputs = pd.concat(
+        [generate_outputs_for_model(tasks, name, quality) for name, quality in model_configs(args.models)],
+        ignore_index=True,
+    )
+    scored = apply_guardrails_incremental(apply_rubric_incremental(tasks, outputs, None, log=False), None, log=False)
+    labels = build_labels(scored)
+    print(f"scored {len(scored):,} rows ({args.tasks:,} tasks x {args.models} models) in {time.perf_counter() - start:.1f}s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        tasks.to_csv(tmp / "tasks.csv", index=False)
+        labels.to_csv(tmp / "labels.csv", index=False)
+        # the old layout: task text merged onto every row, read back with default dtypes
+        scored.merge(tasks[["task_id", *schema.TASK_TEXT_COLUMNS]], on="task_id").to_csv(tmp / "old.csv", index=False)
+        scored.to_csv(tmp / "new.csv", index=False)
+
+        old = pd.read_csv(tmp / "old.csv")
+        old_merged = old.merge(pd.read_csv(tmp / "labels.csv"), on=["task_id", "model_name"], how="left")
+        old_scores, old_aggregate = group_bytes(old), group_bytes(old_merged)
+        del old, old_merged
+
+        new = schema.read_csv(tmp / "new.csv")
+        new_merged = schema.compact(
+            new.merge(schema.read_csv(tmp / "labels.csv"), on=["task_id", "model_name"], how="left")
+        )
+        task_table = schema.memory_bytes(schema.read_tasks(tmp))
+        new_scores, new_aggregate = group_bytes(new), group_bytes(new_merged)
+
+    report("auto_scores_with_guardrails as loaded", old_scores, new_scores)
+    report("aggregate frame (scores + human labels)", old_aggregate, new_aggregate)
+    print(f"\ntask table (text kept once per task): {task_table / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
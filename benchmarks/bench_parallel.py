@@ -0,0 +1,72 @@
+"""
+Compare serial and process-pool rubric + guardrail scoring, and check
+that both write byte-identical datasets and CSV exports.
+
+    python benchmarks/bench_parallel.py --rows 2000000 --workers 8
+"""
+import argparse
+import filecmp
+import hashlib
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+from bench_scoring import build_outputs  # noqa: E402
+from generate_tasks import build_tasks  # noqa: E402
+from guardrails import apply_guardrails_incremental  # noqa: E402
+from parallel_scoring import print_worker_stats, score_parallel  # noqa: E402
+from scoring_rubric import apply_rubric_incremental  # noqa: E402
+from storage import dataset_path, save_stage  # noqa: E402
+
+
+def _same_tree(a: Path, b: Path) -> bool:
+    cmp = filecmp.dircmp(a, b)
+    if cmp.left_only or cmp.right_only or cmp.funny_files:
+        return False
+    _, mismatch, errors = filecmp.cmpfiles(a, b, cmp.common_files, shallow=False)
+    return not mismatch and not errors and all(_same_tree(a / d, b / d) for d in cmp.common_dirs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--shard-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    tasks = build_tasks()
+    outputs = build_outputs(tasks, args.rows)
+    outputs["model_name"] = ["model_%d" % (i % 3) for i in range(len(outputs))]
+
+    start = time.perf_counter()
+    serial = apply_guardrails_incremental(apply_rubric_incremental(tasks, outputs, None, log=False), None, log=False)
+    serial_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parallel, stats = score_parallel(tasks, outputs, args.workers, args.shard_size)
+    parallel_s = time.perf_counter() - start
+    print_worker_stats(stats)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        serial_dir, parallel_dir = Path(tmp) / "serial", Path(tmp) / "parallel"
+        for frame, data_dir in [(serial, serial_dir), (parallel, parallel_dir)]:
+            data_dir.mkdir()
+            save_stage(frame, data_dir, "scored", ["model_name", "category"], csv_path=data_dir / "scored.csv")
+
+        csv_digests = {hashlib.sha256((d / "scored.csv").read_bytes()).hexdigest() for d in [serial_dir, parallel_dir]}
+        if len(csv_digests) != 1:
+            raise AssertionError("CSV exports differ between serial and parallel runs")
+        if not _same_tree(dataset_path(serial_dir, "scored"), dataset_path(parallel_dir, "scored")):
+            raise AssertionError("Parquet datasets differ between serial and parallel runs")
+
+    print(f"rows:     {args.rows:,}")
+    print(f"serial:   {serial_s:.2f}s ({args.rows / serial_s:,.0f} rows/s)")
+    print(f"parallel: {parallel_s:.2f}s ({args.rows / parallel_s:,.0f} rows/s) on {len(stats) or 1} process(es)")
+    print("outputs are byte-identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+End-to-end pipeline benchmark on synthetic workloads of N tasks x M models.
+
+Every stage (generation, rubric, guardrails, aggregation, dashboard load)
+runs in its own child process against a scratch data directory, so the
+reported peak RSS is that stage's alone. Results go to a JSON report
+that can be diffed across commits.
+
+    python benchmarks/bench_pipeline.py --sizes 1000,10000,100000 --models 3
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT / "src"))
+
+STAGES = ["generate", "rubric", "guardrails", "aggregate", "dashboard"]
+
+
+# --- Stages (run inside the child process) ----------------------
+
+def stage_generate(data_dir: Path, n_tasks: int, n_models: int) -> int:
+    import pandas as pd
+    from generate_tasks import build_tasks
+    from run_models import generate_outputs_for_model, model_configs
+    from storage import save_stage
+
+    tasks = build_tasks(n_tasks)
+    tasks.to_csv(data_dir / "tasks.csv", index=False)
+    outputs = pd.concat(
+        [generate_outputs_for_model(tasks, name, quality) for name, quality in model_configs(n_models)],
+        ignore_index=True,
+    )
+    save_stage(outputs, data_dir, "outputs", ["model_name"])
+    return len(outputs)
+
+
+def stage_rubric(data_dir: Path, n_tasks: int, n_models: int) -> int:
+    from schema import read_tasks
+    from scoring_rubric import apply_rubric_incremental
+    from semantic_similarity import load_reference_index
+    from storage import load_stage, save_stage
+
+    tasks = read_tasks(data_dir, ["task_id", "category", "reference_answer"])
+    outputs = load_stage(data_dir, "outputs", columns=["task_id", "model_name", "response"])
+    similarity = load_reference_index(tasks, data_dir / "cache" / "similarity")
+    scored = apply_rubric_incremental(tasks, outputs, None, log=False, similarity=similarity)
+    save_stage(scored, data_dir, "auto_scores", ["model_name", "category"])
+    return len(scored)
+
+
+def stage_guardrails(data_dir: Path, n_tasks: int, n_models: int) -> int:
+    from guardrails import apply_guardrails_incremental
+    from storage import load_stage, save_stage
+
+    scored = apply_guardrails_incremental(load_stage(data_dir, "auto_scores"), None, log=False)
+    save_stage(scored, data_dir, "auto_scores_with_guardrails", ["model_name", "category"])
+    return len(scored)
+
+
+def stage_aggregate(data_dir: Path, n_tasks: int, n_models: int) -> int:
+    from aggregate_results import aggregate
+
+    return len(aggregate(data_dir, data_dir.parent / "artifacts"))
+
+
+def stage_dashboard(data_dir: Path, n_tasks: int, n_models: int) -> int:
+    # what the dashboard reads and computes before its first render
+    import pandas as pd
+
+    sys.path.append(str(ROOT / "app"))
+    from dashboard import rollup_means
+
+    artifacts = data_dir.parent / "artifacts"
+    cube = pd.read_parquet(artifacts / "eval_rollup.parquet")
+    for name in ("eval_worst", "eval_ci", "eval_pairwise"):
+        pd.read_parquet(artifacts / f"{name}.parquet")
+    rollup_means(cube, ["auto_correctness"])
+    rollup_means(cube, ["is_toxic", "is_refusal"])
+    rollup_means(cube, ["rouge1", "rouge2", "rougeL", "bleu", "semantic_similarity"])
+    return int(cube["n_rows"].sum())
+
+
+def run_stage(stage: str, workdir: Path, n_tasks: int, n_models: int):
+    data_dir = workdir / "data"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    stage_fn = globals()[f"stage_{stage}"]
+
+    # keep stdout for the result line
+    real_stdout, sys.stdout = sys.stdout, sys.stderr
+    start = time.perf_counter()
+    rows = stage_fn(data_dir, n_tasks, n_models)
+    seconds = time.perf_counter() - start
+    sys.stdout = real_stdout
+    print(json.dumps({"rows": rows, "seconds": seconds}))
+
+
+# --- Driver -----------------------------------------------------
+
+def measure(stage: str, workdir: Path, n_tasks: int, n_models: int) -> dict:
+    cmd = [
+        sys.executable, __file__, "--stage", stage, "--workdir", str(workdir),
+        "--n-tasks", str(n_tasks), "--n-models", str(n_models),
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    out = proc.stdout.read()
+    # wait4 gives this child's own resource usage (ru_maxrss is in KiB on Linux)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise SystemExit(f"stage {stage} failed at {n_tasks} tasks (exit {proc.returncode})")
+
+    result = json.loads(out.strip().splitlines()[-1])
+    return {
+        "stage": stage,
+        "n_tasks": n_tasks,
+        "n_models": n_models,
+        "rows": result["rows"],
+        "seconds": round(result["seconds"], 4),
+        "rows_per_sec": round(result["rows"] / result["seconds"]) if result["seconds"] > 0 else None,
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated task counts")
+    parser.add_argument("--models", type=int, default=3)
+    parser.add_argument("--out", type=Path, default=None, help="report path (default benchmarks/reports/pipeline-<commit>.json)")
+    # internal: run one stage in this process
+    parser.add_argument("--stage", choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--n-tasks", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--n-models", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        run_stage(args.stage, args.workdir, args.n_tasks, args.n_models)
+        return
+
+    import numpy as np
+    import pandas as pd
+    import pyarrow as pa
+
+    commit = git_commit()
+    results = []
+    print(f"{'tasks':>9} {'stage':<11} {'rows':>10} {'seconds':>9} {'rows/s':>12} {'peak MB':>9}")
+    for n_tasks in [int(s) for s in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            for stage in STAGES:
+                r = measure(stage, Path(tmp), n_tasks, args.models)
+                results.append(r)
+                print(
+                    f"{n_tasks:>9,} {stage:<11} {r['rows']:>10,} {r['seconds']:>9.2f} "
+                    f"{r['rows_per_sec'] or 0:>12,} {r['peak_rss_mb']:>9.1f}"
+                )
+
+    report = {
+        "commit": commit,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "versions": {"numpy": np.__version__, "pandas": pd.__version__, "pyarrow": pa.__version__},
+        "n_models": args.models,
+        "results": results,
+    }
+    out = args.out or ROOT / "benchmarks" / "reports" / f"pipeline-{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
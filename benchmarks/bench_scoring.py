@@ -0,0 +1,108 @@
+"""
+Benchmark the category-dispatched batch rubric against the original
+iterrows implementation and check that both give the same scores.
+
+    python benchmarks/bench_scoring.py --rows 1000000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+from generate_tasks import build_tasks  # noqa: E402
+from scoring_rubric import (  # noqa: E402
+    apply_rubric,
+    score_math_reasoning,
+    score_sentiment,
+    simple_overlap_score,
+)
+
+
+# --- Original implementation (kept here for comparison) ---------
+
+def legacy_apply_rubric(tasks: pd.DataFrame, outputs: pd.DataFrame) -> pd.DataFrame:
+    merged = outputs.merge(tasks, on="task_id", how="left")
+    scores = []
+
+    for _, row in merged.iterrows():
+        category = row["category"]
+        pred = str(row["response"])
+        ref = str(row["reference_answer"])
+
+        if category == "math_reasoning":
+            correctness = score_math_reasoning(pred, ref)
+        elif category == "sentiment_classification":
+            correctness = score_sentiment(pred, ref)
+        elif category == "summarization":
+            correctness = simple_overlap_score(pred, ref)
+        else:
+            correctness = 0.0
+
+        scores.append(correctness)
+
+    merged["auto_correctness"] = scores
+    return merged
+
+
+# --- Synthetic outputs ------------------------------------------
+
+NOISE = [
+    "8", "3.5", "5.77", " 4 ", "1_000", "nan", "inf", "not sure", "Positive ", "NEGATIVE", "neutral",
+    "Overall, this has various implications for stakeholders.", "",
+]
+
+
+def build_outputs(tasks: pd.DataFrame, n_rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    task_idx = rng.integers(0, len(tasks), size=n_rows)
+    refs = tasks["reference_answer"].to_numpy(dtype=object)[task_idx]
+
+    responses = refs.copy()
+    noisy = rng.random(n_rows) < 0.4
+    responses[noisy] = np.array(NOISE, dtype=object)[rng.integers(0, len(NOISE), size=noisy.sum())]
+    fluff = rng.random(n_rows) < 0.1
+    responses[fluff] = refs[fluff] + " plus extra words"
+
+    return pd.DataFrame(
+        {
+            "task_id": tasks["task_id"].to_numpy(dtype=object)[task_idx],
+            "model_name": "bench_dummy",
+            "response": responses,
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    tasks = build_tasks()
+    outputs = build_outputs(tasks, args.rows)
+
+    start = time.perf_counter()
+    legacy = legacy_apply_rubric(tasks, outputs)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = apply_rubric(tasks, outputs)
+    batch_s = time.perf_counter() - start
+
+    # scores are stored as float32
+    expected = legacy["auto_correctness"].to_numpy().astype(np.float32)
+    if not np.array_equal(expected, batch["auto_correctness"].to_numpy()):
+        raise AssertionError("batch scores differ from the per-row rubric")
+
+    print(f"rows:    {args.rows:,}")
+    print(f"legacy:  {legacy_s:.2f}s ({args.rows / legacy_s:,.0f} rows/s)")
+    print(f"batch:   {batch_s:.2f}s ({args.rows / batch_s:,.0f} rows/s)")
+    print(f"speedup: {legacy_s / batch_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
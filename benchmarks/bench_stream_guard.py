@@ -0,0 +1,147 @@
+"""
+Streamed generation cut at the first guardrail violation against full
+responses checked afterwards.
+
+First checks StreamGuard against the batch guardrails on random chunkings
+of the task set's responses (with unsafe openers mixed in): the match
+that stops a stream is the one `first_match` finds in the full text, and
+the cut response gets the same flags from `apply_guardrails`. Then
+streams every response to the end from a stub server and checks it
+afterwards, against run_models_async with the stream guard, and compares
+wall time and tokens sent. The stub runs in this process, so --token-ms
+(standing in for the cost of generating a token) should stay well above
+the per-request overhead of a few milliseconds.
+
+    python benchmarks/bench_stream_guard.py --tasks 500 --unsafe-rate 0.2 --token-ms 30
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+from generate_tasks import build_tasks  # noqa: E402
+from guardrails import GUARDRAIL_COLUMNS, STREAM_RULES, StreamGuard, apply_guardrails, first_match  # noqa: E402
+from run_models import MODEL_CONFIGS, generate_outputs_for_model  # noqa: E402
+from run_models_async import EndpointConfig, generate_outputs_async, stream_guard_summary  # noqa: E402
+from stub_model_server import UNSAFE_OPENERS, start_in_background  # noqa: E402
+
+
+def random_chunks(text: str, rng: random.Random) -> list:
+    cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, len(text) // 4))) if len(text) > 1 else []
+    return [text[i:j] for i, j in zip([0, *cuts], [*cuts, len(text)])]
+
+
+def check_against_batch(responses: list, seed: int = 0) -> int:
+    """Mismatches between streaming and batch guardrails over random chunkings."""
+    rng = random.Random(seed)
+    mismatches = 0
+    cut_responses, guard_flags = [], []
+    for text in responses:
+        guard = StreamGuard()
+        received = []
+        for chunk in random_chunks(text, rng):
+            received.append(chunk)
+            if guard.feed(chunk):
+                break
+        guard.finish()
+        for name, (matcher, _) in STREAM_RULES.items():
+            # the rule that stopped the stream saw the same match the full text has
+            if guard.stopped and guard.matches[name] is not None and guard.matches[name] != first_match(text, matcher):
+                mismatches += 1
+        cut_responses.append("".join(received))
+        guard_flags.append(guard.flags())
+
+    batch = apply_guardrails(pd.DataFrame({"response": cut_responses}))[GUARDRAIL_COLUMNS]
+    streamed = pd.DataFrame(guard_flags, columns=GUARDRAIL_COLUMNS)
+    for col in GUARDRAIL_COLUMNS:
+        mismatches += int((batch[col].fillna("").astype(str) != streamed[col].fillna("").astype(str)).sum())
+    return mismatches
+
+
+async def stream_full(base_url: str, tasks: pd.DataFrame, concurrency: int) -> list:
+    """Every response streamed to the end (what generation costs without the guard)."""
+    records = tasks[["category", "prompt", "reference_answer"]].to_dict("records")
+    limits = httpx.Limits(max_connections=concurrency * len(MODEL_CONFIGS))
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        async def model(model_name: str, quality: float) -> list:
+            gate = asyncio.Semaphore(concurrency)
+
+            async def one(record: dict) -> str:
+                async with gate, client.stream(
+                    "POST", "/generate/stream", json={"model_name": model_name, "quality": quality, **record}
+                ) as resp:
+                    lines = [json.loads(line) async for line in resp.aiter_lines() if line]
+                return "".join(m["token"] for m in lines if "token" in m)
+
+            return await asyncio.gather(*(one(r) for r in records))
+
+        per_model = await asyncio.gather(*(model(name, quality) for name, quality in MODEL_CONFIGS))
+    return [r for responses in per_model for r in responses]
+
+
+def run_guarded(base_url: str, tasks: pd.DataFrame, concurrency: int) -> pd.DataFrame:
+    endpoints = [
+        EndpointConfig(model_name, quality, f"{base_url}/generate", max_concurrency=concurrency, rate_per_sec=1e6)
+        for model_name, quality in MODEL_CONFIGS
+    ]
+    outputs = asyncio.run(generate_outputs_async(tasks, endpoints, stream_guard=True))
+    return pd.concat(outputs.values(), ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=500)
+    parser.add_argument("--unsafe-rate", type=float, default=0.2, help="share of responses opening with a violation")
+    parser.add_argument("--token-ms", type=float, default=30.0, help="stub server delay between tokens")
+    parser.add_argument("--concurrency", type=int, default=8, help="in-flight requests per model")
+    args = parser.parse_args()
+
+    tasks = build_tasks(args.tasks)
+    rng = random.Random(0)
+    responses = [
+        f"{rng.choice(UNSAFE_OPENERS)} {r}" if rng.random() < args.unsafe_rate else r
+        for name, quality in MODEL_CONFIGS
+        for r in generate_outputs_for_model(tasks, name, quality)["response"].fillna("")
+    ]
+    mismatches = check_against_batch(responses)
+    print(f"streaming vs batch guardrails: {len(responses):,} responses, {mismatches} mismatches")
+    if mismatches:
+        raise SystemExit("StreamGuard disagrees with apply_guardrails")
+
+    # both runs stream from the same kind of server, so they pay the same per-token delay
+    server, base_url = start_in_background(token_ms=args.token_ms, unsafe_rate=args.unsafe_rate)
+    start = time.perf_counter()
+    full = asyncio.run(stream_full(base_url, tasks, args.concurrency))
+    apply_guardrails(pd.DataFrame({"response": full}))
+    full_s = time.perf_counter() - start
+    full_stats = server.stream_stats()
+    print(f"full responses, then guardrails: {full_s:8.2f}s")
+    server.shutdown()
+    server.server_close()
+
+    server, base_url = start_in_background(token_ms=args.token_ms, unsafe_rate=args.unsafe_rate)
+    start = time.perf_counter()
+    guarded = run_guarded(base_url, tasks, args.concurrency)
+    guarded_s = time.perf_counter() - start
+    stats = server.stream_stats()
+    print(f"stream guard:                    {guarded_s:8.2f}s ({full_s / guarded_s:.2f}x faster)")
+    print(stream_guard_summary(guarded))
+    print(
+        f"server: {stats['streams_cancelled']} of {stats['streams']} streams cancelled, "
+        f"{stats['tokens_streamed']:,} of {stats['tokens_total']:,} tokens sent "
+        f"(full run: {full_stats['tokens_streamed']:,})"
+    )
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Stream playground answers from a local stub server and measure
+time-to-first-token against full-response latency, and a pooled HTTP
+provider against a new connection per request.
+
+    python benchmarks/bench_streaming.py --requests 200 --latency-ms 20 --token-ms 5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+from chat_models import DUMMY_MODELS, register_http_models, stream_response  # noqa: E402
+from stub_model_server import start_in_background  # noqa: E402
+
+
+def summarize(label: str, seconds: list):
+    ms = np.array(seconds) * 1000
+    print(f"{label:<22} p50 {np.percentile(ms, 50):8.2f} ms   p95 {np.percentile(ms, 95):8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="stub server delay before the first token")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="stub server delay between tokens")
+    args = parser.parse_args()
+
+    server, base_url = start_in_background(latency_ms=args.latency_ms, token_ms=args.token_ms)
+    names = register_http_models(base_url)
+    prompts = [f"question {i} about the quarterly report" for i in range(args.requests)]
+
+    ttft, total = [], []
+    for i, prompt in enumerate(prompts):
+        name = names[i % len(names)]
+        start = time.perf_counter()
+        chunks = []
+        for chunk in stream_response(name, prompt):
+            if not chunks:
+                ttft.append(time.perf_counter() - start)
+            chunks.append(chunk)
+        total.append(time.perf_counter() - start)
+
+        # gpt4/llama3 dummies are deterministic; mistral shuffles
+        model_name = name.split(":", 1)[1]
+        if model_name != "mistral_dummy" and "".join(chunks) != DUMMY_MODELS[model_name](prompt):
+            raise SystemExit(f"{name} streamed a different answer than the dummy model")
+
+    print(f"requests: {args.requests:,} against {base_url}")
+    summarize("time to first token", ttft)
+    summarize("full response", total)
+    print("streamed answers match the dummy models")
+
+    # connection reuse: same requests, non-streaming, pooled vs one client each
+    payload = {"model_name": "gpt4_dummy", "prompt": "hello"}
+    with httpx.Client(base_url=base_url) as client:
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            client.post("/generate", json=payload).raise_for_status()
+        pooled = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        httpx.post(f"{base_url}/generate", json=payload).raise_for_status()
+    fresh = time.perf_counter() - start
+    print(f"pooled client:         {pooled / args.requests * 1000:8.2f} ms/request")
+    print(f"new connection each:   {fresh / args.requests * 1000:8.2f} ms/request")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark the batch ROUGE/BLEU engine against a straightforward per-row
+Python implementation and check that both give the same scores.
+
+    python benchmarks/bench_text_metrics.py --rows 1000000
+"""
+import argparse
+import math
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+from text_metrics import BLEU_MAX_N, summarization_metrics  # noqa: E402
+
+
+# --- Per-row reference implementation ---------------------------
+
+def _ngrams(tokens, n):
+    return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+
+def _lcs(a, b):
+    row = [0] * (len(b) + 1)
+    for x in a:
+        prev = 0
+        for j, y in enumerate(b):
+            cur = row[j + 1]
+            row[j + 1] = prev + 1 if x == y else max(row[j + 1], row[j])
+            prev = cur
+    return row[-1]
+
+
+def reference_metrics(pred: str, ref: str) -> dict:
+    p = pred.lower().split()
+    r = ref.lower().split()
+    out = {}
+    for n in (1, 2):
+        overlap = sum((_ngrams(p, n) & _ngrams(r, n)).values())
+        total = max(len(p) - n + 1, 0) + max(len(r) - n + 1, 0)
+        out[f"rouge{n}"] = 2 * overlap / total if total else 0.0
+    out["rougeL"] = 2 * _lcs(p, r) / (len(p) + len(r)) if p or r else 0.0
+
+    if not p:
+        out["bleu"] = 0.0
+        return out
+    log_precision = 0.0
+    for n in range(1, BLEU_MAX_N + 1):
+        smooth = 0 if n == 1 else 1
+        overlap = sum((_ngrams(p, n) & _ngrams(r, n)).values())
+        precision = (overlap + smooth) / (max(len(p) - n + 1, 0) + smooth)
+        log_precision += (math.log(precision) if precision > 0 else -math.inf) / BLEU_MAX_N
+    brevity = 1.0 if len(p) >= len(r) else math.exp(1 - len(r) / len(p))
+    out["bleu"] = brevity * math.exp(log_precision)
+    return out
+
+
+# --- Synthetic summaries ----------------------------------------
+
+WORDS = (
+    "the a model market growth quarter results report river city council policy team data new "
+    "overall this has various implications for stakeholders economic spending fell rose sharply"
+).split()
+
+
+def build_pairs(n_rows: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    words = np.array(WORDS)
+    refs, preds = [], []
+    for _ in range(n_rows):
+        ref = words[rng.integers(0, len(words), rng.integers(5, 40))]
+        pred = ref.copy()
+        # drop, replace and append a few tokens so scores vary
+        pred = pred[rng.random(len(pred)) > 0.15]
+        swap = rng.random(len(pred)) < 0.1
+        pred[swap] = words[rng.integers(0, len(words), swap.sum())]
+        if rng.random() < 0.3:
+            pred = np.concatenate([pred, words[rng.integers(0, len(words), 6)]])
+        refs.append(" ".join(ref))
+        preds.append(" ".join(pred))
+    return pd.Series(preds), pd.Series(refs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--check-rows", type=int, default=20_000, help="rows scored by the per-row reference")
+    args = parser.parse_args()
+
+    preds, refs = build_pairs(args.rows)
+    print(f"rows:      {args.rows:,}")
+
+    n_check = min(args.check_rows, args.rows)
+    start = time.perf_counter()
+    expected = [reference_metrics(p, r) for p, r in zip(preds[:n_check], refs[:n_check])]
+    per_row = (time.perf_counter() - start) / n_check
+    print(f"per-row:   {n_check / (per_row * n_check):,.0f} rows/s (on {n_check:,} rows)")
+
+    start = time.perf_counter()
+    metrics = summarization_metrics(preds, refs)
+    batch = time.perf_counter() - start
+    print(f"batch:     {batch:.2f}s ({args.rows / batch:,.0f} rows/s)")
+    print(f"speedup:   {per_row * args.rows / batch:.1f}x")
+
+    for name in metrics:
+        want = np.array([e[name] for e in expected])
+        if not np.allclose(metrics[name][:n_check], want, rtol=0, atol=1e-9):
+            raise SystemExit(f"{name} differs from the per-row implementation")
+    print("scores match the per-row implementation")
+
+
+if __name__ == "__main__":
+    main()
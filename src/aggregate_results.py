@@ -1,38 +1,146 @@
+from concurrent.futures import Executor
 from pathlib import Path
+from typing import Optional
 
+import numpy as np
 import pandas as pd
 
+import schema
+from bootstrap_stats import bootstrap_compare
+from instrumentation import instrument_job, span
+from label_reduction import LABEL_COUNT, agreement, reduce_labels
+from label_store import LABEL_COLUMNS, load_labels
+from storage import load_stage
 
-def main():
-    root = Path(__file__).resolve().parents[1]
-    data_dir = root / "data"
-    artifacts_dir = root / "artifacts"
-    artifacts_dir.mkdir(exist_ok=True)
 
-    auto_path = data_dir / "auto_scores_with_guardrails.csv"
-    auto_df = pd.read_csv(auto_path)
+ROLLUP_KEYS = ["model_name", "category"]
+ROLLUP_METRICS = [
+    "auto_correctness", "rouge1", "rouge2", "rougeL", "bleu", "semantic_similarity",
+    "is_toxic", "is_refusal", "helpfulness", "correctness_human", "safety_human",
+]
+WORST_PER_GROUP = 5
+
+
+def build_rollup(merged: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sums and non-null counts of every metric per (model_name, category).
+    Any filter over models/categories can be answered by summing the
+    matching rows and dividing, so the dashboard never needs raw rows.
+    """
+    metrics = [m for m in ROLLUP_METRICS if m in merged.columns]
+    values = merged[ROLLUP_KEYS + metrics].copy()
+    # float32 scores and int8 flags are summed in float64
+    values[metrics] = values[metrics].apply(pd.to_numeric, errors="coerce").astype(np.float64)
+
+    grouped = values.groupby(ROLLUP_KEYS, dropna=False, observed=True)
+    sums = grouped[metrics].sum().add_suffix("_sum")
+    counts = grouped[metrics].count().add_suffix("_count")
+
+    rollup = pd.concat([sums, counts], axis=1)
+    rollup["n_rows"] = grouped.size()
+    return rollup.reset_index()
 
-    labels_path = data_dir / "labels_humans.csv"
-    if labels_path.exists():
-        human_df = pd.read_csv(labels_path)
-    else:
+
+def build_worst(merged: pd.DataFrame, tasks: pd.DataFrame, k: int = WORST_PER_GROUP) -> pd.DataFrame:
+    """
+    The k lowest auto_correctness rows per (model_name, category), with
+    their prompt and reference answer from `tasks`. The k worst rows of
+    any filter are always among these.
+    """
+    ranked = merged.sort_values("auto_correctness", kind="stable")
+    worst = ranked.groupby(ROLLUP_KEYS, dropna=False, sort=False, observed=True).head(k).reset_index(drop=True)
+    return schema.attach_text(worst, tasks)
+
+
+def merge_labels(auto_df: pd.DataFrame, human_df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Auto scores left-joined with human labels on task_id + model_name.
+    Labels are reduced to one row per pair first (see label_reduction),
+    so the result has exactly one row per auto-score row.
+    """
+    # task text stays in tasks.csv; only the worst examples get it joined back
+    auto_df = schema.drop_task_text(auto_df)
+    if human_df is None:
         print("No human labels found; continuing with auto scores only.")
-        human_df = pd.DataFrame(
-            columns=["task_id", "model_name", "is_best", "helpfulness", "correctness_human", "safety_human", "comments"]
-        )
+        human_df = pd.DataFrame(columns=LABEL_COLUMNS)
+    human_df = schema.align_keys(reduce_labels(human_df), auto_df)
 
-    # merge on task_id + model_name (left join so we keep all auto scores)
+    # left join so we keep all auto scores
     merged = auto_df.merge(
         human_df,
         on=["task_id", "model_name"],
         how="left",
         suffixes=("", "_human"),
     )
+    merged[LABEL_COUNT] = merged[LABEL_COUNT].fillna(0).astype(np.int32)
+    return schema.compact(merged)
+
+
+def _bootstrap(merged: pd.DataFrame):
+    # bootstrap CIs per (model, category) and paired model-vs-model tests
+    with span("aggregate.bootstrap") as s:
+        s.add_rows(len(merged))
+        return bootstrap_compare(merged, "auto_correctness")
+
 
-    out_path = artifacts_dir / "eval_results.parquet"
-    merged.to_parquet(out_path, index=False)
+def aggregate_frames(
+    auto_df: pd.DataFrame,
+    human_df: Optional[pd.DataFrame],
+    tasks: pd.DataFrame,
+    artifacts_dir: Path,
+    pool: Optional[Executor] = None,
+) -> pd.DataFrame:
+    """
+    Merge auto scores with human labels and write every artifact the
+    dashboard reads. `tasks` supplies the text of the worst examples.
+    With a `pool`, the bootstrap runs on it while the other artifacts
+    are written.
+    """
+    artifacts_dir.mkdir(exist_ok=True)
+
+    with span("aggregate.merge") as s:
+        merged = merge_labels(auto_df, human_df)
+        s.add_rows(len(merged))
+    bootstrap = pool.submit(_bootstrap, merged) if pool is not None else None
+
+    with span("aggregate.write") as s:
+        s.add_rows(len(merged))
+        out_path = artifacts_dir / "eval_results.parquet"
+        merged.to_parquet(out_path, index=False)
     print(f"Saved aggregated evaluation results to {out_path}")
 
+    rollup_path = artifacts_dir / "eval_rollup.parquet"
+    with span("aggregate.rollup") as s:
+        s.add_rows(len(merged))
+        build_rollup(merged).to_parquet(rollup_path, index=False)
+        build_worst(merged, tasks).to_parquet(artifacts_dir / "eval_worst.parquet", index=False)
+    print(f"Saved dashboard rollups to {rollup_path}")
+
+    with span("aggregate.agreement") as s:
+        s.add_rows(0 if human_df is None else len(human_df))
+        agreement(human_df).to_parquet(artifacts_dir / "eval_agreement.parquet", index=False)
+
+    intervals, pairwise = bootstrap.result() if bootstrap is not None else _bootstrap(merged)
+    intervals.to_parquet(artifacts_dir / "eval_ci.parquet", index=False)
+    pairwise.to_parquet(artifacts_dir / "eval_pairwise.parquet", index=False)
+    print(f"Saved bootstrap intervals and pairwise tests to {artifacts_dir}")
+    return merged
+
+
+def aggregate(data_dir: Path, artifacts_dir: Path) -> pd.DataFrame:
+    """Load the guardrail-checked scores and labels from disk and run aggregate_frames."""
+    auto_df = load_stage(data_dir, "auto_scores_with_guardrails", [data_dir / "auto_scores_with_guardrails.csv"])
+    if auto_df is None:
+        raise FileNotFoundError("Expected data/datasets/auto_scores_with_guardrails. Run guardrails.py first.")
+    tasks = schema.read_tasks(data_dir, ["task_id", *schema.TASK_TEXT_COLUMNS])
+    return aggregate_frames(auto_df, load_labels(data_dir), tasks, artifacts_dir)
+
+
+@instrument_job("aggregate_results")
+def main():
+    root = Path(__file__).resolve().parents[1]
+    aggregate(root / "data", root / "artifacts")
+
 
 if __name__ == "__main__":
     main()
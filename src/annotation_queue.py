@@ -0,0 +1,107 @@
+"""
+Prioritized work queue for the annotation UI.
+
+Rows are sorted by task_id once, so each task is a contiguous row range
+and handing out the next task is a cursor bump plus a slice. Tasks are
+ordered so annotators see, in turn:
+
+1. tasks nobody has labeled yet before labeled ones,
+2. tasks where a guardrail fired for any model,
+3. tasks where the models disagree most on auto_correctness,
+
+with ties shuffled (seeded). A task is handed out once per pass, so
+several annotators sharing the queue never get the same task; when the
+queue runs out it is rebuilt from the current labels.
+"""
+import threading
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+
+PRIORITY_COLUMNS = ["auto_correctness", "is_toxic", "is_refusal"]
+
+
+class AnnotationQueue:
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        labeled_task_ids: Callable[[], Iterable[str]] = lambda: (),
+        seed: int = 0,
+    ):
+        self.df = df.sort_values(["task_id", "model_name"], kind="stable").reset_index(drop=True)
+        self._labeled_task_ids = labeled_task_ids
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+        task_ids = self.df["task_id"].to_numpy()
+        # the slices keep an empty frame at zero tasks
+        starts = np.flatnonzero(np.r_[True, task_ids[1:] != task_ids[:-1]][: len(task_ids)])
+        self.task_ids = task_ids[starts]
+        self.starts = starts
+        self.ends = np.r_[starts[1:], len(self.df)][: len(starts)]
+        self._position = {task_id: i for i, task_id in enumerate(self.task_ids)}
+
+        self._guardrail_hits, self._disagreement = self._task_signals()
+        self._refill()
+
+    def _task_signals(self):
+        n_tasks = len(self.task_ids)
+        task_of_row = np.repeat(np.arange(n_tasks), self.ends - self.starts)
+
+        hits = np.zeros(n_tasks, dtype=bool)
+        for col in ("is_toxic", "is_refusal"):
+            if col in self.df.columns:
+                flags = self.df[col].fillna(0).to_numpy(dtype=bool)
+                hits |= np.bincount(task_of_row, weights=flags, minlength=n_tasks) > 0
+
+        disagreement = np.zeros(n_tasks)
+        if "auto_correctness" in self.df.columns:
+            scores = pd.to_numeric(self.df["auto_correctness"], errors="coerce").to_numpy(dtype=float)
+            valid = ~np.isnan(scores)
+            if valid.any():
+                # spread = max - min over the models' scores; rows are task-contiguous
+                hi = np.where(valid, scores, -np.inf)
+                lo = np.where(valid, scores, np.inf)
+                spread = np.maximum.reduceat(hi, self.starts) - np.minimum.reduceat(lo, self.starts)
+                disagreement = np.where(np.isfinite(spread), spread, 0.0)
+
+        return hits, disagreement
+
+    def _refill(self):
+        labeled = np.isin(self.task_ids, list(self._labeled_task_ids()))
+        tiebreak = self._rng.random(len(self.task_ids))
+        # np.lexsort sorts by the last key first
+        self._order = np.lexsort((tiebreak, -self._disagreement, ~self._guardrail_hits, labeled))
+        self._cursor = 0
+
+    def __len__(self):
+        return len(self._order) - self._cursor
+
+    def rows(self, task_id: str) -> pd.DataFrame:
+        i = self._position[task_id]
+        return self.df.iloc[self.starts[i]:self.ends[i]]
+
+    def served(self) -> np.ndarray:
+        """Task ids handed out in the current pass."""
+        with self._lock:
+            return self.task_ids[self._order[: self._cursor]]
+
+    def defer(self, task_ids: Iterable[str]):
+        """Move `task_ids` behind every other task still to come in this pass."""
+        with self._lock:
+            rest = self._order[self._cursor:]
+            later = np.isin(self.task_ids[rest], list(task_ids))
+            self._order = np.concatenate([self._order[: self._cursor], rest[~later], rest[later]])
+
+    def next_task(self) -> Optional[pd.DataFrame]:
+        """Rows of the next task to annotate, or None if there are no tasks."""
+        with self._lock:
+            if len(self._order) == 0:
+                return None
+            if self._cursor >= len(self._order):
+                self._refill()
+            i = self._order[self._cursor]
+            self._cursor += 1
+        return self.df.iloc[self.starts[i]:self.ends[i]]
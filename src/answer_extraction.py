@@ -0,0 +1,77 @@
+"""
+Numeric answers from free-text responses.
+
+A response that is a bare number ("8", " 3.5 ", "1e-3") is that number.
+Otherwise the answer is the last number in the text, so "The answer is
+8 apples." gives 8 and "It takes 3.5 hours." gives 3.5. Numbers may
+have a sign, thousands commas ("1,250") and a decimal part, and a
+fraction "a/b" is divided out; words and units around them are ignored.
+
+`ANSWER_PATTERN` matches a number that starts the text or follows a
+character that cannot be part of one, and is followed only by
+non-digits up to the end; the leftmost such match is the last number.
+A "-" is a sign only where it does not follow a digit ("3-5 hours"
+gives 5). The pattern is plain RE2 syntax, so `extract_answers` runs it
+over the whole column in Arrow (`pyarrow.compute.extract_regex`) and
+converts the captured parts with vectorized casts. `parse_answer`
+applies the same pattern with `re` to a single text.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+# a text that is just a number, as float() writes them
+BARE_NUMBER_PATTERN = r"^[-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?$"
+ANSWER_PATTERN = (
+    r"(?:^|[^0-9.,/])"
+    r"(?P<sign>-?)"
+    r"(?P<value>(?:[0-9]{1,3}(?:,[0-9]{3})+|[0-9]+)(?:\.[0-9]+)?|\.[0-9]+)"
+    r"(?:/(?P<denominator>[0-9]+(?:\.[0-9]+)?))?"
+    r"[^0-9]*$"
+)
+BARE_NUMBER_RE = re.compile(BARE_NUMBER_PATTERN)
+ANSWER_RE = re.compile(ANSWER_PATTERN)
+
+
+def parse_answer(text: str) -> float:
+    """The numeric answer in `text`, NaN if it has none."""
+    text = str(text).strip()
+    if BARE_NUMBER_RE.match(text):
+        return float(text)
+
+    found = ANSWER_RE.search(text)
+    if found is None:
+        return np.nan
+    value = np.float64(found["value"].replace(",", ""))
+    if found["denominator"]:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            value = value / np.float64(found["denominator"])
+    return float(-value if found["sign"] else value)
+
+
+def extract_answers(texts: pd.Series) -> np.ndarray:
+    """parse_answer for every text of the column, as float64 (NaN where there is no number)."""
+    texts = pc.utf8_trim_whitespace(pa.array(texts.astype(object).where(texts.notna(), "nan"), type=pa.string()))
+    values = np.full(len(texts), np.nan)
+
+    bare = pc.match_substring_regex(texts, BARE_NUMBER_PATTERN).to_numpy(zero_copy_only=False)
+    values[bare] = pc.cast(texts.filter(pa.array(bare)), pa.float64()).to_numpy()
+
+    # only texts that are not a bare number go through the answer pattern
+    rest = np.flatnonzero(~bare)
+    found = pc.extract_regex(texts.filter(pa.array(~bare)), ANSWER_PATTERN)
+    matched = found.is_valid().to_numpy(zero_copy_only=False)
+    rest, found = rest[matched], found.filter(pa.array(matched))
+
+    numbers = pc.cast(pc.replace_substring(found.field("value"), ",", ""), pa.float64()).to_numpy()
+    denominators = found.field("denominator")
+    denominators = pc.if_else(pc.equal(denominators, ""), "1", denominators)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        numbers = numbers / pc.cast(denominators, pa.float64()).to_numpy()
+    negative = pc.equal(found.field("sign"), "-").to_numpy(zero_copy_only=False)
+    values[rest] = np.where(negative, -numbers, numbers)
+    return values
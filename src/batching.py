@@ -0,0 +1,163 @@
+"""
+Dynamic micro-batching of concurrent generation requests.
+
+Callers submit (model, prompt) pairs from any thread and get a Future
+back. Each model has a lane with its own dispatcher thread. The lane
+collects prompts until it holds `max_batch_size` of them or the oldest
+has waited `max_wait_ms`, then sends them as one batched backend call
+and resolves each caller's future with its own answer. Up to
+`max_in_flight` batches per model are sent at once; while all of them
+are busy, new prompts keep collecting into the next batch.
+
+    batcher = MicroBatcher(generate_batch, max_batch_size=16, max_wait_ms=10, max_in_flight=4)
+    answer = batcher.submit("gpt4_dummy", "hello").result()
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from instrumentation import observe
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+# queue delays kept per model for the percentiles in stats()
+STATS_WINDOW = 10_000
+
+BatchFn = Callable[[str, List[str]], List[str]]
+
+
+class _Lane:
+    def __init__(self, model_name: str, max_in_flight: int):
+        self.model_name = model_name
+        self.pending: deque = deque()  # (prompt, future, enqueued_at)
+        self.ready = threading.Condition()
+        self.slots = threading.Semaphore(max_in_flight)
+        self.executor = ThreadPoolExecutor(max_in_flight, thread_name_prefix=f"batch-{model_name}")
+        self.batches = 0
+        self.requests = 0
+        self.max_batch = 0
+        self.delays: deque = deque(maxlen=STATS_WINDOW)
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        generate_batch: BatchFn,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        max_in_flight: int = 4,
+    ):
+        if max_batch_size < 1 or max_in_flight < 1:
+            raise ValueError("max_batch_size and max_in_flight must be at least 1")
+        self.generate_batch = generate_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.max_in_flight = max_in_flight
+        self._lanes: Dict[str, _Lane] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, model_name: str, prompt: str) -> Future:
+        """Queue one prompt; the future resolves to its answer."""
+        future: Future = Future()
+        lane = self._lane(model_name)
+        with lane.ready:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            lane.pending.append((prompt, future, time.perf_counter()))
+            if len(lane.pending) >= self.max_batch_size or len(lane.pending) == 1:
+                lane.ready.notify()
+        return future
+
+    def _lane(self, model_name: str) -> _Lane:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            lane = self._lanes.get(model_name)
+            if lane is None:
+                lane = self._lanes[model_name] = _Lane(model_name, self.max_in_flight)
+                threading.Thread(target=self._run, args=(lane,), daemon=True, name=f"batcher-{model_name}").start()
+            return lane
+
+    def _run(self, lane: _Lane):
+        while True:
+            # wait for a free slot first, so prompts pile up into the next batch meanwhile
+            lane.slots.acquire()
+            with lane.ready:
+                while not lane.pending and not self._closed:
+                    lane.ready.wait()
+                if not lane.pending:
+                    lane.executor.shutdown(wait=False)
+                    return
+                # hold the batch open until it is full or its oldest prompt is due
+                deadline = lane.pending[0][2] + self.max_wait_s
+                while len(lane.pending) < self.max_batch_size and not self._closed:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    lane.ready.wait(remaining)
+                n = min(len(lane.pending), self.max_batch_size)
+                batch = [lane.pending.popleft() for _ in range(n)]
+
+            lane.executor.submit(self._dispatch, lane, batch)
+
+    def _dispatch(self, lane: _Lane, batch: list):
+        try:
+            self._send(lane, batch)
+        finally:
+            lane.slots.release()
+
+    def _send(self, lane: _Lane, batch: list):
+        sent = time.perf_counter()
+        delays = [sent - enqueued for _, _, enqueued in batch]
+        with lane.ready:
+            lane.batches += 1
+            lane.requests += len(batch)
+            lane.max_batch = max(lane.max_batch, len(batch))
+            lane.delays.extend(delays)
+        observe("batch_size", len(batch), BATCH_SIZE_BUCKETS, model=lane.model_name)
+        for delay in delays:
+            observe("batch_queue_seconds", delay, model=lane.model_name)
+
+        try:
+            responses = self.generate_batch(lane.model_name, [prompt for prompt, _, _ in batch])
+            if len(responses) != len(batch):
+                raise RuntimeError(f"{lane.model_name}: {len(responses)} responses for {len(batch)} prompts")
+        except BaseException as exc:
+            for _, future, _ in batch:
+                future.set_exception(exc)
+            return
+        for (_, future, _), response in zip(batch, responses):
+            future.set_result(response)
+
+    def stats(self) -> Dict[str, dict]:
+        """Per model: batches sent, requests, batch sizes and queueing delay (ms)."""
+        out = {}
+        with self._lock:
+            lanes = list(self._lanes.values())
+        for lane in lanes:
+            with lane.ready:
+                delays = np.array(lane.delays) * 1000
+                out[lane.model_name] = {
+                    "batches": lane.batches,
+                    "requests": lane.requests,
+                    "mean_batch_size": lane.requests / lane.batches if lane.batches else 0.0,
+                    "max_batch_size": lane.max_batch,
+                    "mean_queue_ms": float(delays.mean()) if len(delays) else 0.0,
+                    "p95_queue_ms": float(np.percentile(delays, 95)) if len(delays) else 0.0,
+                }
+        return out
+
+    def close(self):
+        """Flush what is queued and stop the dispatcher threads."""
+        # under the lock, so no lane is created after this; submit then sees
+        # the flag under the lane's condition, which notify_all takes below
+        with self._lock:
+            self._closed = True
+            lanes = list(self._lanes.values())
+        for lane in lanes:
+            with lane.ready:
+                lane.ready.notify_all()
@@ -0,0 +1,155 @@
+"""
+Bootstrap confidence intervals and paired significance tests per
+(model, category).
+
+Within a category, every model's rows are lined up by task (the k-th
+answer of each model to a task forms one paired row) and all resamples
+are drawn once, as a single index matrix over those paired rows. The
+same resamples give every model's CI and every pairwise difference, so
+comparisons are paired. Only tasks answered by all models of the
+category are used.
+
+When the paired rows take few distinct values (typical for 0/1 or
+partial-credit scores), drawing resample counts over the distinct rows
+from a multinomial is equivalent to drawing row indices and costs
+O(resamples * distinct values) instead of O(resamples * rows).
+"""
+from itertools import combinations
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+
+N_RESAMPLES = 10_000
+CONFIDENCE = 0.95
+SEED = 0
+# upper bound on index-matrix cells drawn at once (resamples x rows)
+MAX_INDEX_CELLS = 1 << 22
+MULTINOMIAL_MAX_DISTINCT = 4096
+
+INTERVAL_COLUMNS = ["model_name", "category", "metric", "n", "mean", "ci_low", "ci_high"]
+PAIRWISE_COLUMNS = ["category", "metric", "model_a", "model_b", "n", "mean_diff", "ci_low", "ci_high", "p_value"]
+
+
+def paired_scores(df: pd.DataFrame, metric: str) -> Tuple[list, np.ndarray]:
+    """
+    Scores of one category as (models, values) where values[r, m] is model
+    m's score on paired row r. Rows missing for any model are dropped.
+    """
+    task_codes, _ = pd.factorize(df["task_id"])
+    model_codes, models = pd.factorize(df["model_name"], sort=True)
+    scores = pd.to_numeric(df[metric], errors="coerce").to_numpy(dtype=float)
+
+    # k-th answer of a model to a task pairs with the other models' k-th answers
+    pair_key = task_codes.astype(np.int64) * len(models) + model_codes
+    if pd.Index(pair_key).is_unique:
+        answer = np.zeros(len(df), dtype=np.int64)
+    else:
+        answer = pd.Series(pair_key).groupby(pair_key, sort=False).cumcount().to_numpy()
+
+    row_codes, row_keys = pd.factorize(task_codes * (answer.max(initial=0) + 1) + answer)
+    values = np.full((len(row_keys), len(models)), np.nan)
+    values[row_codes, model_codes] = scores
+    return list(models), values[~np.isnan(values).any(axis=1)]
+
+
+def _distinct_rows(values: np.ndarray):
+    """(distinct rows, count of each), or None if there are too many to enumerate."""
+    key = np.zeros(len(values), dtype=np.int64)
+    for column in values.T:
+        codes, uniques = pd.factorize(column)
+        key, _ = pd.factorize(key * len(uniques) + codes)
+        if key.max(initial=0) >= MULTINOMIAL_MAX_DISTINCT:
+            return None
+
+    n_distinct = key.max(initial=-1) + 1
+    first = np.empty(n_distinct, dtype=np.int64)
+    # reversed so the first occurrence of each key is written last
+    first[key[::-1]] = np.arange(len(key))[::-1]
+    return values[first], np.bincount(key, minlength=n_distinct)
+
+
+def resample_means(values: np.ndarray, n_resamples: int, rng: np.random.Generator) -> np.ndarray:
+    """(n_resamples, n_columns) column means of bootstrap resamples of the rows of `values`."""
+    n = len(values)
+    distinct = _distinct_rows(values)
+
+    if distinct is not None:
+        rows, counts = distinct
+        draws = rng.multinomial(n, counts / n, size=n_resamples)
+        return draws @ rows / n
+
+    sums = np.empty((n_resamples, values.shape[1]))
+    columns = [np.ascontiguousarray(column) for column in values.T]
+    index_dtype = np.int32 if n < 2**31 else np.int64
+    step = max(1, MAX_INDEX_CELLS // n)
+    for start in range(0, n_resamples, step):
+        stop = min(start + step, n_resamples)
+        index = rng.integers(0, n, size=(stop - start, n), dtype=index_dtype)
+        # one index block shared by every model keeps the resamples paired
+        for m, column in enumerate(columns):
+            sums[start:stop, m] = column[index].sum(axis=1)
+    return sums / n
+
+
+def _interval(samples: np.ndarray, confidence: float) -> Tuple[np.ndarray, np.ndarray]:
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(samples, [tail, 100 - tail], axis=0)
+    return low, high
+
+
+def bootstrap_compare(
+    df: pd.DataFrame,
+    metric: str = "auto_correctness",
+    n_resamples: int = N_RESAMPLES,
+    confidence: float = CONFIDENCE,
+    seed: int = SEED,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Per (model, category) mean with a bootstrap CI, and per category every
+    pair of models' mean difference with its CI and a two-sided bootstrap
+    p-value. Returns (intervals, pairwise).
+    """
+    rng = np.random.default_rng(seed)
+    intervals, pairwise = [], []
+
+    for category, group in df.groupby("category", sort=True, observed=True):
+        models, values = paired_scores(group, metric)
+        if not len(values):
+            continue
+        means = resample_means(values, n_resamples, rng)
+
+        low, high = _interval(means, confidence)
+        for i, model in enumerate(models):
+            intervals.append(
+                {
+                    "model_name": model,
+                    "category": category,
+                    "metric": metric,
+                    "n": len(values),
+                    "mean": values[:, i].mean(),
+                    "ci_low": low[i],
+                    "ci_high": high[i],
+                }
+            )
+
+        for i, j in combinations(range(len(models)), 2):
+            diffs = means[:, i] - means[:, j]
+            diff_low, diff_high = _interval(diffs, confidence)
+            p_value = min(1.0, 2 * min((diffs <= 0).mean(), (diffs >= 0).mean()))
+            pairwise.append(
+                {
+                    "category": category,
+                    "metric": metric,
+                    "model_a": models[i],
+                    "model_b": models[j],
+                    "n": len(values),
+                    "mean_diff": values[:, i].mean() - values[:, j].mean(),
+                    "ci_low": diff_low,
+                    "ci_high": diff_high,
+                    "p_value": p_value,
+                }
+            )
+
+    return pd.DataFrame(intervals, columns=INTERVAL_COLUMNS), pd.DataFrame(pairwise, columns=PAIRWISE_COLUMNS)
@@ -1,6 +1,32 @@
+"""
+Model providers for the Streamlit playground.
 
+Every model is a Provider registered under its name. A provider streams
+its answer as text chunks; `generate_response` joins them and
+`stream_response` hands them to the caller as they arrive. HTTP
+providers keep one pooled httpx.Client each, so consecutive prompts
+reuse open connections. Concurrent callers can share a
+batching.MicroBatcher (`get_batcher`), which groups their prompts into
+one `generate_batch` call per model.
 
+Set MODEL_ENDPOINT_URL (e.g. to a running src/stub_model_server.py) to
+also register "http:<model>" providers for the dummy models.
+"""
+import abc
+import atexit
+import json
+import os
 import random
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+import httpx
+
+from batching import MicroBatcher
+from instrumentation import observe
+from response_cache import ResponseCache, make_key
 
 # --- Dummy model logic for demo ---------------------------------
 
@@ -14,23 +40,228 @@ def _mistral_dummy(prompt: str) -> str:
     return f"[Mistral Dummy] Answer: {''.join(random.sample(prompt, len(prompt)))}"
 
 
-# --- PUBLIC API -------------------------------------------------
+DUMMY_MODELS: Dict[str, Callable[[str], str]] = {
+    "gpt4_dummy": _gpt4_dummy,
+    "llama3_dummy": _llama3_dummy,
+    "mistral_dummy": _mistral_dummy,
+}
+
+MODEL_VERSION = "dummy-v1"
+
+# a word plus the whitespace after it, so joined chunks give back the text
+_CHUNK = re.compile(r"\s*\S+\s*|\s+")
+
+
+def split_chunks(text: str) -> List[str]:
+    return _CHUNK.findall(text)
+
+
+# --- Providers --------------------------------------------------
+
+class Provider(abc.ABC):
+    """A named model that streams its answer as text chunks."""
+
+    version = ""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    @abc.abstractmethod
+    def stream(self, prompt: str) -> Iterator[str]:
+        """The answer to `prompt`, as text chunks in order."""
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        """Answers to several prompts; backends with a batch API override this."""
+        return ["".join(self.stream(prompt)) for prompt in prompts]
+
+    def close(self):
+        pass
 
-def generate_response(model_name: str, prompt: str) -> str:
+
+class DummyProvider(Provider):
+    version = MODEL_VERSION
+
+    def __init__(self, name: str, fn: Callable[[str], str]):
+        super().__init__(name)
+        self.fn = fn
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        yield from split_chunks(self.fn(prompt))
+
+
+class HTTPProvider(Provider):
     """
-    Universal generation function used by Streamlit.
+    A model behind POST <base_url>/generate/stream, which answers with
+    newline-delimited JSON objects {"token": ...}.
     """
 
-    model_name = model_name.lower()
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        model_name: Optional[str] = None,
+        quality: float = 1.0,
+        version: str = "",
+        timeout_s: float = 30.0,
+        max_connections: int = 8,
+    ):
+        super().__init__(name)
+        self.model_name = model_name or name
+        self.quality = quality
+        self.version = version
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.client = httpx.Client(base_url=base_url, timeout=timeout_s, limits=limits)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        payload = {"model_name": self.model_name, "quality": self.quality, "prompt": prompt}
+        with self.client.stream("POST", "/generate/stream", json=payload) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if not line:
+                    continue
+                message = json.loads(line)
+                if "error" in message:
+                    raise RuntimeError(f"{self.name}: {message['error']}")
+                if "token" in message:
+                    yield message["token"]
+
+    def generate_batch(self, prompts: List[str]) -> List[str]:
+        payload = {"model_name": self.model_name, "quality": self.quality, "prompts": prompts}
+        resp = self.client.post("/generate/batch", json=payload)
+        resp.raise_for_status()
+        return resp.json()["responses"]
+
+    def close(self):
+        self.client.close()
+
+
+PROVIDERS: Dict[str, Provider] = {}
+_BATCHER: Optional[MicroBatcher] = None
+_BATCHER_LOCK = threading.Lock()
+
+
+def register_provider(provider: Provider) -> Provider:
+    """Add (or replace) a provider under its lower-cased name."""
+    previous = PROVIDERS.get(provider.name.lower())
+    if previous is not None and previous is not provider:
+        previous.close()
+    PROVIDERS[provider.name.lower()] = provider
+    return provider
 
-    if model_name == "gpt4_dummy":
-        return _gpt4_dummy(prompt)
 
-    elif model_name == "llama3_dummy":
-        return _llama3_dummy(prompt)
+def register_http_models(base_url: str, model_names: Optional[List[str]] = None) -> List[str]:
+    """Register an "http:<model>" provider per model served at `base_url`."""
+    names = []
+    for model_name in model_names or list(DUMMY_MODELS):
+        provider = register_provider(HTTPProvider(f"http:{model_name}", base_url, model_name, version=MODEL_VERSION))
+        names.append(provider.name)
+    return names
 
-    elif model_name == "mistral_dummy":
-        return _mistral_dummy(prompt)
 
+def available_models() -> List[str]:
+    return list(PROVIDERS)
+
+
+def _unknown_model() -> str:
+    return f"Unknown model. Available: {', '.join(available_models())}."
+
+
+def generate_batch(model_name: str, prompts: List[str]) -> List[str]:
+    """One batched backend call for several prompts to the same model."""
+    provider = PROVIDERS.get(model_name.lower())
+    if provider is None:
+        return [_unknown_model()] * len(prompts)
+    return provider.generate_batch(prompts)
+
+
+def get_batcher(max_batch_size: int = 16, max_wait_ms: float = 10.0) -> MicroBatcher:
+    """The process-wide micro-batcher (created with these settings on first use)."""
+    global _BATCHER
+    with _BATCHER_LOCK:
+        if _BATCHER is None:
+            _BATCHER = MicroBatcher(generate_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        return _BATCHER
+
+
+def batcher_stats() -> Dict[str, dict]:
+    """MicroBatcher.stats() of the process-wide batcher; empty if it was never created."""
+    with _BATCHER_LOCK:
+        batcher = _BATCHER
+    return batcher.stats() if batcher is not None else {}
+
+
+@atexit.register
+def close_providers():
+    if _BATCHER is not None:
+        _BATCHER.close()
+    for provider in PROVIDERS.values():
+        provider.close()
+
+
+for _name, _fn in DUMMY_MODELS.items():
+    register_provider(DummyProvider(_name, _fn))
+
+if os.environ.get("MODEL_ENDPOINT_URL"):
+    register_http_models(os.environ["MODEL_ENDPOINT_URL"])
+
+
+# --- PUBLIC API -------------------------------------------------
+
+def stream_response(model_name: str, prompt: str, cache: Optional[ResponseCache] = None) -> Iterator[str]:
+    """
+    Yield the answer of `model_name` chunk by chunk as the provider produces
+    it. A cached answer is yielded as a single chunk; a freshly generated
+    one is cached once the stream completes.
+    """
+    model_name = model_name.lower()
+    provider = PROVIDERS.get(model_name)
+    if provider is None:
+        yield _unknown_model()
+        return
+
+    start = time.perf_counter()
+    key = make_key(model_name, prompt, model_version=provider.version)
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        observe("first_token_seconds", time.perf_counter() - start, model=model_name)
+        yield cached
     else:
-        return "Unknown model. Available: gpt4_dummy, llama3_dummy, mistral_dummy."
+        parts = []
+        for chunk in provider.stream(prompt):
+            if not parts:
+                observe("first_token_seconds", time.perf_counter() - start, model=model_name)
+            parts.append(chunk)
+            yield chunk
+        if cache is not None:
+            cache.put(key, model_name, "".join(parts))
+    observe("generate_response_seconds", time.perf_counter() - start, model=model_name)
+
+
+def generate_response(
+    model_name: str,
+    prompt: str,
+    cache: Optional[ResponseCache] = None,
+    batcher: Optional[MicroBatcher] = None,
+) -> str:
+    """
+    Universal generation function used by Streamlit.
+    Pass a ResponseCache to reuse answers for prompts seen before, and a
+    MicroBatcher to send the prompt in a batch with concurrent callers'.
+    """
+    if batcher is None:
+        return "".join(stream_response(model_name, prompt, cache=cache))
+
+    model_name = model_name.lower()
+    provider = PROVIDERS.get(model_name)
+    if provider is None:
+        return _unknown_model()
+
+    start = time.perf_counter()
+    key = make_key(model_name, prompt, model_version=provider.version)
+    response = cache.get(key) if cache is not None else None
+    if response is None:
+        response = batcher.submit(model_name, prompt).result()
+        if cache is not None:
+            cache.put(key, model_name, response)
+    observe("generate_response_seconds", time.perf_counter() - start, model=model_name)
+    return response
@@ -0,0 +1,98 @@
+"""
+Score each distinct input once.
+
+Many rows of an outputs frame are the same string: models often give the
+same answer to a task, and the same answer recurs across tasks. Scorers
+and guardrails run on one representative row per distinct key, and the
+results are broadcast back to every row with that key.
+
+Keys can be normalized first (e.g. lowercased) as long as the scorer
+gives the same result for every text that normalizes to the same key.
+"""
+import threading
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from instrumentation import count
+
+
+class DedupCounter:
+    __slots__ = ("rows", "unique")
+
+    def __init__(self):
+        self.rows = 0
+        self.unique = 0
+
+    @property
+    def ratio(self) -> float:
+        """Share of rows that did not need their own computation."""
+        return 1 - self.unique / self.rows if self.rows else 0.0
+
+
+COUNTERS: Dict[str, DedupCounter] = {}
+# stages can run on several threads at once (pipeline.py)
+_LOCK = threading.Lock()
+
+
+def record(stage: str, rows: int, unique: int):
+    with _LOCK:
+        counter = COUNTERS.setdefault(stage, DedupCounter())
+        counter.rows += rows
+        counter.unique += unique
+    count("dedup_rows", rows, stage=stage)
+    count("dedup_unique_rows", unique, stage=stage)
+
+
+def report(stage: str) -> str:
+    counter = COUNTERS.get(stage, DedupCounter())
+    return f"{stage}: {counter.rows} rows scored as {counter.unique} distinct ({counter.ratio:.1%} deduplicated)"
+
+
+def print_reports():
+    for stage in COUNTERS:
+        print(report(stage))
+
+
+# --- Key normalizers ---------------------------------------------
+
+def exact(values: pd.Series) -> pd.Series:
+    return values
+
+
+def stripped(values: pd.Series) -> pd.Series:
+    return values.str.strip()
+
+
+def stripped_lower(values: pd.Series) -> pd.Series:
+    return values.str.strip().str.lower()
+
+
+def lower_tokens(values: pd.Series) -> pd.Series:
+    """Lowercased whitespace tokens joined by single spaces (what str.lower().split() sees)."""
+    tokens = pc.utf8_split_whitespace(pc.utf8_lower(pa.array(values, type=pa.string())))
+    # leading/trailing whitespace leaves empty tokens; tokens never contain a space
+    joined = pc.utf8_trim(pc.binary_join(tokens, " "), " ")
+    return pd.Series(joined.to_numpy(zero_copy_only=False), index=values.index, dtype=object)
+
+
+# --- Deduplication -------------------------------------------------
+
+def group_codes(*keys: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (codes, first): rows i and j have equal keys iff codes[i] == codes[j],
+    and first[k] is the first row with code k.
+    """
+    codes = np.zeros(len(keys[0]), dtype=np.int64)
+    for key in keys:
+        key_codes, uniques = pd.factorize(key, use_na_sentinel=False)
+        codes, _ = pd.factorize(codes * max(len(uniques), 1) + key_codes)
+
+    n_unique = codes.max(initial=-1) + 1
+    first = np.empty(n_unique, dtype=np.int64)
+    # reversed so the first occurrence of each code is written last
+    first[codes[::-1]] = np.arange(len(codes))[::-1]
+    return codes, first
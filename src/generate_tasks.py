@@ -1,9 +1,20 @@
+import argparse
+from typing import Optional
+
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+from instrumentation import add_rows, instrument_job
+
 
-def build_tasks() -> pd.DataFrame:
-    """Create a small synthetic task set for LLM evaluation."""
+def build_tasks(n_tasks: Optional[int] = None, seed: int = 0) -> pd.DataFrame:
+    """
+    Create a small synthetic task set for LLM evaluation. With `n_tasks`,
+    scale it up to that many tasks for benchmarks (see scale_tasks).
+    """
+    if n_tasks is not None:
+        return scale_tasks(build_tasks(), n_tasks, seed)
 
     tasks = []
 
@@ -94,12 +105,48 @@ def build_tasks() -> pd.DataFrame:
     return pd.DataFrame(tasks)
 
 
+def scale_tasks(base: pd.DataFrame, n_tasks: int, seed: int = 0) -> pd.DataFrame:
+    """
+    `n_tasks` tasks with the category mix of `base`. Math tasks get fresh
+    numbers (and answers); the other categories cycle through the base
+    prompts. Task ids keep the r/s/c prefixes and are unique.
+    """
+    rng = np.random.default_rng(seed)
+    picks = base.iloc[np.arange(n_tasks) % len(base)].reset_index(drop=True)
+
+    prompts = picks["prompt"].to_numpy(dtype=object)
+    answers = picks["reference_answer"].to_numpy(dtype=object)
+    is_math = (picks["category"] == "math_reasoning").to_numpy()
+
+    have = rng.integers(2, 500, n_tasks)
+    more = rng.integers(1, 500, n_tasks)
+    for i in np.flatnonzero(is_math):
+        prompts[i] = f"John has {have[i]} apples and buys {more[i]} more. How many apples does he have now?"
+        answers[i] = str(have[i] + more[i])
+
+    prefixes = picks["task_id"].str[0].to_numpy(dtype=object)
+    return pd.DataFrame(
+        {
+            "task_id": [f"{p}{i + 1}" for i, p in enumerate(prefixes)],
+            "category": picks["category"].to_numpy(dtype=object),
+            "prompt": prompts,
+            "reference_answer": answers,
+        }
+    )
+
+
+@instrument_job("generate_tasks")
 def main():
+    parser = argparse.ArgumentParser(description="Write the evaluation task set to data/tasks.csv.")
+    parser.add_argument("--n-tasks", type=int, default=None, help="scale the task set up to this many tasks")
+    args = parser.parse_args()
+
     root = Path(__file__).resolve().parents[1]
     data_dir = root / "data"
     data_dir.mkdir(exist_ok=True)
 
-    tasks_df = build_tasks()
+    tasks_df = build_tasks(args.n_tasks)
+    add_rows(len(tasks_df))
     out_path = data_dir / "tasks.csv"
     tasks_df.to_csv(out_path, index=False)
     print(f"Saved {len(tasks_df)} tasks to {out_path}")
@@ -1,29 +1,107 @@
+"""
+Gradio UI for human labels.
+
+Nothing heavy happens at import: gradio is imported when the UI is
+built, and the scored outputs are opened on a background thread once
+the app is launched (or on the first click). They are read through a
+memory-mapped Arrow copy (mapped_table.py), as is the task table for
+the prompts. The queue only materializes the few columns it ranks tasks
+by, and the category, response and prompt are read for the rows on
+screen only. Each click checks (at most every REFRESH_INTERVAL_S)
+whether the scores dataset changed on disk and, if so, remaps only the
+changed files and rebuilds the queue.
+"""
+import threading
+import time
 from pathlib import Path
-import random
-
-import gradio as gr
-import pandas as pd
 
 
 RANDOM_SEED = 123
-random.seed(RANDOM_SEED)
-
-
-def load_data():
-    root = Path(__file__).resolve().parents[1]
-    data_dir = root / "data"
-    scored_path = data_dir / "auto_scores_with_guardrails.csv"
-    df = pd.read_csv(scored_path)
-
-    # sort for reproducibility
-    df = df.sort_values(["task_id", "model_name"]).reset_index(drop=True)
-    return df, data_dir
-
-
-def sample_task(df: pd.DataFrame):
-    task_id = random.choice(df["task_id"].unique().tolist())
-    subset = df[df["task_id"] == task_id]
-
+DATA_DIR = Path(__file__).resolve().parents[1] / "data"
+QUEUE_COLUMNS = ["task_id", "model_name", "auto_correctness", "is_toxic", "is_refusal"]
+TEXT_COLUMNS = ["category", "response"]
+REFRESH_INTERVAL_S = 5.0
+
+
+def data_source(data_dir: Path) -> Path:
+    from storage import dataset_path
+
+    for path in (dataset_path(data_dir, "auto_scores_with_guardrails"), data_dir / "auto_scores_with_guardrails.csv"):
+        if path.exists():
+            return path
+    raise FileNotFoundError("Expected data/datasets/auto_scores_with_guardrails. Run guardrails.py first.")
+
+
+class AnnotationData:
+    """The scored outputs, label store and queue, opened on first use."""
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = data_dir
+        self.table = None
+        self.tasks = None
+        self.task_rows = None
+        self.labels = None
+        self.queue = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        from label_store import default_store
+        from mapped_table import MappedTable
+
+        with self._lock:
+            if self.table is None:
+                self.labels = default_store(self.data_dir)
+                # Arrow copies live under this data dir's cache (data/cache/arrow)
+                cache_dir = self.data_dir / "cache" / "arrow"
+                self.table = MappedTable(data_source(self.data_dir), cache_dir)
+                self.tasks = MappedTable(self.data_dir / "tasks.csv", cache_dir)
+            now = time.monotonic()
+            if self.queue is not None and now - self._checked < REFRESH_INTERVAL_S:
+                return
+            self._checked = now
+            if self.tasks.refresh() or self.task_rows is None:
+                import pandas as pd
+
+                # task_id -> row of the task table, to look prompts up by
+                self.task_rows = pd.Index(self.tasks.to_pandas(["task_id"])["task_id"].astype(str))
+            if self.table.refresh() or self.queue is None:
+                previous = self.queue
+                self.queue = self._build_queue()
+                if previous is not None:
+                    # keep this pass's tasks from being handed out again
+                    self.queue.defer(previous.served())
+
+    def _build_queue(self):
+        import numpy as np
+
+        from annotation_queue import AnnotationQueue
+
+        df = self.table.to_pandas(QUEUE_COLUMNS)
+        # position in the mapped table, to fetch the text of the rows shown
+        df["row"] = np.arange(len(df))
+        return AnnotationQueue(df, self.labels.labeled_task_ids, seed=RANDOM_SEED)
+
+    def next_task(self):
+        """Rows (with prompt and response) of the next task, or None."""
+        self.load()
+        subset = self.queue.next_task()
+        if subset is None:
+            return None
+        texts = self.table.take(subset["row"].to_numpy(), TEXT_COLUMNS)
+        subset = subset.reset_index(drop=True).join(texts)
+        row = self.task_rows.get_indexer([str(subset["task_id"].iloc[0])])
+        prompt = self.tasks.take(row[row >= 0], ["prompt"])["prompt"]
+        subset["prompt"] = prompt.iloc[0] if len(prompt) else ""
+        return subset
+
+
+def sample_task(data: AnnotationData):
+    subset = data.next_task()
+    if subset is None:
+        return None
+
+    task_id = subset["task_id"].iloc[0]
     prompt = subset["prompt"].iloc[0]
     category = subset["category"].iloc[0]
 
@@ -33,11 +111,14 @@ def sample_task(df: pd.DataFrame):
     return task_id, category, prompt, models, responses
 
 
-DF, DATA_DIR = load_data()
+DATA = AnnotationData(DATA_DIR)
 
 
 def next_example():
-    task_id, category, prompt, models, responses = sample_task(DF)
+    task = sample_task(DATA)
+    if task is None:
+        return "", "No tasks to annotate.", []
+    task_id, category, prompt, models, responses = task
     # Build a combined display string
     text = f"Task ID: {task_id}\nCategory: {category}\n\nPrompt:\n{prompt}\n\n"
     for m, r in zip(models, responses):
@@ -46,8 +127,6 @@ def next_example():
 
 
 def save_feedback(task_id, models, best_model, helpfulness, correctness, safety, comments):
-    labels_path = DATA_DIR / "labels_humans.csv"
-
     records = []
     for m in models:
         records.append(
@@ -62,56 +141,57 @@ def save_feedback(task_id, models, best_model, helpfulness, correctness, safety,
             }
         )
 
-    df_new = pd.DataFrame(records)
+    # one append to the label store; export with `python src/label_store.py`
+    DATA.load()
+    DATA.labels.add_labels(records)
+    return "Feedback saved! Click 'Next example' to annotate another sample."
 
-    if labels_path.exists():
-        df_existing = pd.read_csv(labels_path)
-        df_all = pd.concat([df_existing, df_new], ignore_index=True)
-    else:
-        df_all = df_new
 
-    df_all.to_csv(labels_path, index=False)
-    return "Feedback saved! Click 'Next example' to annotate another sample."
+def build_ui():
+    import gradio as gr
 
+    with gr.Blocks() as demo:
+        gr.Markdown("# LLM Evaluation – Human Annotation UI")
 
-with gr.Blocks() as demo:
-    gr.Markdown("# LLM Evaluation – Human Annotation UI")
+        task_id_state = gr.State("")
+        models_state = gr.State([])
 
-    task_id_state = gr.State("")
-    models_state = gr.State([])
+        with gr.Row():
+            next_btn = gr.Button("Next example")
 
-    with gr.Row():
-        next_btn = gr.Button("Next example")
+        with gr.Row():
+            task_display = gr.Textbox(label="Task & Model Responses", lines=20)
 
-    with gr.Row():
-        task_display = gr.Textbox(label="Task & Model Responses", lines=20)
+        with gr.Row():
+            best_model = gr.Textbox(label="Which model performed best? (enter model name)")
+        with gr.Row():
+            helpfulness = gr.Slider(0, 5, step=1, value=3, label="Helpfulness (0–5)")
+            correctness = gr.Slider(0, 5, step=1, value=3, label="Correctness (0–5)")
+            safety = gr.Slider(0, 5, step=1, value=4, label="Safety (0–5)")
+        comments = gr.Textbox(label="Comments", lines=3)
 
-    with gr.Row():
-        best_model = gr.Textbox(label="Which model performed best? (enter model name)")
-    with gr.Row():
-        helpfulness = gr.Slider(0, 5, step=1, value=3, label="Helpfulness (0–5)")
-        correctness = gr.Slider(0, 5, step=1, value=3, label="Correctness (0–5)")
-        safety = gr.Slider(0, 5, step=1, value=4, label="Safety (0–5)")
-    comments = gr.Textbox(label="Comments", lines=3)
+        save_btn = gr.Button("Save feedback")
+        status = gr.Markdown("")
 
-    save_btn = gr.Button("Save feedback")
-    status = gr.Markdown("")
+        def on_next():
+            t_id, text, models = next_example()
+            return t_id, models, text
 
-    def on_next():
-        t_id, text, models = next_example()
-        return t_id, models, text
+        next_btn.click(on_next, outputs=[task_id_state, models_state, task_display])
 
-    next_btn.click(on_next, outputs=[task_id_state, models_state, task_display])
+        def on_save(task_id, models, best_model, helpfulness, correctness, safety, comments):
+            return save_feedback(task_id, models, best_model, helpfulness, correctness, safety, comments)
 
-    def on_save(task_id, models, best_model, helpfulness, correctness, safety, comments):
-        return save_feedback(task_id, models, best_model, helpfulness, correctness, safety, comments)
+        save_btn.click(
+            on_save,
+            inputs=[task_id_state, models_state, best_model, helpfulness, correctness, safety, comments],
+            outputs=status,
+        )
 
-    save_btn.click(
-        on_save,
-        inputs=[task_id_state, models_state, best_model, helpfulness, correctness, safety, comments],
-        outputs=status,
-    )
+    return demo
 
 
 if __name__ == "__main__":
-    demo.launch()
+    # open the data while gradio starts up; the first click waits for it if needed
+    threading.Thread(target=DATA.load, daemon=True).start()
+    build_ui().launch()
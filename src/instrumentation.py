@@ -0,0 +1,280 @@
+"""
+Low-overhead instrumentation for the pipeline scripts.
+
+- `span(name)` times a block and records the rows it handled
+  (`add_rows`) and the process memory high-water mark when it ends.
+- `count` and `observe` keep counters and fixed-bucket histograms
+  (e.g. per-model generate_response latency).
+- `instrument_job(job)` wraps a script's main() in a span and, on exit,
+  writes data/metrics/<job>.prom (Prometheus text format, suitable for
+  the node_exporter textfile collector) and data/metrics/<job>.trace.json
+  (Chrome trace format, opens in Perfetto / chrome://tracing).
+
+Recording is a perf_counter call and a few dict updates under a lock.
+Set EVAL_METRICS=0 to turn it off entirely. The memory high-water mark
+comes from the Unix `resource` module and is left out where that does
+not exist (Windows).
+"""
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+METRICS_DIR = Path(__file__).resolve().parents[1] / "data" / "metrics"
+ENABLED = os.environ.get("EVAL_METRICS", "1") != "0"
+PREFIX = "eval_"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# trace events kept per process; totals keep counting past this
+MAX_TRACE_EVENTS = 100_000
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """The process memory high-water mark, None where the platform does not report it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "rows")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.rows = 0
+
+    def add_rows(self, n: int):
+        self.rows += int(n)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = time.perf_counter()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.events: List[dict] = []
+            self.spans: Dict[str, List[float]] = {}  # name -> [seconds, calls, rows]
+            self.counters: Dict[Tuple[str, Labels], float] = {}
+            self.histograms: Dict[Tuple[str, Labels], dict] = {}
+
+    # --- recording ---------------------------------------------
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Span]:
+        current = Span(name, attrs)
+        if not ENABLED:
+            yield current
+            return
+
+        stack = self._stack()
+        stack.append(current)
+        try:
+            yield current
+        finally:
+            stack.pop()
+            self._finish(current, time.perf_counter())
+
+    def _finish(self, span: Span, end: float):
+        seconds = end - span.start
+        with self._lock:
+            totals = self.spans.setdefault(span.name, [0.0, 0, 0])
+            totals[0] += seconds
+            totals[1] += 1
+            totals[2] += span.rows
+            if len(self.events) < MAX_TRACE_EVENTS:
+                self.events.append(
+                    {
+                        "name": span.name,
+                        "ph": "X",
+                        "ts": round((span.start - self._origin) * 1e6, 1),
+                        "dur": round(seconds * 1e6, 1),
+                        "pid": os.getpid(),
+                        "tid": threading.get_ident(),
+                        "args": {"rows": span.rows, "peak_rss_bytes": peak_rss_bytes(), **span.attrs},
+                    }
+                )
+
+    def add_rows(self, n: int):
+        """Add `n` rows to the innermost open span of this thread."""
+        stack = self._stack()
+        if stack:
+            stack[-1].add_rows(n)
+
+    def count(self, name: str, value: float = 1, **labels):
+        if not ENABLED:
+            return
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS, **labels):
+        if not ENABLED:
+            return
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {"buckets": list(buckets), "counts": [0] * (len(buckets) + 1),
+                                               "sum": 0.0, "count": 0}
+            hist["counts"][bisect_left(hist["buckets"], value)] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    # --- export ------------------------------------------------
+
+    def to_prometheus(self, job: str) -> str:
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP {PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        with self._lock:
+            spans = {name: list(v) for name, v in self.spans.items()}
+            counters = dict(self.counters)
+            histograms = {key: dict(h, counts=list(h["counts"])) for key, h in self.histograms.items()}
+
+        if spans:
+            for suffix, idx, help_text in (
+                ("span_seconds_total", 0, "Wall time spent in each span."),
+                ("span_calls_total", 1, "Times each span was entered."),
+                ("span_rows_total", 2, "Rows handled in each span."),
+            ):
+                metric(suffix, "counter", help_text)
+                for name, totals in sorted(spans.items()):
+                    lines.append(f"{PREFIX}{suffix}{_labels((('job', job), ('span', name)))} {totals[idx]:g}")
+
+        peak = peak_rss_bytes()
+        if peak is not None:
+            metric("peak_rss_bytes", "gauge", "Process memory high-water mark.")
+            lines.append(f"{PREFIX}peak_rss_bytes{_labels((('job', job),))} {peak}")
+
+        for name in sorted({name for name, _ in counters}):
+            metric(f"{name}_total", "counter", f"{name} count.")
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{PREFIX}{name}_total{_labels((('job', job),) + labels)} {value:g}")
+
+        for name in sorted({name for name, _ in histograms}):
+            metric(name, "histogram", f"{name} distribution.")
+            for (n, labels), hist in sorted(histograms.items()):
+                if n != name:
+                    continue
+                base = (("job", job),) + labels
+                cumulative = 0
+                for le, c in zip([f"{b:g}" for b in hist["buckets"]] + ["+Inf"], hist["counts"]):
+                    cumulative += c
+                    lines.append(f"{PREFIX}{name}_bucket{_labels(base + (('le', le),))} {cumulative}")
+                lines.append(f"{PREFIX}{name}_sum{_labels(base)} {hist['sum']:g}")
+                lines.append(f"{PREFIX}{name}_count{_labels(base)} {hist['count']}")
+
+        return "\n".join(lines) + "\n"
+
+    def to_trace(self, job: str) -> dict:
+        with self._lock:
+            return {
+                "traceEvents": list(self.events),
+                "displayTimeUnit": "ms",
+                "otherData": {
+                    "job": job,
+                    "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    "peak_rss_bytes": peak_rss_bytes(),
+                    "spans": {name: {"seconds": s, "calls": c, "rows": r} for name, (s, c, r) in self.spans.items()},
+                    "histograms": [
+                        {"name": name, "labels": dict(labels), **hist} for (name, labels), hist in self.histograms.items()
+                    ],
+                    "counters": [
+                        {"name": name, "labels": dict(labels), "value": v} for (name, labels), v in self.counters.items()
+                    ],
+                },
+            }
+
+    def write(self, job: str, directory: Path = METRICS_DIR) -> Optional[Path]:
+        if not ENABLED:
+            return None
+        directory.mkdir(parents=True, exist_ok=True)
+        _atomic_write(directory / f"{job}.prom", self.to_prometheus(job))
+        _atomic_write(directory / f"{job}.trace.json", json.dumps(self.to_trace(job)))
+        return directory / f"{job}.prom"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _atomic_write(path: Path, text: str):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text)
+    tmp.replace(path)
+
+
+def histogram_quantile(hist: dict, q: float) -> Optional[float]:
+    """Upper bucket bound below which a fraction `q` of observations fall."""
+    if not hist["count"]:
+        return None
+    target = q * hist["count"]
+    cumulative = 0
+    for bound, c in zip(list(hist["buckets"]) + [float("inf")], hist["counts"]):
+        cumulative += c
+        if cumulative >= target:
+            return bound
+    return float("inf")
+
+
+REGISTRY = Registry()
+span = REGISTRY.span
+add_rows = REGISTRY.add_rows
+count = REGISTRY.count
+observe = REGISTRY.observe
+
+
+def instrument_job(job: str):
+    """Decorator for a script's main(): one top-level span, metrics written on exit."""
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            try:
+                with span(job):
+                    return fn(*args, **kwargs)
+            finally:
+                path = REGISTRY.write(job)
+                if path is not None:
+                    print(f"Metrics written to {path}")
+
+        return wrapper
+
+    return decorator
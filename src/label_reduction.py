@@ -0,0 +1,123 @@
+"""
+Reduce human labels to one row per (task_id, model_name).
+
+Several annotators can label the same answer. Joining the raw labels
+onto the auto scores would repeat the auto-score row once per label, so
+every mean downstream would weigh heavily annotated answers more.
+`reduce_labels` collapses them first: the mean of each score (is_best
+becomes the share of annotators who picked the answer), the median of
+each human score, the number of labels and the distinct comments.
+
+`agreement` measures how far annotators agree, per model and overall,
+with Krippendorff's alpha over the answers labeled more than once. The
+store does not record who gave a label, so the coefficient has to be
+one that treats annotators as interchangeable (Cohen's kappa needs fixed
+rater pairs). Scores use the interval distance; for the 0/1 is_best flag
+that equals the nominal one.
+
+Everything is computed from per-answer sums (count, sum, sum of squares)
+in a few groupbys, without a Python loop over answers.
+"""
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+import schema
+
+
+PAIR_KEYS = ["task_id", "model_name"]
+HUMAN_SCORES = ["helpfulness", "correctness_human", "safety_human"]
+LABEL_SCORES = ["is_best", *HUMAN_SCORES]
+LABEL_COUNT = "n_labels"
+COMMENT_SEPARATOR = " | "
+
+AGREEMENT_COLUMNS = ["model_name", "metric", "alpha", "n_answers", "n_labels"]
+ALL_MODELS = "(all)"
+
+
+def median_column(metric: str) -> str:
+    return f"{metric}_median"
+
+
+def _comments(labels: pd.DataFrame) -> pd.Series:
+    """Distinct non-empty comments per pair, in label order."""
+    comments = labels["comments"].str.strip()
+    kept = labels.loc[comments.fillna("") != "", PAIR_KEYS].assign(comments=comments)
+    kept = kept.drop_duplicates()
+    return kept.groupby(PAIR_KEYS, observed=True, sort=False)["comments"].agg(COMMENT_SEPARATOR.join)
+
+
+def reduce_labels(labels: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per (task_id, model_name): mean of every label score, median
+    of every human score, the label count (n_labels) and the joined
+    comments.
+    """
+    labels = schema.compact(labels)
+    scores = [c for c in LABEL_SCORES if c in labels.columns]
+    medians = [c for c in HUMAN_SCORES if c in labels.columns]
+    values = labels[PAIR_KEYS + scores].astype({c: np.float64 for c in scores})
+
+    grouped = values.groupby(PAIR_KEYS, observed=True, sort=False)
+    parts = [
+        grouped[scores].mean(),
+        grouped[medians].median().rename(columns=median_column),
+        grouped.size().rename(LABEL_COUNT).astype(np.int32),
+    ]
+    reduced = pd.concat(parts, axis=1).reset_index()
+    if "comments" in labels.columns:
+        # most pairs have no comment; join the few that do
+        reduced = reduced.merge(_comments(labels).reset_index(), on=PAIR_KEYS, how="left")
+    # medians are scores too (float32)
+    return schema.compact(reduced).astype({median_column(c): schema.SCORE_DTYPE for c in medians})
+
+
+def _unit_sums(labels: pd.DataFrame, metric: str) -> pd.DataFrame:
+    """
+    Per answer labeled at least twice: label count m, sum s, and the
+    within-answer disagreement (m * sum of squares - s^2) / (m - 1).
+    """
+    values = pd.to_numeric(labels[metric], errors="coerce").astype(np.float64)
+    frame = labels[PAIR_KEYS].assign(v=values, v2=values * values).dropna(subset=["v"])
+    units = frame.groupby(PAIR_KEYS, observed=True, sort=False).agg(m=("v", "size"), s=("v", "sum"), q=("v2", "sum"))
+    units = units[units["m"] >= 2]
+    return units.assign(within=(units["m"] * units["q"] - units["s"] ** 2) / (units["m"] - 1)).reset_index()
+
+
+def _alpha(units: pd.DataFrame, by: pd.Series) -> pd.DataFrame:
+    """
+    Krippendorff's alpha (interval) per group of answers:
+    1 - (n - 1) * sum(within) / (n * Q - S^2),
+    with n, S, Q the label count, sum and sum of squares over the group.
+    """
+    groups = units.groupby(by, observed=True).agg(
+        n_answers=("m", "size"), n_labels=("m", "sum"), S=("s", "sum"), Q=("q", "sum"), within=("within", "sum")
+    )
+    spread = groups["n_labels"] * groups["Q"] - groups["S"] ** 2
+    # identical values everywhere: agreement is undefined, not perfect
+    alpha = 1 - (groups["n_labels"] - 1) * groups["within"] / spread.where(spread > 1e-9)
+    return groups[["n_answers", "n_labels"]].assign(alpha=alpha)
+
+
+def agreement(labels: Optional[pd.DataFrame], metrics: List[str] = LABEL_SCORES) -> pd.DataFrame:
+    """
+    Krippendorff's alpha of every label metric, per model and over all
+    models (model_name == "(all)"), with the number of answers labeled
+    more than once and their labels.
+    """
+    rows = []
+    if labels is not None and len(labels):
+        labels = schema.compact(labels)
+        for metric in [m for m in metrics if m in labels.columns]:
+            units = _unit_sums(labels, metric)
+            if units.empty:
+                continue
+            per_model = _alpha(units, units["model_name"].astype(schema.TEXT_DTYPE))
+            overall = _alpha(units, pd.Series(ALL_MODELS, index=units.index))
+            table = pd.concat([per_model, overall]).rename_axis("model_name").reset_index()
+            rows.append(table.assign(metric=metric))
+    if not rows:
+        return pd.DataFrame(columns=AGREEMENT_COLUMNS)
+    out = pd.concat(rows, ignore_index=True)[AGREEMENT_COLUMNS]
+    return out.astype({"model_name": schema.TEXT_DTYPE, "alpha": np.float64, "n_answers": np.int64, "n_labels": np.int64})
@@ -0,0 +1,161 @@
+"""
+Append-only store for human annotation labels.
+
+Labels are inserted into a SQLite database in WAL mode, so each save is a
+single small insert and several annotators (threads or processes) can
+save at the same time without losing each other's rows. `export` compacts
+the store into the labels_humans.csv / .parquet file that
+aggregate_results.py reads.
+
+    python src/label_store.py            # export data/labels_humans.csv
+    python src/label_store.py --parquet  # export data/labels_humans.parquet
+"""
+import argparse
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+import pandas as pd
+
+
+LABEL_COLUMNS = ["task_id", "model_name", "is_best", "helpfulness", "correctness_human", "safety_human", "comments"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS labels (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    is_best INTEGER,
+    helpfulness REAL,
+    correctness_human REAL,
+    safety_human REAL,
+    comments TEXT,
+    created_at REAL NOT NULL
+);
+"""
+
+
+class LabelStore:
+    def __init__(self, path, import_csv: Optional[Path] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        # carry over labels collected before the store existed; the emptiness
+        # check and the import share one transaction, so two processes opening
+        # a new store at once import the CSV only once
+        if import_csv is not None and Path(import_csv).exists():
+            self._insert(pd.read_csv(import_csv).to_dict("records"), only_if_empty=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add_labels(self, records: Iterable[dict]):
+        """Append label rows in one transaction."""
+        self._insert(records)
+
+    def _insert(self, records: Iterable[dict], only_if_empty: bool = False):
+        now = time.time()
+        rows = [
+            tuple(_sql_value(record.get(col)) for col in LABEL_COLUMNS) + (now,)
+            for record in records
+        ]
+        if not rows:
+            return
+
+        marks = ",".join("?" * (len(LABEL_COLUMNS) + 1))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if not only_if_empty or self._conn.execute("SELECT COUNT(*) FROM labels").fetchone()[0] == 0:
+                    self._conn.executemany(
+                        f"INSERT INTO labels ({', '.join(LABEL_COLUMNS)}, created_at) VALUES ({marks})", rows
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM labels").fetchone()[0]
+
+    def labeled_task_ids(self) -> list:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT task_id FROM labels")]
+
+    def to_frame(self) -> pd.DataFrame:
+        """All labels in insertion order, with the labels_humans.csv columns."""
+        with self._lock:
+            return pd.read_sql_query(f"SELECT {', '.join(LABEL_COLUMNS)} FROM labels ORDER BY id", self._conn)
+
+    def export(self, out_path: Path) -> Path:
+        """Write all labels to CSV or Parquet (by suffix), replacing the file atomically."""
+        out_path = Path(out_path)
+        df = self.to_frame()
+        tmp = out_path.with_name(out_path.name + ".tmp")
+        if out_path.suffix == ".parquet":
+            df.to_parquet(tmp, index=False)
+        else:
+            df.to_csv(tmp, index=False)
+        tmp.replace(out_path)
+        return out_path
+
+
+def _sql_value(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if hasattr(value, "item"):
+        # numpy scalars -> python
+        return value.item()
+    return value
+
+
+def default_store(data_dir: Path) -> LabelStore:
+    """The store used by the annotation UI, seeded from labels_humans.csv."""
+    data_dir = Path(data_dir)
+    return LabelStore(data_dir / "labels.sqlite", import_csv=data_dir / "labels_humans.csv")
+
+
+def load_labels(data_dir: Path) -> Optional[pd.DataFrame]:
+    """Labels from the store if it exists, else from labels_humans.csv, else None."""
+    data_dir = Path(data_dir)
+    if (data_dir / "labels.sqlite").exists():
+        with default_store(data_dir) as store:
+            return store.to_frame()
+    labels_path = data_dir / "labels_humans.csv"
+    if labels_path.exists():
+        return pd.read_csv(labels_path)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the human label store.")
+    parser.add_argument("--parquet", action="store_true", help="write labels_humans.parquet instead of CSV")
+    args = parser.parse_args()
+
+    root = Path(__file__).resolve().parents[1]
+    data_dir = root / "data"
+
+    out_path = data_dir / ("labels_humans.parquet" if args.parquet else "labels_humans.csv")
+    with default_store(data_dir) as store:
+        store.export(out_path)
+        print(f"Exported {store.count()} labels to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
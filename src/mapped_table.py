@@ -0,0 +1,160 @@
+"""
+Memory-mapped Arrow copies of pipeline outputs for the interactive apps.
+
+Every Parquet file of a stage dataset (or a single Parquet/CSV file) is
+converted once to an uncompressed Arrow IPC file under
+data/cache/arrow/<source>/, named after the source file's path, size and
+mtime.
+Opening the table then maps those files: nothing is decoded up front,
+and the OS only pages in the columns and rows that are actually read.
+
+`refresh()` compares the source files' sizes and mtimes with the last
+look. Only new or modified files are converted again; the rest of the
+table stays mapped, and cache files no source file needs any more are
+removed.
+"""
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from schema import CSV_DTYPES
+from storage import decode_dictionaries, open_dataset
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[1] / "data" / "cache" / "arrow"
+# take() slices this few rows one by one instead of gathering across all files
+MAX_SLICED_ROWS = 1024
+# quoted prompts can span lines, and ids/answers such as "007" must stay text
+CSV_PARSE_OPTIONS = pacsv.ParseOptions(newlines_in_values=True)
+CSV_CONVERT_OPTIONS = pacsv.ConvertOptions(column_types={col: pa.string() for col in CSV_DTYPES})
+# bump when the conversion changes so existing cache files are rebuilt
+CACHE_VERSION = "2"
+
+Signature = Tuple[Tuple[str, int, int], ...]
+
+
+def source_files(source: Path) -> List[Path]:
+    source = Path(source)
+    if source.is_dir():
+        return sorted(source.rglob("*.parquet"))
+    return [source] if source.exists() else []
+
+
+def signature(source: Path) -> Signature:
+    """(path, size, mtime) of every file behind `source`; changes when any file does."""
+    out = []
+    for path in source_files(source):
+        stat = path.stat()
+        out.append((str(path), stat.st_size, stat.st_mtime_ns))
+    return tuple(out)
+
+
+class MappedTable:
+    def __init__(self, source: Path, cache_dir: Path = DEFAULT_CACHE_DIR):
+        self.source = Path(source)
+        source_key = hashlib.sha256(str(self.source.resolve()).encode()).hexdigest()[:12]
+        self.cache_dir = Path(cache_dir) / f"{self.source.name}-{source_key}"
+        self._signature: Signature = ()
+        # source file entry -> (cache file, mapped table)
+        self._fragments: Dict[Tuple[str, int, int], Tuple[Path, pa.Table]] = {}
+        # (table, per-file slices of it, first row of each slice), swapped in one step
+        self._snapshot: Optional[Tuple[pa.Table, List[pa.Table], np.ndarray]] = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> bool:
+        """Pick up changes to the source files; True if the table changed."""
+        with self._lock:
+            current = signature(self.source)
+            if current == self._signature and self._snapshot is not None:
+                return False
+
+            dataset = open_dataset(self.source) if self.source.is_dir() else None
+            parts = {Path(f.path): f for f in dataset.get_fragments()} if dataset is not None else {}
+
+            fragments = {}
+            for entry in current:
+                fragment = self._fragments.get(entry)
+                if fragment is None:
+                    fragment = self._map(entry, parts.get(Path(entry[0])), dataset)
+                fragments[entry] = fragment
+
+            keep = {path for path, _ in fragments.values()}
+            for path in self.cache_dir.glob("*.arrow"):
+                if path not in keep:
+                    # safe on POSIX even while a caller still maps it
+                    path.unlink(missing_ok=True)
+
+            self._fragments = fragments
+            self._signature = current
+            tables = [table for _, table in fragments.values()]
+            table = pa.concat_tables(tables, promote_options="default") if tables else pa.table({})
+            offsets = np.cumsum([0] + [t.num_rows for t in tables]).astype(np.int64)
+            parts = [table.slice(start, t.num_rows) for start, t in zip(offsets, tables)]
+            self._snapshot = (table, parts, offsets)
+            return True
+
+    def _current(self):
+        if self._snapshot is None:
+            self.refresh()
+        return self._snapshot
+
+    @property
+    def table(self) -> pa.Table:
+        return self._current()[0]
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def to_pandas(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Only `columns` (those present) are materialized."""
+        table = self.table
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.column_names])
+        return table.to_pandas()
+
+    def take(self, rows: Sequence[int], columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """The given rows (positions in `table`), only `columns` of them."""
+        table, parts, offsets = self._current()
+        names = table.column_names if columns is None else [c for c in columns if c in table.column_names]
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) > MAX_SLICED_ROWS:
+            return table.select(names).take(pa.array(rows)).to_pandas()
+
+        # Table.take gathers across every mapped file (touching all of them);
+        # slicing the file each row lives in keeps this proportional to len(rows)
+        which = np.searchsorted(offsets, rows, side="right") - 1
+        pieces = [parts[i].select(names).slice(row - offsets[i], 1) for i, row in zip(which, rows)]
+        if not pieces:
+            return table.select(names).slice(0, 0).to_pandas()
+        return pa.concat_tables(pieces).to_pandas()
+
+    # --- conversion --------------------------------------------
+
+    def _map(self, entry: Tuple[str, int, int], fragment: Optional[ds.Fragment], dataset: Optional[ds.Dataset]):
+        path = Path(entry[0])
+        key = hashlib.sha256(repr((CACHE_VERSION, entry)).encode()).hexdigest()[:16]
+        out = self.cache_dir / f"{path.stem}-{key}.arrow"
+        if not out.exists():
+            if fragment is not None:
+                # a file of the dataset, with its hive partition columns filled in
+                table = fragment.to_table(schema=dataset.schema)
+            elif path.suffix == ".csv":
+                table = pacsv.read_csv(path, parse_options=CSV_PARSE_OPTIONS, convert_options=CSV_CONVERT_OPTIONS)
+            else:
+                table = pq.read_table(path)
+            table = decode_dictionaries(table)
+
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = out.with_name(out.name + ".tmp")
+            with pa.OSFile(str(tmp), "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            tmp.replace(out)
+        return out, ipc.open_file(pa.memory_map(str(out), "r")).read_all()
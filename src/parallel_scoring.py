@@ -0,0 +1,126 @@
+"""
+Multi-core rubric + guardrail scoring.
+
+Merged outputs are sharded by a stable hash of task_id, each shard is
+scored and guardrail-checked in a process pool, and the shards are put
+back in their original row order. The result is identical to running
+the rubric and then the guardrails serially.
+
+The reference index is sent to each worker process once, when it
+starts, rather than with every shard. Process start-up and moving the
+shards between processes cost about a second, so inputs too small to
+give every worker MIN_ROWS_PER_WORKER rows, or a machine with a single
+usable CPU, are scored serially in this process instead.
+"""
+import math
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import schema
+from guardrails import apply_guardrails_incremental
+from scoring_rubric import apply_rubric_incremental
+from semantic_similarity import ReferenceIndex, load_reference_index
+
+# below this many rows per worker the pool costs more than it saves
+MIN_ROWS_PER_WORKER = 250_000
+
+# set in each worker process by _init_worker
+_SIMILARITY: Optional[ReferenceIndex] = None
+
+
+def shard_ids(task_ids: pd.Series, n_shards: int) -> np.ndarray:
+    """Stable shard number per row; every row of a task lands in the same shard."""
+    # pandas' hash is seeded identically in every process, unlike hash()
+    hashes = pd.util.hash_pandas_object(task_ids.astype(str), index=False).to_numpy()
+    return (hashes % np.uint64(n_shards)).astype(np.int64)
+
+
+def usable_cpus() -> int:
+    # the CPUs this process may run on, which can be fewer than the machine has
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _score(tasks: pd.DataFrame, outputs: pd.DataFrame, similarity: Optional[ReferenceIndex]) -> pd.DataFrame:
+    scored = apply_rubric_incremental(tasks, outputs, None, log=False, similarity=similarity)
+    return apply_guardrails_incremental(scored, None, log=False)
+
+
+def _init_worker(similarity: Optional[ReferenceIndex]):
+    global _SIMILARITY
+    _SIMILARITY = similarity
+
+
+def _score_shard(tasks: pd.DataFrame, outputs: pd.DataFrame) -> Tuple[pd.DataFrame, int, int, float]:
+    start = time.perf_counter()
+    scored = _score(tasks, outputs, _SIMILARITY)
+    return scored, os.getpid(), len(outputs), time.perf_counter() - start
+
+
+def score_parallel(
+    tasks: pd.DataFrame,
+    outputs: pd.DataFrame,
+    workers: int,
+    shard_size: int = 100_000,
+) -> Tuple[pd.DataFrame, Dict[int, dict]]:
+    """
+    Rubric + guardrails over `outputs` on up to `workers` processes
+    (fewer if there are fewer usable CPUs or rows; see
+    MIN_ROWS_PER_WORKER).
+
+    Returns the scored frame, in the same row order as a serial run, and
+    per-worker stats ({pid: {"rows", "seconds", "shards"}}); the stats
+    are empty when the rows were scored serially.
+    """
+    outputs = outputs.reset_index(drop=True)
+    # fitted on all tasks, not per shard, so shards score like a serial run
+    similarity = load_reference_index(tasks)
+    n_shards = max(1, math.ceil(len(outputs) / shard_size))
+    workers = min(workers, usable_cpus(), n_shards, len(outputs) // MIN_ROWS_PER_WORKER)
+    if workers <= 1:
+        return _score(tasks, outputs, similarity), {}
+    shard_of_row = shard_ids(outputs["task_id"], n_shards)
+
+    positions: List[np.ndarray] = []
+    futures = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(similarity,)) as pool:
+        for shard in range(n_shards):
+            rows = np.flatnonzero(shard_of_row == shard)
+            if not len(rows):
+                continue
+            shard_outputs = outputs.iloc[rows]
+            shard_tasks = tasks[tasks["task_id"].isin(shard_outputs["task_id"].unique())]
+            positions.append(rows)
+            futures.append(pool.submit(_score_shard, shard_tasks, shard_outputs))
+
+        results = [f.result() for f in futures]
+
+    stats: Dict[int, dict] = defaultdict(lambda: {"rows": 0, "seconds": 0.0, "shards": 0})
+    for _, pid, n_rows, seconds in results:
+        stats[pid]["rows"] += n_rows
+        stats[pid]["seconds"] += seconds
+        stats[pid]["shards"] += 1
+
+    if not results:
+        return _score(tasks, outputs, similarity), {}
+
+    # deterministic merge: put every row back at its original position
+    merged = pd.concat([scored for scored, *_ in results], ignore_index=True)
+    order = np.argsort(np.concatenate(positions), kind="stable")
+    # shards compacted on their own have different categories, which concat turns into plain strings
+    return schema.compact(merged.iloc[order].reset_index(drop=True)), dict(stats)
+
+
+def print_worker_stats(stats: Dict[int, dict]):
+    if not stats:
+        print(f"scored serially (fewer than {MIN_ROWS_PER_WORKER:,} rows per worker, or a single usable CPU)")
+    for i, (pid, s) in enumerate(sorted(stats.items()), start=1):
+        rate = s["rows"] / s["seconds"] if s["seconds"] else float("inf")
+        print(f"worker {i} (pid {pid}): {s['shards']} shards, {s['rows']} rows, {s['seconds']:.2f}s, {rate:,.0f} rows/s")
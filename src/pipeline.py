@@ -0,0 +1,219 @@
+"""
+Run the whole evaluation in one process.
+
+The stages hand their frames to each other in memory instead of writing
+a file for the next script to parse:
+
+    build_tasks
+      -> generate_outputs_for_model     (models one after another)
+      -> rubric | guardrails            (per model, as soon as its outputs exist)
+      -> merge with labels, rollups, bootstrap
+
+Stages that do not depend on each other run concurrently on a thread
+pool: the reference index and the human labels load while the first
+model generates, each model is scored while the next one generates, the
+rubric and the guardrails (both only need the responses) run side by
+side, and the bootstrap runs while the other artifacts are written.
+Models still generate in order from the same seed, so the results equal
+those of the scripts.
+
+The dashboard artifacts are always written. Intermediate files
+(tasks.csv and the outputs / auto_scores_with_guardrails datasets) only
+with --persist.
+
+    python src/pipeline.py --n-tasks 100000 --persist
+    python src/pipeline.py --n-tasks 100000 --compare   # also time the scripts
+"""
+import argparse
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import dedup
+import schema
+from aggregate_results import aggregate_frames, build_rollup
+from generate_tasks import build_tasks
+from guardrails import FINGERPRINT_COLUMN as GUARDRAIL_FINGERPRINT
+from guardrails import GUARDRAIL_COLUMNS, apply_guardrails_incremental
+from instrumentation import instrument_job, span
+from label_store import load_labels
+from response_cache import DEFAULT_MAX_BYTES, ResponseCache
+from run_models import RANDOM_SEED, generate_outputs_for_model, model_configs
+from scoring_rubric import apply_rubric_incremental
+from semantic_similarity import load_reference_index
+from storage import load_stage, save_stage
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_WORKERS = 4
+
+
+def _rubric(tasks: pd.DataFrame, outputs: pd.DataFrame, similarity: Future) -> pd.DataFrame:
+    return apply_rubric_incremental(tasks, outputs, None, log=False, similarity=similarity.result())
+
+
+def _guardrails(outputs: pd.DataFrame) -> pd.DataFrame:
+    checked = apply_guardrails_incremental(outputs, None, log=False)
+    return checked[[*GUARDRAIL_COLUMNS, GUARDRAIL_FINGERPRINT]]
+
+
+def run_pipeline(
+    data_dir: Path,
+    artifacts_dir: Path,
+    n_tasks: Optional[int] = None,
+    n_models: Optional[int] = None,
+    cache: Optional[ResponseCache] = None,
+    persist: bool = False,
+    workers: int = DEFAULT_WORKERS,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Tasks -> outputs -> rubric + guardrails -> aggregate artifacts, in memory.
+    Returns (guardrail-checked scores, merged with labels).
+    """
+    configs = model_configs() if n_models is None else model_configs(n_models)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    # the same draws run_models.py makes after importing
+    random.seed(RANDOM_SEED)
+    np.random.seed(RANDOM_SEED)
+
+    with ThreadPoolExecutor(workers, thread_name_prefix="pipeline") as pool:
+        with span("pipeline.tasks") as s:
+            tasks = schema.compact(build_tasks(n_tasks))
+            s.add_rows(len(tasks))
+        similarity = pool.submit(load_reference_index, tasks)
+        labels = pool.submit(load_labels, data_dir)
+        writes: List[Future] = []
+        if persist:
+            writes.append(pool.submit(tasks.to_csv, data_dir / "tasks.csv", index=False))
+
+        outputs: List[pd.DataFrame] = []
+        scored: List[Tuple[Future, Future]] = []
+        for model_name, quality in configs:
+            with span("pipeline.generate", model=model_name) as s:
+                model_outputs = generate_outputs_for_model(tasks, model_name, quality, cache=cache)
+                s.add_rows(len(model_outputs))
+            outputs.append(model_outputs)
+            rubric = pool.submit(_rubric, tasks, model_outputs, similarity)
+            scored.append((rubric, pool.submit(_guardrails, model_outputs)))
+
+        if persist:
+            all_outputs = pd.concat(outputs, ignore_index=True)
+            writes.append(pool.submit(save_stage, all_outputs, data_dir, "outputs", ["model_name"]))
+
+        with span("pipeline.score") as s:
+            parts = [pd.concat([rubric.result(), guard.result()], axis=1) for rubric, guard in scored]
+            # model_name categories differ per model, so compact again after concat
+            result = schema.compact(pd.concat(parts, ignore_index=True))
+            s.add_rows(len(result))
+        if persist:
+            writes.append(
+                pool.submit(save_stage, result, data_dir, "auto_scores_with_guardrails", ["model_name", "category"])
+            )
+
+        merged = aggregate_frames(result, labels.result(), tasks, artifacts_dir, pool=pool)
+        for write in writes:
+            write.result()
+    return result, merged
+
+
+# --- Script-by-script comparison --------------------------------
+
+def script_commands(n_tasks: Optional[int], n_models: Optional[int]) -> List[List[str]]:
+    """The scripts the pipeline replaces, with equivalent arguments (no caches, full rescoring)."""
+    tasks_args = [] if n_tasks is None else ["--n-tasks", str(n_tasks)]
+    models_args = [] if n_models is None else ["--n-models", str(n_models)]
+    return [
+        ["generate_tasks.py", *tasks_args],
+        ["run_models.py", "--no-cache", *models_args],
+        ["scoring_rubric.py", "--full"],
+        ["guardrails.py", "--full"],
+        ["aggregate_results.py"],
+    ]
+
+
+def run_scripts(commands: List[List[str]]) -> Dict[str, float]:
+    """Wall time of each script, run one after another in its own interpreter."""
+    timings = {}
+    for script, *args in commands:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, str(ROOT / "src" / script), *args], check=True, stdout=subprocess.DEVNULL)
+        timings[script] = time.perf_counter() - start
+    return timings
+
+
+def _sorted(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.astype({c: schema.TEXT_DTYPE for c in schema.KEY_COLUMNS if c in df.columns})
+    return out.sort_values(["model_name", "task_id"], kind="stable").reset_index(drop=True)
+
+
+def same_results(scripts: pd.DataFrame, pipeline: pd.DataFrame) -> bool:
+    """Equal rows and values, ignoring row order (datasets come back partition by partition)."""
+    try:
+        pd.testing.assert_frame_equal(_sorted(scripts), _sorted(pipeline))
+    except AssertionError:
+        return False
+    return True
+
+
+@instrument_job("pipeline")
+def main():
+    parser = argparse.ArgumentParser(description="Run every evaluation stage in one process.")
+    parser.add_argument("--n-tasks", type=int, default=None, help="scale the task set up to this many tasks")
+    parser.add_argument("--n-models", type=int, default=None, help="number of dummy models to run")
+    parser.add_argument("--persist", action="store_true", help="also write tasks.csv and the stage datasets")
+    parser.add_argument("--no-cache", action="store_true", help="regenerate every response")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024))
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="threads for concurrent stages")
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="first run the scripts one by one (writing data/ and artifacts/ as they do), then the pipeline; "
+        "report both wall times and check the results match (implies --no-cache)",
+    )
+    args = parser.parse_args()
+
+    data_dir = ROOT / "data"
+    artifacts_dir = ROOT / "artifacts"
+
+    script_timings = None
+    if args.compare:
+        script_timings = run_scripts(script_commands(args.n_tasks, args.n_models))
+        script_scores = load_stage(data_dir, "auto_scores_with_guardrails")
+        script_rollup = pd.read_parquet(artifacts_dir / "eval_rollup.parquet")
+
+    cache = None
+    if not (args.no_cache or args.compare):
+        cache = ResponseCache(data_dir / "cache" / "responses.sqlite", max_bytes=int(args.cache_max_mb * 1024 * 1024))
+
+    start = time.perf_counter()
+    result, merged = run_pipeline(
+        data_dir, artifacts_dir, args.n_tasks, args.n_models, cache=cache, persist=args.persist, workers=args.workers
+    )
+    elapsed = time.perf_counter() - start
+    dedup.print_reports()
+    print(f"Pipeline: {len(result):,} scored rows in {elapsed:.2f}s")
+
+    if script_timings is not None:
+        scripts_total = sum(script_timings.values())
+        for script, seconds in script_timings.items():
+            print(f"  {script:<22} {seconds:8.2f}s")
+        print(f"  {'scripts one by one':<22} {scripts_total:8.2f}s")
+        print(f"  {'pipeline in one process':<22} {elapsed:8.2f}s ({scripts_total / elapsed:.1f}x faster)")
+        rollup_matches = np.allclose(
+            build_rollup(merged).select_dtypes("number").to_numpy(dtype=float),
+            script_rollup.select_dtypes("number").to_numpy(dtype=float),
+            equal_nan=True,
+        )
+        if not same_results(script_scores, result) or not rollup_matches:
+            raise SystemExit("Pipeline results differ from the script-by-script run")
+        print("Scores and rollups match the script-by-script run")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Persistent, content-addressed cache for model responses.
+
+Entries are keyed by a hash of (model name, prompt, generation params,
+model version) and stored in a SQLite database in WAL mode, so several
+processes can read and write the same cache safely. The cache is bounded
+by total response size and evicts least-recently-used entries.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    model_name TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0), ('evictions', 0), ('total_bytes', 0);
+"""
+
+# SQLite limits the number of bound parameters per statement
+_BATCH = 500
+
+
+def make_key(model_name: str, prompt: str, params: Optional[dict] = None, model_version: str = "") -> str:
+    """Stable content hash for one generation request."""
+    payload = json.dumps([model_name, prompt, params or {}, model_version], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        # counters for this process; cumulative ones live in the database
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Reads ---------------------------------------------------
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Look up many keys at once; returns only the keys that were found."""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, str] = {}
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for start in range(0, len(keys), _BATCH):
+                    chunk = keys[start:start + _BATCH]
+                    marks = ",".join("?" * len(chunk))
+                    rows = self._conn.execute(
+                        f"SELECT key, response FROM entries WHERE key IN ({marks})", chunk
+                    ).fetchall()
+                    found.update(rows)
+                    self._conn.execute(
+                        f"UPDATE entries SET last_access = ? WHERE key IN ({marks})", [now, *chunk]
+                    )
+
+                hits, misses = len(found), len(keys) - len(found)
+                self._bump(hits=hits, misses=misses)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        self.hits += hits
+        self.misses += misses
+        return found
+
+    def get(self, key: str) -> Optional[str]:
+        return self.get_many([key]).get(key)
+
+    # --- Writes --------------------------------------------------
+
+    def put_many(self, items: Iterable[Tuple[str, str, str]]):
+        """Store (key, model_name, response) triples, then evict down to max_bytes."""
+        now = time.time()
+        # last write wins for repeated keys within one batch
+        latest = {key: (model_name, response) for key, model_name, response in items}
+        rows = [
+            (key, model_name, response, len(response.encode("utf-8")), now)
+            for key, (model_name, response) in latest.items()
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for key, *_ in rows:
+                    self._conn.execute(
+                        "UPDATE counters SET value = value - COALESCE((SELECT size FROM entries WHERE key = ?), 0) "
+                        "WHERE name = 'total_bytes'",
+                        (key,),
+                    )
+                self._conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", rows)
+                self._bump(total_bytes=sum(row[3] for row in rows))
+                self._evict()
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def put(self, key: str, model_name: str, response: str):
+        self.put_many([(key, model_name, response)])
+
+    def get_or_generate(
+        self,
+        model_name: str,
+        prompt: str,
+        generate: Callable[[], str],
+        params: Optional[dict] = None,
+        model_version: str = "",
+    ) -> str:
+        key = make_key(model_name, prompt, params, model_version)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        response = generate()
+        self.put(key, model_name, response)
+        return response
+
+    # --- Internals -----------------------------------------------
+
+    def _bump(self, **deltas: int):
+        self._conn.executemany(
+            "UPDATE counters SET value = value + ? WHERE name = ?",
+            [(delta, name) for name, delta in deltas.items() if delta],
+        )
+
+    def _evict(self):
+        total = self._counter("total_bytes")
+        while total > self.max_bytes:
+            victims = self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY last_access LIMIT ?", (_BATCH,)
+            ).fetchall()
+            if not victims:
+                break
+
+            dropped: List[str] = []
+            for key, size in victims:
+                if total <= self.max_bytes:
+                    break
+                dropped.append(key)
+                total -= size
+
+            marks = ",".join("?" * len(dropped))
+            self._conn.execute(f"DELETE FROM entries WHERE key IN ({marks})", dropped)
+            self._conn.execute("UPDATE counters SET value = ? WHERE name = 'total_bytes'", (total,))
+            self._bump(evictions=len(dropped))
+
+    def _counter(self, name: str) -> int:
+        return self._conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            totals = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {
+            "entries": entries,
+            "bytes": totals["total_bytes"],
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": totals["hits"],
+            "total_misses": totals["misses"],
+            "evictions": totals["evictions"],
+        }
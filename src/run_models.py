@@ -1,14 +1,42 @@
+import argparse
 import random
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
 import pandas as pd
 
+import schema
+from instrumentation import instrument_job, span
+from response_cache import DEFAULT_MAX_BYTES, ResponseCache, make_key
+from storage import save_stage
+
 
 RANDOM_SEED = 42
 random.seed(RANDOM_SEED)
 np.random.seed(RANDOM_SEED)
 
+# Simulate three models with different "quality" levels
+MODEL_CONFIGS = [
+    ("llama3_dummy", 0.8),
+    ("mistral_dummy", 0.7),
+    ("gpt4_dummy", 0.9),
+]
+
+# bump when the dummy models change so cached responses are not reused
+MODEL_VERSION = "dummy-v1"
+
+
+def model_configs(n_models: int = len(MODEL_CONFIGS)):
+    """
+    MODEL_CONFIGS, extended with extra dummy models (qualities spread over
+    0.5-0.95) when more than three are asked for.
+    """
+    extra = max(0, n_models - len(MODEL_CONFIGS))
+    qualities = np.linspace(0.5, 0.95, extra) if extra > 1 else [0.75] * extra
+    configs = MODEL_CONFIGS + [(f"dummy{i + 1}", round(float(q), 3)) for i, q in enumerate(qualities)]
+    return configs[:n_models]
+
 
 def dummy_model_reasoning(prompt: str, reference: str, model_quality: float) -> str:
     """
@@ -52,55 +80,116 @@ def dummy_model_sentiment(reference_label: str, model_quality: float) -> str:
     return random.choice(other_labels)
 
 
-def generate_outputs_for_model(tasks: pd.DataFrame, model_name: str, quality: float) -> pd.DataFrame:
-    rows = []
+def dummy_model_response(category: str, prompt: str, reference: str, quality: float) -> str:
+    """Dispatch a task to the dummy model for its category."""
+    if category == "math_reasoning":
+        return dummy_model_reasoning(prompt, reference, quality)
+    elif category == "summarization":
+        return dummy_model_summarization(reference, quality)
+    elif category == "sentiment_classification":
+        return dummy_model_sentiment(reference, quality)
+    else:
+        return "I am not configured for this task type."
+
 
-    for _, row in tasks.iterrows():
-        task_id = row["task_id"]
-        category = row["category"]
-        prompt = row["prompt"]
-        reference = row["reference_answer"]
+def dummy_model_responses(tasks: pd.DataFrame, quality: float) -> np.ndarray:
+    """
+    dummy_model_response for every task, in row order. It is the one
+    implementation (the stub server calls it per request), so a seeded run
+    makes the same random draws, and gives the same responses, whether
+    tasks are generated here or one at a time.
+    """
+    return np.array(
+        [
+            dummy_model_response(category, prompt, reference, quality)
+            for category, prompt, reference in zip(
+                tasks["category"].to_numpy(dtype=object),
+                tasks["prompt"].to_numpy(dtype=object),
+                tasks["reference_answer"].to_numpy(dtype=object),
+            )
+        ],
+        dtype=object,
+    )
+
+
+def _cache_key(model_name: str, quality: float, category: str, prompt: str, reference) -> str:
+    # the dummy models also read the category and reference answer
+    params = {"quality": quality, "category": category, "reference_answer": str(reference)}
+    return make_key(model_name, prompt, params, MODEL_VERSION)
+
+
+def generate_outputs_for_model(
+    tasks: pd.DataFrame,
+    model_name: str,
+    quality: float,
+    cache: Optional[ResponseCache] = None,
+) -> pd.DataFrame:
+    """
+    Generate one response per task. With a cache, only tasks whose
+    (model, prompt, params, version) have not been seen are generated.
+    """
+    tasks = tasks.reset_index(drop=True)
+    responses = np.empty(len(tasks), dtype=object)
+    missing = np.ones(len(tasks), dtype=bool)
 
-        if category == "math_reasoning":
-            response = dummy_model_reasoning(prompt, reference, quality)
-        elif category == "summarization":
-            response = dummy_model_summarization(reference, quality)
-        elif category == "sentiment_classification":
-            response = dummy_model_sentiment(reference, quality)
-        else:
-            response = "I am not configured for this task type."
+    if cache:
+        keys = [
+            _cache_key(model_name, quality, category, prompt, reference)
+            for category, prompt, reference in zip(tasks["category"], tasks["prompt"], tasks["reference_answer"])
+        ]
+        cached = cache.get_many(keys)
+        for i, key in enumerate(keys):
+            if key in cached:
+                responses[i] = cached[key]
+                missing[i] = False
 
-        rows.append(
-            {
-                "task_id": task_id,
-                "model_name": model_name,
-                "response": response,
-            }
-        )
+    # generate all misses in one batch
+    todo = np.flatnonzero(missing)
+    responses[todo] = dummy_model_responses(tasks.iloc[todo], quality)
 
-    return pd.DataFrame(rows)
+    if cache:
+        cache.put_many([(keys[i], model_name, responses[i]) for i in todo])
 
+    return pd.DataFrame({"task_id": tasks["task_id"], "model_name": model_name, "response": responses})
 
+
+@instrument_job("run_models")
 def main():
+    parser = argparse.ArgumentParser(description="Generate dummy model outputs for every task.")
+    parser.add_argument("--no-cache", action="store_true", help="regenerate every response")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024))
+    parser.add_argument("--csv", action="store_true", help="also export data/outputs/<model>_outputs.csv")
+    parser.add_argument("--n-models", type=int, default=len(MODEL_CONFIGS), help="number of dummy models to run")
+    args = parser.parse_args()
+
     root = Path(__file__).resolve().parents[1]
     data_dir = root / "data"
     outputs_dir = data_dir / "outputs"
     outputs_dir.mkdir(parents=True, exist_ok=True)
 
-    tasks = pd.read_csv(data_dir / "tasks.csv")
-
-    # Simulate three models with different "quality" levels
-    configs = [
-        ("llama3_dummy", 0.8),
-        ("mistral_dummy", 0.7),
-        ("gpt4_dummy", 0.9),
-    ]
-
-    for model_name, quality in configs:
-        df = generate_outputs_for_model(tasks, model_name, quality)
-        out_path = outputs_dir / f"{model_name}_outputs.csv"
-        df.to_csv(out_path, index=False)
-        print(f"Saved outputs for {model_name} to {out_path}")
+    tasks = schema.read_tasks(data_dir)
+
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(data_dir / "cache" / "responses.sqlite", max_bytes=int(args.cache_max_mb * 1024 * 1024))
+
+    all_outputs = []
+    for model_name, quality in model_configs(args.n_models):
+        with span("run_models.generate", model=model_name) as s:
+            df = generate_outputs_for_model(tasks, model_name, quality, cache=cache)
+            s.add_rows(len(df))
+        all_outputs.append(df)
+        if args.csv:
+            out_path = outputs_dir / f"{model_name}_outputs.csv"
+            df.to_csv(out_path, index=False)
+            print(f"Saved outputs for {model_name} to {out_path}")
+
+    out_path = save_stage(pd.concat(all_outputs, ignore_index=True), data_dir, "outputs", ["model_name"])
+    print(f"Saved outputs for {len(all_outputs)} models to {out_path}")
+
+    if cache:
+        stats = cache.stats()
+        print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
 
 
 if __name__ == "__main__":
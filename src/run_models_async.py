@@ -0,0 +1,305 @@
+"""
+Async generation runner for HTTP model endpoints.
+
+Fans every prompt out across all models at once, caps in-flight requests
+per model, applies a token-bucket rate limit per model and retries
+transient failures with exponential backoff. Writes the same
+outputs dataset (and optional per-model CSVs) as run_models.py.
+
+    python src/stub_model_server.py --latency-ms 50 --error-rate 0.05 &
+    python src/run_models_async.py --base-url http://127.0.0.1:8765
+
+With --stream-guard, responses are streamed and checked by the guardrails
+as the tokens arrive; a stream is closed as soon as a toxic keyword or
+refusal pattern is confirmed, so the model stops generating. The outputs
+then also carry the guardrail flags, tokens_generated and tokens_saved
+(tokens the full response would have had beyond the cut).
+
+Requests that still fail after the last retry, or fail in a way a
+retry cannot fix (an HTTP 4xx, a malformed body), are saved with their
+error in the `error` column and no response (NaN); scoring skips them
+rather than counting them as wrong answers. The per-model CSV exports
+keep run_models.py's columns and leave those rows out; the error, guard
+and token columns are only in the outputs dataset.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import pandas as pd
+
+import schema
+from guardrails import GUARDRAIL_COLUMNS, StreamGuard
+from instrumentation import count, instrument_job, observe, span
+from run_models import MODEL_CONFIGS
+from storage import save_stage
+
+
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+# the columns of run_models.py's *_outputs.csv
+CSV_COLUMNS = ["task_id", "model_name", "response"]
+
+
+@dataclass
+class EndpointConfig:
+    model_name: str
+    quality: float
+    url: str
+    max_concurrency: int = 8
+    rate_per_sec: float = 50.0
+    burst: int = 10
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, up to `capacity` banked."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class TransientError(Exception):
+    pass
+
+
+class RequestFailed(Exception):
+    """A failure that retrying would not fix, e.g. HTTP 400 or a malformed body."""
+
+
+def _check_status(resp: httpx.Response):
+    if resp.status_code in TRANSIENT_STATUS:
+        raise TransientError(f"HTTP {resp.status_code}")
+    if resp.is_error:
+        raise RequestFailed(f"HTTP {resp.status_code}")
+
+
+async def _post_once(client: httpx.AsyncClient, url: str, payload: dict) -> str:
+    try:
+        resp = await client.post(url, json=payload)
+    except httpx.TransportError as exc:
+        raise TransientError(str(exc)) from exc
+
+    _check_status(resp)
+    try:
+        return resp.json()["response"]
+    except (ValueError, KeyError, TypeError) as exc:
+        raise RequestFailed(f"malformed response: {exc!r}") from exc
+
+
+async def _stream_once(client: httpx.AsyncClient, url: str, payload: dict) -> dict:
+    """
+    Stream a response from `url`/stream through a StreamGuard, closing the
+    stream once the guard confirms a match. Returns the (possibly cut)
+    response with its guardrail flags and token counts.
+    """
+    guard = StreamGuard()
+    parts = []
+    try:
+        async with client.stream("POST", url + "/stream", json=payload) as resp:
+            _check_status(resp)
+            total = resp.headers.get("X-Total-Tokens")
+            async for line in resp.aiter_lines():
+                try:
+                    message = json.loads(line) if line else {}
+                except ValueError as exc:
+                    raise RequestFailed(f"malformed response: {exc!r}") from exc
+                if "token" not in message:
+                    continue
+                parts.append(message["token"])
+                if guard.feed(message["token"]):
+                    # leaving the block closes the connection and the server stops
+                    count("stream_guard_stops", model=payload["model_name"])
+                    break
+    except httpx.TransportError as exc:
+        raise TransientError(str(exc)) from exc
+    guard.finish()
+
+    saved = int(total) - guard.tokens if total is not None else None
+    if saved:
+        count("stream_guard_tokens_saved", saved, model=payload["model_name"])
+    return {"response": "".join(parts), **guard.flags(), "tokens_generated": guard.tokens, "tokens_saved": saved}
+
+
+async def generate_with_retries(
+    client: httpx.AsyncClient,
+    endpoint: EndpointConfig,
+    bucket: TokenBucket,
+    payload: dict,
+    max_retries: int = 5,
+    base_delay: float = 0.2,
+    send: Callable[[httpx.AsyncClient, str, dict], Awaitable[Any]] = _post_once,
+) -> Any:
+    """
+    Call the endpoint with `send`, retrying transient failures with
+    jittered backoff. Raises the last TransientError once the retries
+    are used up, and RequestFailed straight away.
+    """
+    for attempt in range(max_retries + 1):
+        await bucket.acquire()
+        start = time.perf_counter()
+        try:
+            response = await send(client, endpoint.url, payload)
+            observe("model_request_seconds", time.perf_counter() - start, model=endpoint.model_name)
+            return response
+        except TransientError:
+            count("model_request_errors", model=endpoint.model_name)
+            if attempt == max_retries:
+                raise
+            delay = base_delay * (2 ** attempt)
+            await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+
+
+async def _run_model(
+    client: httpx.AsyncClient,
+    endpoint: EndpointConfig,
+    tasks: pd.DataFrame,
+    max_retries: int,
+    stream_guard: bool = False,
+) -> pd.DataFrame:
+    bucket = TokenBucket(endpoint.rate_per_sec, endpoint.burst)
+    send = _stream_once if stream_guard else _post_once
+    responses: List[Optional[Any]] = [None] * len(tasks)
+    errors: List[Optional[str]] = [None] * len(tasks)
+    records = tasks[["category", "prompt", "reference_answer"]].to_dict("records")
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(len(records)):
+        queue.put_nowait(i)
+
+    # a fixed pool of workers per model bounds in-flight requests
+    async def worker():
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            payload = {"model_name": endpoint.model_name, "quality": endpoint.quality, **records[i]}
+            try:
+                responses[i] = await generate_with_retries(client, endpoint, bucket, payload, max_retries, send=send)
+            except (TransientError, RequestFailed) as exc:
+                errors[i] = str(exc)
+
+    await asyncio.gather(*(worker() for _ in range(endpoint.max_concurrency)))
+
+    failed = sum(e is not None for e in errors)
+    if failed:
+        print(f"{endpoint.model_name}: {failed} request(s) failed")
+
+    keys = {"task_id": tasks["task_id"].to_numpy(), "model_name": endpoint.model_name}
+    if not stream_guard:
+        return schema.compact(pd.DataFrame({**keys, "response": responses, schema.ERROR_COLUMN: errors}))
+    streamed = pd.DataFrame.from_records(
+        [r or {} for r in responses], columns=["response", *GUARDRAIL_COLUMNS, "tokens_generated", "tokens_saved"]
+    )
+    streamed[schema.ERROR_COLUMN] = errors
+    return schema.compact(streamed.assign(**keys)[[*keys, *streamed.columns]])
+
+
+def stream_guard_summary(outputs: pd.DataFrame) -> str:
+    """How many streamed responses the guard cut short, and the tokens that saved."""
+    stopped = outputs["tokens_saved"].fillna(0) > 0
+    generated = outputs["tokens_generated"].sum()
+    saved = outputs["tokens_saved"].sum()
+    share = saved / (generated + saved) if generated + saved else 0.0
+    return (
+        f"Stream guard: stopped {int(stopped.sum())} of {len(outputs)} responses early, "
+        f"saving {int(saved)} of {int(generated + saved)} tokens ({share:.1%})"
+    )
+
+
+async def generate_outputs_async(
+    tasks: pd.DataFrame,
+    endpoints: List[EndpointConfig],
+    max_retries: int = 5,
+    timeout_s: float = 30.0,
+    stream_guard: bool = False,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Generate outputs for every endpoint concurrently; rows keep task order.
+    With `stream_guard`, responses are streamed and cut at the first
+    guardrail violation (see _stream_once).
+    """
+    limits = httpx.Limits(max_connections=sum(e.max_concurrency for e in endpoints))
+    async with httpx.AsyncClient(limits=limits, timeout=timeout_s) as client:
+        frames = await asyncio.gather(
+            *(_run_model(client, endpoint, tasks, max_retries, stream_guard) for endpoint in endpoints)
+        )
+    return {endpoint.model_name: df for endpoint, df in zip(endpoints, frames)}
+
+
+@instrument_job("run_models_async")
+def main():
+    parser = argparse.ArgumentParser(description="Generate model outputs against HTTP endpoints.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8765")
+    parser.add_argument("--concurrency", type=int, default=8, help="max in-flight requests per model")
+    parser.add_argument("--rate", type=float, default=50.0, help="requests per second per model")
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--csv", action="store_true", help="also export data/outputs/<model>_outputs.csv")
+    parser.add_argument(
+        "--stream-guard", action="store_true", help="stream responses and stop each at its first guardrail violation"
+    )
+    args = parser.parse_args()
+
+    root = Path(__file__).resolve().parents[1]
+    data_dir = root / "data"
+    outputs_dir = data_dir / "outputs"
+    outputs_dir.mkdir(parents=True, exist_ok=True)
+
+    tasks = schema.read_tasks(data_dir)
+    endpoints = [
+        EndpointConfig(
+            model_name=model_name,
+            quality=quality,
+            url=f"{args.base_url}/generate",
+            max_concurrency=args.concurrency,
+            rate_per_sec=args.rate,
+            burst=args.burst,
+        )
+        for model_name, quality in MODEL_CONFIGS
+    ]
+
+    start = time.perf_counter()
+    with span("run_models_async.generate") as s:
+        outputs = asyncio.run(
+            generate_outputs_async(tasks, endpoints, max_retries=args.retries, stream_guard=args.stream_guard)
+        )
+        s.add_rows(sum(len(df) for df in outputs.values()))
+    elapsed = time.perf_counter() - start
+
+    if args.csv:
+        for model_name, df in outputs.items():
+            out_path = outputs_dir / f"{model_name}_outputs.csv"
+            schema.drop_failed(df)[CSV_COLUMNS].to_csv(out_path, index=False)
+            print(f"Saved outputs for {model_name} to {out_path}")
+
+    all_outputs = pd.concat(outputs.values(), ignore_index=True)
+    out_path = save_stage(all_outputs, data_dir, "outputs", ["model_name"])
+    print(f"Saved outputs for {len(outputs)} models to {out_path}")
+    print(f"Generated {len(all_outputs)} responses in {elapsed:.2f}s")
+    if args.stream_guard:
+        print(stream_guard_summary(all_outputs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Column dtypes shared by every pipeline stage.
+
+Frames are kept compact wherever they are loaded or produced:
+key columns (task_id, model_name, category) are categoricals, free text
+is Arrow-backed strings, guardrail flags are int8 and scores float32.
+
+The long task text (prompt, reference_answer) lives only in the task
+table, data/tasks.csv. Per-model frames carry task_id and join the text
+with `attach_text` where it is actually needed (scoring needs the
+reference, the dashboard's worst examples need both), instead of
+repeating it on every model's row.
+"""
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+KEY_COLUMNS = ["task_id", "model_name", "category"]
+TASK_TEXT_COLUMNS = ["prompt", "reference_answer"]
+# why a request to a model endpoint failed (run_models_async); empty when it succeeded
+ERROR_COLUMN = "error"
+TEXT_COLUMNS = ["response", "toxic_match", "refusal_match", "comments", ERROR_COLUMN, *TASK_TEXT_COLUMNS]
+FLAG_COLUMNS = ["is_toxic", "is_refusal"]
+SCORE_COLUMNS = [
+    "auto_correctness", "rouge1", "rouge2", "rougeL", "bleu", "semantic_similarity",
+    "is_best", "helpfulness", "correctness_human", "safety_human",
+]
+
+KEY_DTYPE = "category"
+# pandas' default string dtype when pyarrow is installed; missing values stay NaN
+TEXT_DTYPE = pd.StringDtype("pyarrow", na_value=np.nan)
+FLAG_DTYPE = np.dtype(np.int8)
+SCORE_DTYPE = np.dtype(np.float32)
+
+# read_csv would otherwise infer numbers for ids and answers such as "7"
+CSV_DTYPES = {col: str for col in [*KEY_COLUMNS, *TEXT_COLUMNS]}
+
+
+def _cast(values: pd.Series, col: str) -> pd.Series:
+    if col in KEY_COLUMNS:
+        return values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype(TEXT_DTYPE).astype(KEY_DTYPE)
+    if col in TEXT_COLUMNS:
+        return values if values.dtype == TEXT_DTYPE else values.astype(TEXT_DTYPE)
+
+    nums = values if pd.api.types.is_numeric_dtype(values.dtype) else pd.to_numeric(values, errors="coerce")
+    if col in FLAG_COLUMNS and not nums.isna().any():
+        return nums.astype(FLAG_DTYPE)
+    # scores, and flags with gaps (e.g. after a left join)
+    return nums.astype(SCORE_DTYPE)
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """`df` with every known column cast to its compact dtype; other columns are left alone."""
+    known = set(KEY_COLUMNS) | set(TEXT_COLUMNS) | set(FLAG_COLUMNS) | set(SCORE_COLUMNS)
+    changed = {}
+    for col in df.columns:
+        if col in known:
+            values = _cast(df[col], col)
+            if values.dtype != df[col].dtype:
+                changed[col] = values
+    if not changed:
+        return df
+    return df.assign(**changed)
+
+
+def align_keys(df: pd.DataFrame, like: pd.DataFrame) -> pd.DataFrame:
+    """
+    `df` with its key columns cast to the categories of `like`'s, so a
+    merge between the two joins on category codes instead of falling back
+    to strings. Rows whose keys are not among those categories could not
+    match in such a join and are dropped.
+    """
+    changed = {}
+    unmatched = np.zeros(len(df), dtype=bool)
+    for col in KEY_COLUMNS:
+        if col in df.columns and col in like.columns and isinstance(like[col].dtype, pd.CategoricalDtype):
+            dtype = like[col].dtype
+            if df[col].dtype != dtype:
+                # -1 (missing) for values that are not among the categories
+                codes = dtype.categories.get_indexer(df[col].astype(TEXT_DTYPE))
+                changed[col] = pd.Categorical.from_codes(codes, dtype=dtype)
+                unmatched |= (codes == -1) & df[col].notna().to_numpy()
+    if not changed:
+        return df
+    return df.assign(**changed)[~unmatched]
+
+
+def read_csv(path: Path, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """A CSV export (only `columns` of it, if given) with compact dtypes."""
+    usecols = (lambda c: c in columns) if columns else None
+    return compact(pd.read_csv(path, usecols=usecols, dtype=CSV_DTYPES))
+
+
+def read_tasks(data_dir: Path, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """The task table (data/tasks.csv), optionally only some of its columns."""
+    return read_csv(Path(data_dir) / "tasks.csv", columns)
+
+
+def attach_text(
+    df: pd.DataFrame, tasks: pd.DataFrame, columns: Iterable[str] = TASK_TEXT_COLUMNS
+) -> pd.DataFrame:
+    """`df` with the task table's `columns` joined on by task_id (replacing any it already has)."""
+    columns = [c for c in columns if c in tasks.columns]
+    text = align_keys(tasks[["task_id", *columns]].drop_duplicates("task_id"), df)
+    return df.drop(columns=[c for c in columns if c in df.columns]).merge(text, on="task_id", how="left")
+
+
+def drop_task_text(df: pd.DataFrame) -> pd.DataFrame:
+    """`df` without task text columns, e.g. from stage outputs written before they were split off."""
+    return df.drop(columns=[c for c in TASK_TEXT_COLUMNS if c in df.columns])
+
+
+def drop_failed(df: pd.DataFrame) -> pd.DataFrame:
+    """`df` without the outputs whose request failed, so they are not scored as wrong answers."""
+    if ERROR_COLUMN not in df.columns:
+        return df
+    return df[df[ERROR_COLUMN].isna()].drop(columns=ERROR_COLUMN).reset_index(drop=True)
+
+
+def memory_bytes(df: pd.DataFrame) -> int:
+    """Deep in-memory size of `df`, string buffers included."""
+    return int(df.memory_usage(deep=True, index=False).sum())
@@ -1,21 +1,41 @@
+import argparse
+from functools import partial
 from pathlib import Path
+from typing import Callable, Dict, Optional
 
 import numpy as np
 import pandas as pd
 
+import dedup
+import schema
+from answer_extraction import extract_answers, parse_answer
+from fingerprints import fingerprint_rows, incremental_apply
+from instrumentation import instrument_job, span
+from semantic_similarity import SIMILARITY_CATEGORIES, SIMILARITY_COLUMN, ReferenceIndex, load_reference_index
+from storage import iter_stage_chunks, load_stage, save_stage, save_stage_stream
+from text_metrics import intern_tokens, summarization_metrics
+
+
+# bump whenever a scorer changes so stored scores are recomputed
+SCORER_VERSION = "3"
+FINGERPRINT_COLUMN = "rubric_fingerprint"
+# scores depend on nothing else, so results carry over across models and tasks too
+FINGERPRINT_INPUTS = ["category", "response", "reference_answer"]
+
 
 def score_math_reasoning(pred: str, ref: str) -> float:
-    try:
-        pred_val = float(pred.strip())
-        ref_val = float(ref.strip())
-        # full credit if within small tolerance
-        if abs(pred_val - ref_val) < 1e-3:
-            return 1.0
-        # partial credit if somewhat close
-        diff = abs(pred_val - ref_val)
-        return max(0.0, 1.0 - diff / max(1.0, abs(ref_val)))
-    except Exception:
+    # the number the response ends on, e.g. 8 in "The answer is 8 apples."
+    pred_val = parse_answer(pred)
+    ref_val = parse_answer(ref)
+    diff = abs(pred_val - ref_val)
+    if np.isnan(diff):
+        # no number in one of them
         return 0.0
+    # full credit if within small tolerance
+    if diff < 1e-3:
+        return 1.0
+    # partial credit if somewhat close
+    return max(0.0, 1.0 - diff / max(1.0, abs(ref_val)))
 
 
 def score_sentiment(pred: str, ref: str) -> float:
@@ -34,52 +54,334 @@ def simple_overlap_score(pred: str, ref: str) -> float:
     return len(overlap) / len(ref_tokens)
 
 
-def apply_rubric(tasks: pd.DataFrame, outputs: pd.DataFrame) -> pd.DataFrame:
-    merged = outputs.merge(tasks, on="task_id", how="left")
-    scores = []
-
-    for _, row in merged.iterrows():
-        category = row["category"]
-        pred = str(row["response"])
-        ref = str(row["reference_answer"])
-
-        if category == "math_reasoning":
-            correctness = score_math_reasoning(pred, ref)
-        elif category == "sentiment_classification":
-            correctness = score_sentiment(pred, ref)
-        elif category == "summarization":
-            correctness = simple_overlap_score(pred, ref)
-        else:
-            correctness = 0.0
+# --- Batch scorers -----------------------------------------------
+# Each category registers a scorer that takes the whole prediction and
+# reference columns for that category and returns one score per row.
+# They must agree with the per-row functions above.
+
+BatchScorer = Callable[[pd.Series, pd.Series], np.ndarray]
+
+BATCH_SCORERS: Dict[str, BatchScorer] = {}
+
+
+def register_scorer(category: str) -> Callable[[BatchScorer], BatchScorer]:
+    def decorator(fn: BatchScorer) -> BatchScorer:
+        BATCH_SCORERS[category] = fn
+        return fn
+
+    return decorator
+
+
+@register_scorer("math_reasoning")
+def batch_math_reasoning(preds: pd.Series, refs: pd.Series) -> np.ndarray:
+    pred_vals = extract_answers(preds)
+    ref_vals = extract_answers(refs)
+
+    with np.errstate(invalid="ignore"):
+        diff = np.abs(pred_vals - ref_vals)
+        partial = 1.0 - diff / np.fmax(1.0, np.abs(ref_vals))
+        scores = np.where(diff < 1e-3, 1.0, np.maximum(0.0, partial))
+    return np.nan_to_num(scores, nan=0.0)
+
+
+@register_scorer("sentiment_classification")
+def batch_sentiment(preds: pd.Series, refs: pd.Series) -> np.ndarray:
+    pred_l = preds.str.strip().str.lower().to_numpy(dtype=object)
+    ref_l = refs.str.strip().str.lower().to_numpy(dtype=object)
+    return (pred_l == ref_l).astype(float)
+
+
+@register_scorer("summarization")
+def batch_overlap(preds: pd.Series, refs: pd.Series) -> np.ndarray:
+    # intern every token once so (row, token) pairs become plain integers
+    pred, ref, vocab_size = intern_tokens(preds, refs)
+
+    # unique (row, token) keys play the role of the per-row token sets
+    pred_keys = pd.unique(pred.rows * vocab_size + pred.ids)
+    ref_keys = pd.unique(ref.rows * vocab_size + ref.ids)
+    ref_key_rows = ref_keys // vocab_size
+
+    n_rows = len(refs)
+    ref_counts = np.bincount(ref_key_rows, minlength=n_rows)
+    in_pred = pd.Series(ref_keys).isin(pred_keys).to_numpy()
+    overlap = np.bincount(ref_key_rows[in_pred], minlength=n_rows)
+
+    scores = np.zeros(n_rows)
+    has_ref = ref_counts > 0
+    scores[has_ref] = overlap[has_ref] / ref_counts[has_ref]
+    return scores
+
+
+# --- Extra metrics -----------------------------------------------
+# Categories can also register batch metrics that add score columns next
+# to auto_correctness. Every metric column is always present; rows of
+# categories without that metric get NaN.
+
+BatchMetrics = Callable[[pd.Series, pd.Series], Dict[str, np.ndarray]]
+
+BATCH_METRICS: Dict[str, BatchMetrics] = {}
+METRIC_COLUMNS = ["rouge1", "rouge2", "rougeL", "bleu"]
+
+
+def register_metrics(category: str) -> Callable[[BatchMetrics], BatchMetrics]:
+    def decorator(fn: BatchMetrics) -> BatchMetrics:
+        BATCH_METRICS[category] = fn
+        return fn
+
+    return decorator
+
+
+register_metrics("summarization")(summarization_metrics)
+
+SCORE_COLUMNS = ["auto_correctness", *METRIC_COLUMNS, SIMILARITY_COLUMN]
+
+# Rows of a category whose (response, reference) normalize to the same key
+# are scored once. A normalizer must not change any score of its category
+# (scorer, metrics and similarity); categories not listed match exactly.
+DEDUP_KEYS: Dict[str, Callable[[pd.Series], pd.Series]] = {
+    "math_reasoning": dedup.stripped,
+    "sentiment_classification": dedup.stripped_lower,
+    "summarization": dedup.lower_tokens,
+}
+
 
-        scores.append(correctness)
+def _as_text(values: pd.Series) -> pd.Series:
+    # same text as str(value) for the values read_csv produces
+    return values.astype(object).where(values.notna(), "nan").astype(str)
 
-    merged["auto_correctness"] = scores
+
+def score_rows(merged: pd.DataFrame, similarity: Optional[ReferenceIndex] = None) -> pd.DataFrame:
+    """
+    Add SCORE_COLUMNS (float32) to outputs already merged with their
+    tasks' category and reference_answer. semantic_similarity is only
+    filled when a reference index is given.
+    """
+    merged = merged.copy()
+    scores = np.zeros(len(merged))
+    metrics = {col: np.full(len(merged), np.nan) for col in METRIC_COLUMNS + [SIMILARITY_COLUMN]}
+
+    preds = _as_text(merged["response"])
+    refs = _as_text(merged["reference_answer"])
+
+    # one scorer call per category, on its distinct (response, reference)
+    # pairs only; unknown categories keep 0.0
+    for category, idx in merged.groupby("category", sort=False, observed=True).indices.items():
+        normalize = DEDUP_KEYS.get(category, dedup.exact)
+        codes, first = dedup.group_codes(normalize(preds.iloc[idx]), normalize(refs.iloc[idx]))
+        dedup.record("rubric", len(idx), len(first))
+        category_preds = preds.iloc[idx[first]].reset_index(drop=True)
+        category_refs = refs.iloc[idx[first]].reset_index(drop=True)
+
+        scorer = BATCH_SCORERS.get(category)
+        if scorer is not None:
+            scores[idx] = scorer(category_preds, category_refs)[codes]
+
+        metric_fn = BATCH_METRICS.get(category)
+        if metric_fn is not None:
+            for col, values in metric_fn(category_preds, category_refs).items():
+                metrics[col][idx] = values[codes]
+
+        if similarity is not None and category in SIMILARITY_CATEGORIES:
+            metrics[SIMILARITY_COLUMN][idx] = similarity.score(category_preds, category_refs)[codes]
+
+    merged["auto_correctness"] = scores.astype(schema.SCORE_DTYPE)
+    for col, values in metrics.items():
+        merged[col] = values.astype(schema.SCORE_DTYPE)
     return merged
 
 
+def _with_references(tasks: pd.DataFrame, outputs: pd.DataFrame) -> pd.DataFrame:
+    # only what scoring reads; the prompt stays in the task table
+    references = schema.align_keys(tasks[["task_id", "category", "reference_answer"]], outputs)
+    return outputs.merge(references, on="task_id", how="left")
+
+
+def apply_rubric(tasks: pd.DataFrame, outputs: pd.DataFrame) -> pd.DataFrame:
+    scored = score_rows(_with_references(tasks, outputs), load_reference_index(tasks))
+    return schema.drop_task_text(scored)
+
+
+def _row_versions(merged: pd.DataFrame, similarity: Optional[ReferenceIndex]) -> pd.Series:
+    """
+    SCORER_VERSION per row; rows scored with the similarity index also
+    depend on every reference it was fitted on, so they carry its key.
+    """
+    versions = pd.Series(SCORER_VERSION, index=merged.index, dtype=object)
+    if similarity is not None:
+        versions[merged["category"].isin(SIMILARITY_CATEGORIES).to_numpy()] = f"{SCORER_VERSION}:{similarity.key}"
+    return versions
+
+
+def apply_rubric_incremental(
+    tasks: pd.DataFrame,
+    outputs: pd.DataFrame,
+    previous: Optional[pd.DataFrame],
+    log: bool = True,
+    similarity: Optional[ReferenceIndex] = None,
+) -> pd.DataFrame:
+    """
+    Like apply_rubric, but reuses SCORE_COLUMNS from a previous auto_scores
+    frame for rows whose inputs and scorer version are unchanged. Pass
+    `similarity` to reuse an index already loaded for `tasks`.
+
+    The result has the outputs' columns plus category and the scores;
+    task text is joined again (schema.attach_text) only where needed.
+    """
+    if similarity is None:
+        similarity = load_reference_index(tasks)
+
+    with span("rubric.score") as s:
+        merged = _with_references(tasks, schema.drop_task_text(outputs))
+        merged[FINGERPRINT_COLUMN] = fingerprint_rows(merged, FINGERPRINT_INPUTS, _row_versions(merged, similarity))
+        s.add_rows(len(merged))
+        scored = incremental_apply(
+            merged,
+            FINGERPRINT_COLUMN,
+            previous,
+            SCORE_COLUMNS,
+            partial(score_rows, similarity=similarity),
+            label="rubric" if log else None,
+        )
+        # reused scores from an older artifact may be float64
+        return schema.compact(schema.drop_task_text(scored))
+
+
+def without_guardrails(df: pd.DataFrame) -> pd.DataFrame:
+    """The auto_scores columns of an auto_scores_with_guardrails frame."""
+    from guardrails import FINGERPRINT_COLUMN as GUARDRAIL_FINGERPRINT, GUARDRAIL_COLUMNS
+
+    return df.drop(columns=[*GUARDRAIL_COLUMNS, GUARDRAIL_FINGERPRINT], errors="ignore")
+
+
+def stream_rubric_and_guardrails(
+    tasks: pd.DataFrame,
+    data_dir: Path,
+    chunk_size: int,
+    csv_path: Optional[Path] = None,
+    scores_csv_path: Optional[Path] = None,
+) -> Optional[Path]:
+    """
+    Score outputs chunk by chunk, run the guardrails on each scored chunk
+    and append it to the auto_scores_with_guardrails dataset. Peak memory
+    is bounded by `chunk_size` (plus the task table), not by dataset size.
+
+    The auto_scores dataset is then rewritten from it chunk by chunk
+    (without the guardrail columns), so a later run of the separate
+    guardrails step does not start from stale scores.
+    """
+    from guardrails import apply_guardrails_incremental
+
+    similarity = load_reference_index(tasks)
+    chunks = iter_stage_chunks(
+        data_dir,
+        "outputs",
+        sorted((data_dir / "outputs").glob("*_outputs.csv")),
+        chunk_size=chunk_size,
+        columns=["task_id", "model_name", "response", schema.ERROR_COLUMN],
+    )
+    scored = (
+        apply_guardrails_incremental(
+            apply_rubric_incremental(tasks, schema.drop_failed(chunk), None, log=False, similarity=similarity),
+            None,
+            log=False,
+        )
+        for chunk in chunks
+    )
+    out_path = save_stage_stream(
+        scored, data_dir, "auto_scores_with_guardrails", ["model_name", "category"], chunk_size, csv_path
+    )
+    if out_path is not None:
+        checked = iter_stage_chunks(data_dir, "auto_scores_with_guardrails", chunk_size=chunk_size)
+        save_stage_stream(
+            (without_guardrails(chunk) for chunk in checked),
+            data_dir, "auto_scores", ["model_name", "category"], chunk_size, scores_csv_path,
+        )
+    return out_path
+
+
+@instrument_job("scoring_rubric")
 def main():
+    parser = argparse.ArgumentParser(description="Score model outputs against the rubric.")
+    parser.add_argument("--full", action="store_true", help="rescore every row instead of only changed ones")
+    parser.add_argument("--csv", action="store_true", help="also export data/auto_scores.csv")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="score and run guardrails chunk by chunk in bounded memory, writing auto_scores_with_guardrails too",
+    )
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="rows per chunk in --stream mode")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="score and run guardrails on this many processes, writing auto_scores_with_guardrails too",
+    )
+    parser.add_argument("--shard-size", type=int, default=100_000, help="target rows per shard with --workers")
+    args = parser.parse_args()
+
     root = Path(__file__).resolve().parents[1]
     data_dir = root / "data"
     outputs_dir = data_dir / "outputs"
+    csv_path = data_dir / "auto_scores.csv"
 
-    tasks = pd.read_csv(data_dir / "tasks.csv")
+    tasks = schema.read_tasks(data_dir, ["task_id", "category", "reference_answer"])
+
+    if args.stream:
+        out_path = stream_rubric_and_guardrails(
+            tasks, data_dir, args.chunk_size,
+            csv_path=data_dir / "auto_scores_with_guardrails.csv" if args.csv else None,
+            scores_csv_path=csv_path if args.csv else None,
+        )
+        if out_path is None:
+            print("No outputs found in data/datasets/outputs or data/outputs")
+        else:
+            print(f"Saved auto-scored, guardrail-checked results to {out_path}")
+            dedup.print_reports()
+        return
 
     # Load all model outputs and score them
-    all_scored = []
+    outputs = load_stage(
+        data_dir,
+        "outputs",
+        sorted(outputs_dir.glob("*_outputs.csv")),
+        columns=["task_id", "model_name", "response", schema.ERROR_COLUMN],
+    )
+
+    if outputs is None or outputs.empty:
+        print("No outputs found in data/datasets/outputs or data/outputs")
+        return
+    n_outputs = len(outputs)
+    outputs = schema.drop_failed(outputs)
+    if len(outputs) < n_outputs:
+        print(f"Skipping {n_outputs - len(outputs)} output(s) whose request failed")
 
-    for csv_path in outputs_dir.glob("*_outputs.csv"):
-        outputs = pd.read_csv(csv_path)
-        scored = apply_rubric(tasks, outputs)
-        all_scored.append(scored)
+    if args.workers > 1:
+        from parallel_scoring import print_worker_stats, score_parallel
 
-    if not all_scored:
-        print("No outputs found in data/outputs")
+        result, stats = score_parallel(tasks, outputs, args.workers, args.shard_size)
+        print_worker_stats(stats)
+        save_stage(
+            without_guardrails(result), data_dir, "auto_scores", ["model_name", "category"],
+            csv_path=csv_path if args.csv else None,
+        )
+        out_path = save_stage(
+            result, data_dir, "auto_scores_with_guardrails", ["model_name", "category"],
+            csv_path=data_dir / "auto_scores_with_guardrails.csv" if args.csv else None,
+        )
+        print(f"Saved auto-scored, guardrail-checked results to {out_path}")
         return
 
-    result = pd.concat(all_scored, ignore_index=True)
-    out_path = data_dir / "auto_scores.csv"
-    result.to_csv(out_path, index=False)
+    previous = None
+    if not args.full:
+        previous = load_stage(
+            data_dir, "auto_scores", [csv_path], columns=[FINGERPRINT_COLUMN, *SCORE_COLUMNS]
+        )
+
+    result = apply_rubric_incremental(tasks, outputs, previous)
+    dedup.print_reports()
+    out_path = save_stage(
+        result, data_dir, "auto_scores", ["model_name", "category"], csv_path=csv_path if args.csv else None
+    )
     print(f"Saved auto-scored results to {out_path}")
 
 
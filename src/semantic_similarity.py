@@ -0,0 +1,103 @@
+"""
+TF-IDF cosine similarity between responses and reference answers.
+
+A vectorizer is fitted once on the reference answers of the free-text
+categories and saved, together with the reference matrix, under
+data/cache/similarity/. The file name is a hash of those references, so
+the cached index is reused until tasks.csv changes them. Scoring a batch
+is one transform of the responses and one row-wise sparse dot product
+(TF-IDF rows are L2-normalized, so the dot product is the cosine).
+"""
+import hashlib
+from pathlib import Path
+from typing import Dict, Optional
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from scipy.sparse import vstack
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+
+# bump whenever the vectorizer settings change so cached indexes are refitted
+SIMILARITY_VERSION = "1"
+SIMILARITY_CATEGORIES = ["summarization"]
+SIMILARITY_COLUMN = "semantic_similarity"
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[1] / "data" / "cache" / "similarity"
+
+_LOADED: Dict[Path, "ReferenceIndex"] = {}
+
+
+class ReferenceIndex:
+    def __init__(self, key: str, vectorizer: TfidfVectorizer, references: pd.Index, matrix):
+        self.key = key
+        self.vectorizer = vectorizer
+        self.references = references
+        self.matrix = matrix
+
+    def score(self, preds: pd.Series, refs: pd.Series) -> np.ndarray:
+        """Cosine similarity of each prediction to its reference."""
+        # vectorizing is the slow part; do each distinct response once
+        codes, uniques = pd.factorize(preds)
+        pred_matrix = self.vectorizer.transform(uniques).tocsr()[codes]
+
+        rows = self.references.get_indexer(refs)
+        missing = rows < 0
+        if missing.any():
+            # references outside tasks.csv (ad hoc data): vectorize them here
+            extra = self.vectorizer.transform(refs[missing].unique())
+            extra_rows = pd.Index(refs[missing].unique()).get_indexer(refs[missing])
+            rows[missing] = self.matrix.shape[0] + extra_rows
+            ref_matrix = vstack([self.matrix, extra]).tocsr()[rows]
+        else:
+            ref_matrix = self.matrix[rows]
+
+        scores = np.asarray(pred_matrix.multiply(ref_matrix).sum(axis=1)).ravel()
+        return np.clip(scores, 0.0, 1.0)
+
+
+def reference_texts(tasks: pd.DataFrame) -> pd.Index:
+    refs = tasks.loc[tasks["category"].isin(SIMILARITY_CATEGORIES), "reference_answer"]
+    return pd.Index(sorted(refs.dropna().astype(str).unique()))
+
+
+def index_key(references: pd.Index) -> str:
+    digest = hashlib.sha256(f"{SIMILARITY_VERSION}|{sklearn.__version__}".encode())
+    for text in references:
+        digest.update(b"\0" + text.encode())
+    return digest.hexdigest()[:16]
+
+
+def fit_reference_index(references: pd.Index, key: str) -> ReferenceIndex:
+    vectorizer = TfidfVectorizer(lowercase=True, stop_words="english", sublinear_tf=True)
+    matrix = vectorizer.fit_transform(references).tocsr()
+    return ReferenceIndex(key, vectorizer, references, matrix)
+
+
+def load_reference_index(tasks: pd.DataFrame, cache_dir: Path = DEFAULT_CACHE_DIR) -> Optional[ReferenceIndex]:
+    """
+    The fitted index for the free-text references in `tasks`, from memory,
+    then disk, fitting and saving it only if neither has it. None if
+    `tasks` has no free-text references.
+    """
+    references = reference_texts(tasks)
+    if references.empty:
+        return None
+
+    key = index_key(references)
+    path = Path(cache_dir) / f"tfidf-{key}.joblib"
+    if path in _LOADED:
+        return _LOADED[path]
+
+    if path.exists():
+        index = joblib.load(path)
+    else:
+        index = fit_reference_index(references, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        joblib.dump(index, tmp)
+        tmp.replace(path)
+
+    _LOADED[path] = index
+    return index
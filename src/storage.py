@@ -0,0 +1,312 @@
+"""
+Partitioned Parquet datasets for the pipeline's intermediate files.
+
+Each stage writes its output to `data/datasets/<name>/` as a hive-style
+dataset (e.g. `model_name=gpt4_dummy/category=summarization/part-0.parquet`).
+String columns with few distinct values (such as `category` or the
+matched guardrail rule) are dictionary-encoded, so each distinct value
+is stored once per file.
+Readers can load only the columns and partitions they need. The older
+CSV files are still read when no dataset exists, and can be exported
+alongside the dataset. Stage frames are loaded with the compact dtypes
+of schema.py.
+"""
+import json
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from instrumentation import span
+from schema import CSV_DTYPES, KEY_COLUMNS, TEXT_COLUMNS, compact, read_csv
+
+
+DATASETS_DIR = "datasets"
+
+# dictionary-encode string columns with at most this share of distinct values
+DICTIONARY_MAX_UNIQUE_RATIO = 0.5
+# ... and at most this many: every file of a partitioned dataset gets the
+# whole dictionary, so larger ones (task_id, response) are left to
+# Parquet's own per-row-group dictionary pages
+DICTIONARY_MAX_VALUES = 4096
+
+# free-text / key columns that must stay strings even if a chunk looks numeric
+STRING_COLUMNS = {*KEY_COLUMNS, *TEXT_COLUMNS}
+
+
+def dataset_path(data_dir: Path, name: str) -> Path:
+    return Path(data_dir) / DATASETS_DIR / name
+
+
+def _dictionary_encode(table: pa.Table, skip: Iterable[str]) -> pa.Table:
+    skip = set(skip)
+    for i, field in enumerate(table.schema):
+        if field.name in skip or not (pa.types.is_string(field.type) or pa.types.is_large_string(field.type)):
+            continue
+        column = table.column(i)
+        if not len(column):
+            continue
+        distinct = pc.count_distinct(column).as_py()
+        if distinct <= min(DICTIONARY_MAX_UNIQUE_RATIO * len(column), DICTIONARY_MAX_VALUES):
+            table = table.set_column(i, field.name, pc.dictionary_encode(column))
+    return table
+
+
+def _write(data, path: Path, partition_cols: List[str], **kwargs):
+    # write next to the target and swap, so readers never see a half-written dataset:
+    # the old one is renamed aside and only deleted once the new one is in place
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    old = path.with_name(path.name + ".old")
+    shutil.rmtree(tmp, ignore_errors=True)
+    shutil.rmtree(old, ignore_errors=True)
+    ds.write_dataset(
+        data,
+        tmp,
+        format="parquet",
+        partitioning=partition_cols,
+        partitioning_flavor="hive",
+        existing_data_behavior="overwrite_or_ignore",
+        **kwargs,
+    )
+    if path.exists():
+        path.rename(old)
+    tmp.rename(path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def write_dataset(df: pd.DataFrame, path: Path, partition_cols: List[str]):
+    """Replace the dataset at `path` with `df`, partitioned by `partition_cols`."""
+    # categoricals arrive as dictionaries of every category; re-encode per column like plain strings
+    table = _dictionary_encode(decode_dictionaries(pa.Table.from_pandas(df, preserve_index=False)), skip=partition_cols)
+    _write(table, path, partition_cols)
+
+
+def _partition_fields(path: Path) -> List[str]:
+    """Partition column names, read from the hive directory layout."""
+    fields = []
+    current = path
+    while True:
+        subdirs = sorted(p for p in current.iterdir() if p.is_dir() and "=" in p.name)
+        if not subdirs:
+            return fields
+        fields.append(subdirs[0].name.split("=", 1)[0])
+        current = subdirs[0]
+
+
+def open_dataset(path: Path) -> ds.Dataset:
+    path = Path(path)
+    # partition values are always read back as strings (e.g. a model named "7")
+    partitioning = ds.partitioning(
+        pa.schema([(name, pa.string()) for name in _partition_fields(path)]), flavor="hive"
+    )
+    return ds.dataset(path, format="parquet", partitioning=partitioning)
+
+
+def read_dataset(
+    path: Path,
+    columns: Optional[List[str]] = None,
+    filters: Optional[Dict[str, Iterable]] = None,
+    categorical: bool = False,
+) -> pd.DataFrame:
+    """
+    Load a dataset, optionally only some columns and only the partitions
+    (or rows) whose values are listed in `filters`, e.g.
+    `{"model_name": ["gpt4_dummy"], "category": ["summarization"]}`.
+
+    Dictionary-encoded columns come back as plain strings unless
+    `categorical` is set.
+    """
+    dataset = open_dataset(path)
+    if columns is not None:
+        # like the CSV fallback, skip columns older runs did not write
+        columns = [c for c in columns if c in dataset.schema.names]
+
+    expr = None
+    for col, values in (filters or {}).items():
+        cond = ds.field(col).isin(list(values))
+        expr = cond if expr is None else expr & cond
+
+    table = dataset.to_table(columns=columns, filter=expr)
+    if columns is None:
+        table = table.select(_original_order(dataset, table.column_names))
+    if not categorical:
+        table = decode_dictionaries(table)
+    return table.to_pandas()
+
+
+def _original_order(dataset: ds.Dataset, names: List[str]) -> List[str]:
+    # partition columns are read back last; restore the order they were written in
+    meta = (dataset.schema.metadata or {}).get(b"pandas")
+    if not meta:
+        return names
+    written = [c["name"] for c in json.loads(meta)["columns"] if c["name"] in names]
+    return written + [n for n in names if n not in written]
+
+
+def partition_values(path: Path, column: str) -> List[str]:
+    """Distinct values of a partition column, without reading any data files."""
+    prefix = f"{column}="
+    return sorted({p.name[len(prefix):] for p in Path(path).rglob(f"{prefix}*") if p.is_dir()})
+
+
+# --- Stage helpers ----------------------------------------------
+
+def load_stage(
+    data_dir: Path,
+    name: str,
+    csv_paths: Iterable[Path] = (),
+    columns: Optional[List[str]] = None,
+    filters: Optional[Dict[str, Iterable]] = None,
+) -> Optional[pd.DataFrame]:
+    """
+    Read a stage's output from its dataset, falling back to CSV files
+    from older runs, with compact dtypes. Returns None if neither exists.
+    """
+    with span(f"load.{name}") as s:
+        df = _load_stage(data_dir, name, csv_paths, columns, filters)
+        if df is not None:
+            s.add_rows(len(df))
+        return df
+
+
+def _load_stage(data_dir, name, csv_paths, columns, filters) -> Optional[pd.DataFrame]:
+    path = dataset_path(data_dir, name)
+    if path.exists():
+        return compact(read_dataset(path, columns=columns, filters=filters))
+
+    csv_paths = [p for p in csv_paths if Path(p).exists()]
+    if not csv_paths:
+        return None
+    df = pd.concat([read_csv(p, columns) for p in csv_paths], ignore_index=True)
+    for col, values in (filters or {}).items():
+        df = df[df[col].isin(list(values))]
+    # concat falls back to strings when the files' categories differ
+    return compact(df.reset_index(drop=True))
+
+
+def save_stage(
+    df: pd.DataFrame,
+    data_dir: Path,
+    name: str,
+    partition_cols: List[str],
+    csv_path: Optional[Path] = None,
+) -> Path:
+    """Write a stage's output as a dataset, and optionally export it to CSV."""
+    path = dataset_path(data_dir, name)
+    with span(f"save.{name}") as s:
+        s.add_rows(len(df))
+        write_dataset(df, path, partition_cols)
+        if csv_path is not None:
+            df.to_csv(csv_path, index=False)
+    return path
+
+
+# --- Streaming ----------------------------------------------------
+# Chunked reads and writes, so a stage's peak memory is set by the
+# chunk size rather than by the size of the dataset.
+
+def iter_stage_chunks(
+    data_dir: Path,
+    name: str,
+    csv_paths: Iterable[Path] = (),
+    chunk_size: int = 100_000,
+    columns: Optional[List[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """Yield a stage's rows in chunks of at most `chunk_size`."""
+    path = dataset_path(data_dir, name)
+    if path.exists():
+        dataset = open_dataset(path)
+        if columns is not None:
+            # like read_dataset, skip columns older runs did not write
+            columns = [c for c in columns if c in dataset.schema.names]
+        columns = columns or _original_order(dataset, dataset.schema.names)
+        # no read-ahead, so only one batch is held at a time
+        for batch in dataset.to_batches(
+            columns=columns, batch_size=chunk_size, batch_readahead=0, fragment_readahead=0
+        ):
+            if batch.num_rows:
+                yield compact(decode_dictionaries(pa.Table.from_batches([batch])).to_pandas())
+        return
+
+    usecols = (lambda c: c in columns) if columns else None
+    for csv_path in csv_paths:
+        if Path(csv_path).exists():
+            for chunk in pd.read_csv(csv_path, usecols=usecols, dtype=CSV_DTYPES, chunksize=chunk_size):
+                yield compact(chunk)
+
+
+def decode_dictionaries(table: pa.Table) -> pa.Table:
+    """Cast dictionary-encoded columns back to their plain value type."""
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+    return table
+
+
+def _stream_schema(df: pd.DataFrame) -> pa.Schema:
+    """Schema for the whole stream, taken from its first chunk."""
+    base = pa.Schema.from_pandas(df, preserve_index=False)
+    fields = []
+    for field in base:
+        if field.name in STRING_COLUMNS or pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        fields.append(field)
+    # keep the pandas metadata so readers can restore the column order
+    return pa.schema(fields, metadata=base.metadata)
+
+
+def _conform(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    arrays = []
+    for field in schema:
+        col = df[field.name]
+        try:
+            arr = pa.array(col, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # mixed python objects, e.g. numbers and text in one column
+            arr = pa.array([None if pd.isna(v) else str(v) for v in col], type=pa.string())
+        if arr.type != field.type:
+            arr = arr.cast(field.type)
+        arrays.append(arr)
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def save_stage_stream(
+    chunks: Iterable[pd.DataFrame],
+    data_dir: Path,
+    name: str,
+    partition_cols: List[str],
+    chunk_size: int = 100_000,
+    csv_path: Optional[Path] = None,
+) -> Optional[Path]:
+    """
+    Write an iterator of DataFrame chunks as a stage's dataset, one chunk
+    at a time; optionally append each chunk to a CSV export as well.
+    Returns None if there were no chunks.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None:
+        return None
+    schema = _stream_schema(first)
+
+    def batches():
+        header = True
+        for chunk in _chain(first, chunks):
+            if csv_path is not None:
+                chunk.to_csv(csv_path, mode="w" if header else "a", header=header, index=False)
+                header = False
+            yield from _conform(chunk, schema).to_batches()
+
+    path = dataset_path(data_dir, name)
+    _write(batches(), path, partition_cols, schema=schema, max_rows_per_group=chunk_size)
+    return path
+
+
+def _chain(first: pd.DataFrame, rest: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    yield first
+    yield from rest
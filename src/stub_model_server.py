@@ -0,0 +1,210 @@
+"""
+Local stand-in for a model HTTP endpoint.
+
+Serves the dummy models from run_models.py over HTTP with configurable
+latency and error injection, so the async runner can be exercised
+without a real provider:
+
+    python src/stub_model_server.py --port 8765 --latency-ms 50 --error-rate 0.1
+
+--unsafe-rate makes that share of responses open with a refusal or a
+toxic remark, for exercising the guardrails.
+
+POST /generate  {"model_name", "category", "prompt", "reference_answer", "quality"}
+             -> {"model_name", "response"}
+
+POST /generate/stream  same request; the response is streamed with chunked
+             transfer encoding as newline-delimited {"token": ...} objects,
+             one every --token-ms, ending with {"done": true}. Without a
+             category, the playground dummy for model_name answers the prompt.
+             The X-Total-Tokens header says how many tokens the full
+             response has; closing the connection early stops the stream.
+
+POST /generate/batch  {"model_name", "quality", "prompts": [...]}
+             -> {"model_name", "responses": [...]}; one --latency-ms delay
+             for the whole batch.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from chat_models import DUMMY_MODELS, split_chunks
+from run_models import dummy_model_response
+
+UNSAFE_OPENERS = [
+    "I'm unable to assist with this request, but here is some general context.",
+    "As an AI language model, I cannot give a definitive answer.",
+    "What a stupid question, honestly.",
+    "Shut up and listen, this is simple.",
+]
+
+
+class StubModelHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out as separate writes; without TCP_NODELAY a
+    # kept-alive connection waits ~40ms for the delayed ACK on every request
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        # keep benchmark / runner output readable
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, payload: dict):
+        line = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+    def _stream_json(self, response: str):
+        tokens = split_chunks(response)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("X-Total-Tokens", str(len(tokens)))
+        self.end_headers()
+        sent = 0
+        try:
+            for token in tokens:
+                if sent and self.server.token_latency_s:
+                    time.sleep(self.server.token_latency_s)
+                self._send_chunk({"token": token})
+                sent += 1
+            self._send_chunk({"done": True})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # the client cancelled: stop generating
+            self.close_connection = True
+        finally:
+            self.server.record_stream(sent, len(tokens))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path not in ("/generate", "/generate/stream", "/generate/batch"):
+            self._send_json(404, {"error": f"unknown path {self.path}"})
+            return
+
+        # latency_s / error_rate are set on the StubModelServer
+        server = self.server
+        if server.latency_s:
+            time.sleep(random.uniform(0.5, 1.5) * server.latency_s)
+
+        if random.random() < server.error_rate:
+            status = random.choice([429, 500, 503])
+            self._send_json(status, {"error": "injected failure"})
+            return
+
+        if self.path == "/generate/batch":
+            responses = [self._respond(dict(request, prompt=prompt)) for prompt in request.get("prompts", [])]
+            self._send_json(200, {"model_name": request.get("model_name"), "responses": responses})
+            return
+
+        response = self._respond(request)
+        if self.path == "/generate/stream":
+            self._stream_json(response)
+        else:
+            self._send_json(200, {"model_name": request.get("model_name"), "response": response})
+
+    def _respond(self, request: dict) -> str:
+        chat = DUMMY_MODELS.get(str(request.get("model_name", "")).lower())
+        if not request.get("category") and chat is not None:
+            response = chat(request.get("prompt", ""))
+        else:
+            response = dummy_model_response(
+                request.get("category", ""),
+                request.get("prompt", ""),
+                str(request.get("reference_answer", "")),
+                float(request.get("quality", 1.0)),
+            )
+        if self.server.unsafe_rate and random.random() < self.server.unsafe_rate:
+            response = f"{random.choice(UNSAFE_OPENERS)} {response}"
+        return response
+
+
+class StubModelServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # the default backlog of 5 resets connections when many streams open at once
+    request_queue_size = 128
+
+    def __init__(self, address, latency_ms: float, error_rate: float, token_ms: float, unsafe_rate: float):
+        super().__init__(address, StubModelHandler)
+        self.latency_s = latency_ms / 1000.0
+        self.error_rate = error_rate
+        self.token_latency_s = token_ms / 1000.0
+        self.unsafe_rate = unsafe_rate
+        self._lock = threading.Lock()
+        self.streams = 0
+        self.streams_cancelled = 0
+        self.tokens_streamed = 0
+        self.tokens_total = 0
+
+    def record_stream(self, sent: int, total: int):
+        with self._lock:
+            self.streams += 1
+            self.streams_cancelled += sent < total
+            self.tokens_streamed += sent
+            self.tokens_total += total
+
+    def stream_stats(self) -> dict:
+        """Streams served and tokens sent, against what full responses would have taken."""
+        with self._lock:
+            return {
+                "streams": self.streams,
+                "streams_cancelled": self.streams_cancelled,
+                "tokens_streamed": self.tokens_streamed,
+                "tokens_total": self.tokens_total,
+            }
+
+
+def make_server(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    latency_ms: float = 0.0,
+    error_rate: float = 0.0,
+    token_ms: float = 0.0,
+    unsafe_rate: float = 0.0,
+) -> StubModelServer:
+    """Create (but do not start) a stub server; port 0 picks a free port."""
+    return StubModelServer((host, port), latency_ms, error_rate, token_ms, unsafe_rate)
+
+
+def start_in_background(**kwargs):
+    """Start a stub server on a daemon thread and return (server, base_url)."""
+    server = make_server(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in model server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--token-ms", type=float, default=0.0, help="delay between streamed tokens")
+    parser.add_argument("--unsafe-rate", type=float, default=0.0, help="share of responses opening with a violation")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency_ms, args.error_rate, args.token_ms, args.unsafe_rate)
+    print(f"Stub model server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
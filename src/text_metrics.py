@@ -0,0 +1,236 @@
+"""
+Batch text-overlap metrics: ROUGE-1/2/L and sentence BLEU.
+
+Every prediction and reference is tokenized once (lowercased, whitespace
+split) and tokens are interned into integer ids shared by both columns.
+N-grams are then integer ids as well, so clipped n-gram overlap for the
+whole column is a few factorize/bincount calls, and ROUGE-L uses a
+bit-parallel LCS that advances all rows of a batch one reference token
+at a time.
+"""
+from typing import Dict, NamedTuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+BLEU_MAX_N = 4
+METRIC_CHUNK_ROWS = 200_000
+LCS_BATCH_ROWS = 16_384
+
+_WORD_BITS = 64
+_ALL_ONES = np.uint64(2**64 - 1)
+
+
+class Tokens(NamedTuple):
+    """Flattened token ids of a text column plus per-row offsets."""
+
+    ids: np.ndarray
+    rows: np.ndarray
+    lengths: np.ndarray
+    offsets: np.ndarray
+
+
+def split_tokens(texts: pd.Series):
+    """
+    Lowercased whitespace tokens of every row, like str.lower().split(),
+    as (flat tokens, row of each token).
+    """
+    lists = pc.utf8_split_whitespace(pc.utf8_lower(pa.array(texts, type=pa.string())))
+    flat = pc.list_flatten(lists)
+    rows = pc.list_parent_indices(lists)
+    # Arrow keeps an empty token for empty strings and leading/trailing spaces
+    keep = pc.greater(pc.utf8_length(flat), 0)
+    return flat.filter(keep), rows.filter(keep).to_numpy().astype(np.int64)
+
+
+def intern_tokens(preds: pd.Series, refs: pd.Series):
+    """Tokenize both columns and map every token to an id shared by both. Returns (preds, refs, vocab_size)."""
+    pred_flat, pred_rows = split_tokens(preds)
+    ref_flat, ref_rows = split_tokens(refs)
+
+    encoded = pc.dictionary_encode(pa.concat_arrays([pred_flat, ref_flat]))
+    vocab_size = max(len(encoded.dictionary), 1)
+    token_ids = encoded.indices.to_numpy().astype(np.int64)
+
+    def tokens(ids: np.ndarray, rows: np.ndarray, n_rows: int) -> Tokens:
+        lengths = np.bincount(rows, minlength=n_rows).astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+        return Tokens(ids, rows, lengths, offsets)
+
+    return (
+        tokens(token_ids[: len(pred_flat)], pred_rows, len(preds)),
+        tokens(token_ids[len(pred_flat):], ref_rows, len(refs)),
+        vocab_size,
+    )
+
+
+# --- N-gram overlap ----------------------------------------------
+
+def _ngram_ids(ids: np.ndarray, seqs: np.ndarray, vocab_size: int, max_n: int):
+    """
+    Yield (n, gram_ids, seqs) for n = 1..max_n. An n-gram is identified by
+    the dense id of its (n-1)-gram prefix and its last token, so ids stay
+    small however large n gets; only n-grams inside one sequence are kept.
+    """
+    grams = ids
+    for n in range(1, max_n + 1):
+        if n > 1:
+            if len(grams) < 2:
+                return
+            grams, _ = pd.factorize(grams[:-1] * vocab_size + ids[n - 1:])
+            grams = grams.astype(np.int64)
+        starts = seqs[: len(grams)]
+        inside = starts == seqs[n - 1:]
+        yield n, grams[inside], starts[inside]
+
+
+def _sorted_counts(keys: np.ndarray):
+    keys = np.sort(keys)
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]])) if len(keys) else keys
+    return keys[starts], np.diff(np.concatenate([starts, [len(keys)]]))
+
+
+def _clipped_overlap(pred_rows, pred_grams, ref_rows, ref_grams, n_rows: int) -> np.ndarray:
+    """Per row, sum over n-grams of min(count in prediction, count in reference)."""
+    n_grams = int(max(pred_grams.max(initial=-1), ref_grams.max(initial=-1))) + 1
+    # sorting beats hashing here: most (row, n-gram) keys are distinct
+    pred_keys, pred_counts = _sorted_counts(pred_rows * n_grams + pred_grams)
+    ref_keys, ref_counts = _sorted_counts(ref_rows * n_grams + ref_grams)
+
+    at = np.minimum(np.searchsorted(ref_keys, pred_keys), max(len(ref_keys) - 1, 0))
+    shared = ref_keys[at] == pred_keys if len(ref_keys) else np.zeros(len(pred_keys), dtype=bool)
+    clipped = np.minimum(pred_counts[shared], ref_counts[at[shared]])
+    return np.bincount(pred_keys[shared] // n_grams, weights=clipped, minlength=n_rows)
+
+
+def ngram_overlaps(pred: Tokens, ref: Tokens, vocab_size: int, n_rows: int, max_n: int) -> Dict[int, np.ndarray]:
+    """Clipped n-gram overlap per row for n = 1..max_n."""
+    # predictions are sequences 0..n_rows-1, references n_rows..2*n_rows-1
+    ids = np.concatenate([pred.ids, ref.ids])
+    seqs = np.concatenate([pred.rows, ref.rows + n_rows])
+
+    overlaps = {n: np.zeros(n_rows) for n in range(1, max_n + 1)}
+    for n, grams, starts in _ngram_ids(ids, seqs, vocab_size, max_n):
+        is_pred = starts < n_rows
+        overlaps[n] = _clipped_overlap(
+            starts[is_pred], grams[is_pred], starts[~is_pred] - n_rows, grams[~is_pred], n_rows
+        )
+    return overlaps
+
+
+# --- Longest common subsequence ----------------------------------
+
+def _gather(tokens: Tokens, rows: np.ndarray):
+    """Flat token positions of `rows`, with their batch-local row and position in the row."""
+    lengths = tokens.lengths[rows]
+    total = int(lengths.sum())
+    batch_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    within = np.arange(total) - np.repeat(batch_starts, lengths)
+    local_rows = np.repeat(np.arange(len(rows)), lengths)
+    return np.repeat(tokens.offsets[rows], lengths) + within, local_rows, within
+
+
+def _add(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """a + b for multi-word unsigned integers stored little-endian along axis 1."""
+    if a.shape[1] == 1:
+        return a + b
+    out = np.empty_like(a)
+    carry = np.zeros(len(a), dtype=np.uint64)
+    for w in range(a.shape[1]):
+        partial = a[:, w] + b[:, w]
+        total = partial + carry
+        carry = ((partial < a[:, w]) | (total < partial)).astype(np.uint64)
+        out[:, w] = total
+    return out
+
+
+def _lcs_batch(pred: Tokens, ref: Tokens, rows: np.ndarray, vocab_size: int) -> np.ndarray:
+    # bit-parallel LCS (Hyyro 2004): one bit per prediction token, advanced
+    # by one reference token per step for every row of the batch at once
+    n = len(rows)
+    p_idx, p_rows, p_pos = _gather(pred, rows)
+    r_idx, r_rows, r_pos = _gather(ref, rows)
+    n_words = max(1, -(-int(pred.lengths[rows].max(initial=0)) // _WORD_BITS))
+
+    # match masks per (row, token); the extra last row stays zero for "no match"
+    codes, uniques = pd.factorize(p_rows * vocab_size + pred.ids[p_idx])
+    masks = np.zeros((len(uniques) + 1, n_words), dtype=np.uint64)
+    bits = np.left_shift(np.uint64(1), (p_pos % _WORD_BITS).astype(np.uint64))
+    np.bitwise_or.at(masks, (codes, p_pos // _WORD_BITS), bits)
+
+    grid = np.full((n, int(ref.lengths[rows].max(initial=0))), -1, dtype=np.intp)
+    grid[r_rows, r_pos] = pd.Index(uniques).get_indexer(r_rows * vocab_size + ref.ids[r_idx])
+
+    v = np.full((n, n_words), _ALL_ONES)
+    for j in range(grid.shape[1]):
+        u = v & masks[grid[:, j]]
+        v = _add(v, u) | (v ^ u)
+    return n_words * _WORD_BITS - np.bitwise_count(v).sum(axis=1).astype(np.int64)
+
+
+def lcs_lengths(pred: Tokens, ref: Tokens, vocab_size: int, n_rows: int) -> np.ndarray:
+    """Token-level LCS length per row."""
+    lcs = np.zeros(n_rows, dtype=np.int64)
+    # batch rows of similar prediction length so bit vectors stay narrow
+    order = np.argsort(pred.lengths, kind="stable")
+    for start in range(0, n_rows, LCS_BATCH_ROWS):
+        rows = order[start:start + LCS_BATCH_ROWS]
+        lcs[rows] = _lcs_batch(pred, ref, rows, vocab_size)
+    return lcs
+
+
+# --- Metrics -----------------------------------------------------
+
+def _ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    out = np.zeros(len(num))
+    np.divide(num, den, out=out, where=den > 0)
+    return out
+
+
+def summarization_metrics(preds: pd.Series, refs: pd.Series) -> Dict[str, np.ndarray]:
+    """
+    ROUGE-1, ROUGE-2 and ROUGE-L F1 and smoothed sentence BLEU-4 per row.
+    BLEU uses add-one smoothing for n > 1 (Lin & Och, 2004) and the usual
+    brevity penalty.
+    """
+    if len(preds) > METRIC_CHUNK_ROWS:
+        # bound the size of the intermediate token and n-gram arrays
+        parts = [
+            summarization_metrics(
+                preds.iloc[start:start + METRIC_CHUNK_ROWS].reset_index(drop=True),
+                refs.iloc[start:start + METRIC_CHUNK_ROWS].reset_index(drop=True),
+            )
+            for start in range(0, len(preds), METRIC_CHUNK_ROWS)
+        ]
+        return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+    n_rows = len(preds)
+    pred, ref, vocab_size = intern_tokens(preds, refs)
+    overlaps = ngram_overlaps(pred, ref, vocab_size, n_rows, BLEU_MAX_N)
+
+    def counts(lengths, n):
+        return np.maximum(lengths - n + 1, 0).astype(float)
+
+    metrics = {}
+    for n in (1, 2):
+        metrics[f"rouge{n}"] = _ratio(2 * overlaps[n], counts(pred.lengths, n) + counts(ref.lengths, n))
+
+    lcs = lcs_lengths(pred, ref, vocab_size, n_rows)
+    metrics["rougeL"] = _ratio(2 * lcs.astype(float), (pred.lengths + ref.lengths).astype(float))
+
+    log_precision = np.zeros(n_rows)
+    for n in range(1, BLEU_MAX_N + 1):
+        smooth = 0.0 if n == 1 else 1.0
+        precision = _ratio(overlaps[n] + smooth, counts(pred.lengths, n) + smooth)
+        with np.errstate(divide="ignore"):
+            log_precision += np.log(precision) / BLEU_MAX_N
+
+    pred_len = pred.lengths.astype(float)
+    ref_len = ref.lengths.astype(float)
+    with np.errstate(divide="ignore", over="ignore"):
+        brevity = np.where(pred_len >= ref_len, 1.0, np.exp(1.0 - ref_len / np.maximum(pred_len, 1.0)))
+    metrics["bleu"] = np.where(pred.lengths > 0, brevity * np.exp(log_precision), 0.0)
+    return metrics
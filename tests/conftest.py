@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# the pipeline modules import each other as top-level modules, as the scripts do
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+
+def pytest_configure(config):
+    # pandas deprecations (Pandas4Warning is a DeprecationWarning) become errors in the next major version
+    for category in ("FutureWarning", "DeprecationWarning"):
+        config.addinivalue_line("filterwarnings", f"error::{category}")
+
+
+@pytest.fixture
+def multiline_tasks(tmp_path):
+    """Write tasks.csv with quoted multi-line prompts to tmp_path and return the frame."""
+
+    def write(n_tasks=30_000):
+        # large enough for the CSV reader to split the file into several blocks
+        tasks = pd.DataFrame(
+            {
+                "task_id": [f"{i:05d}" for i in range(n_tasks)],
+                "category": "summarization",
+                "prompt": [f"Summarize:\n\"report {i}\",\nsecond line\n" for i in range(n_tasks)],
+                "reference_answer": "007",
+            }
+        )
+        tasks.to_csv(tmp_path / "tasks.csv", index=False)
+        return tasks
+
+    return write
@@ -0,0 +1,22 @@
+import pandas as pd
+
+import schema
+from aggregate_results import build_rollup
+
+
+def test_rollup_has_only_observed_key_pairs():
+    merged = schema.compact(
+        pd.DataFrame(
+            {
+                "task_id": ["1", "2", "3"],
+                "model_name": ["a", "b", "c"],
+                "category": ["qa", "math_reasoning", "summarization"],
+                "auto_correctness": [1.0, 0.5, 0.0],
+            }
+        )
+    )
+    rollup = build_rollup(merged)
+
+    # 3 (model, category) pairs occur, not the 3 x 3 combinations of categories
+    assert len(rollup) == 3
+    assert rollup["n_rows"].tolist() == [1, 1, 1]
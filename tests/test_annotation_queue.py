@@ -0,0 +1,68 @@
+import pandas as pd
+
+from annotation_queue import AnnotationQueue
+
+
+def task_rows(task_id, scores, toxic=(0, 0)):
+    return [
+        {"task_id": task_id, "model_name": model, "auto_correctness": score, "is_toxic": flag, "is_refusal": 0}
+        for model, score, flag in zip(["model_a", "model_b"], scores, toxic)
+    ]
+
+
+FRAME = pd.DataFrame(
+    task_rows("t1", [0.5, 0.5])
+    + task_rows("t2", [0.0, 1.0])
+    + task_rows("t3", [0.2, 0.6])
+    + task_rows("t4", [1.0, 1.0], toxic=(0, 1))
+    + task_rows("t5", [0.3, 0.3])
+).sample(frac=1, random_state=0)
+
+
+def drain(queue):
+    return [queue.next_task()["task_id"].iloc[0] for _ in range(len(queue))]
+
+
+def test_guardrail_hits_then_disagreement_first():
+    assert drain(AnnotationQueue(FRAME))[:3] == ["t4", "t2", "t3"]
+
+
+def test_unlabeled_before_labeled():
+    order = drain(AnnotationQueue(FRAME, labeled_task_ids=lambda: ["t4", "t2"]))
+    assert order[0] == "t3"
+    assert sorted(order[1:3]) == ["t1", "t5"]
+    assert order[3:] == ["t4", "t2"]
+
+
+def test_next_task_returns_every_model_of_the_task():
+    rows = AnnotationQueue(FRAME).next_task()
+    assert list(rows["task_id"]) == ["t4", "t4"]
+    assert list(rows["model_name"]) == ["model_a", "model_b"]
+
+
+def test_each_task_once_per_pass_then_refill():
+    labeled = []
+    queue = AnnotationQueue(FRAME, labeled_task_ids=lambda: labeled)
+    first_pass = drain(queue)
+    assert sorted(first_pass) == ["t1", "t2", "t3", "t4", "t5"]
+    assert list(queue.served()) == first_pass
+
+    # the refill re-reads the labels: t4 now goes last
+    labeled.append("t4")
+    assert queue.next_task()["task_id"].iloc[0] == "t2"
+    assert len(queue) == 4
+    assert drain(queue)[-1] == "t4"
+
+
+def test_defer_moves_tasks_behind_the_rest_of_the_pass():
+    queue = AnnotationQueue(FRAME)
+    queue.defer(["t4"])
+    order = drain(queue)
+    assert order[0] == "t2"
+    assert order[-1] == "t4"
+
+
+def test_empty_frame():
+    queue = AnnotationQueue(FRAME.iloc[:0])
+    assert len(queue) == 0
+    assert queue.next_task() is None
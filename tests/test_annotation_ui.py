@@ -0,0 +1,29 @@
+import pandas as pd
+
+from human_annotation_ui import AnnotationData
+from storage import save_stage
+
+
+def test_next_task_with_multiline_prompts(tmp_path, multiline_tasks):
+    tasks = multiline_tasks()
+    shown = tasks.iloc[:50]
+    scores = pd.DataFrame(
+        {
+            "task_id": shown["task_id"].repeat(2).to_numpy(),
+            "model_name": ["gpt4_dummy", "llama3_dummy"] * len(shown),
+            "category": "summarization",
+            "response": "a summary",
+            "auto_correctness": 0.5,
+            "is_toxic": 0,
+            "is_refusal": 0,
+        }
+    )
+    save_stage(scores, tmp_path, "auto_scores_with_guardrails", ["model_name", "category"])
+
+    data = AnnotationData(tmp_path)
+    subset = data.next_task()
+
+    task_id = subset["task_id"].iloc[0]
+    assert sorted(subset["model_name"]) == ["gpt4_dummy", "llama3_dummy"]
+    assert subset["prompt"].iloc[0] == tasks.set_index("task_id").loc[task_id, "prompt"]
+    data.labels.close()
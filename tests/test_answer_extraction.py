@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from answer_extraction import extract_answers, parse_answer
+
+CASES = [
+    ("8", 8.0),
+    (" 3.5 ", 3.5),
+    ("1e-3", 0.001),
+    ("-4", -4.0),
+    ("The answer is 8 apples.", 8.0),
+    ("It takes 3.5 hours.", 3.5),
+    ("Total: $1,250 in all", 1250.0),
+    ("1,234,567", 1234567.0),
+    ("Roughly 3/4 of it", 0.75),
+    ("1/0", np.inf),
+    ("3-5 hours", 5.0),
+    ("It drops to -2 degrees", -2.0),
+    ("Step 1: 2 + 3 = 5.\nStep 2: so the answer is 10", 10.0),
+    (".5", 0.5),
+    ("I'm not sure.", np.nan),
+    ("", np.nan),
+    ("   ", np.nan),
+    ("nan", np.nan),
+]
+
+
+@pytest.mark.parametrize("text, expected", CASES)
+def test_parse_answer(text, expected):
+    assert parse_answer(text) == pytest.approx(expected, nan_ok=True)
+
+
+def test_extract_answers_matches_parse_answer():
+    texts = pd.Series([text for text, _ in CASES] + [None, np.nan], dtype=object)
+    values = extract_answers(texts)
+    expected = np.array([parse_answer(text) for text in texts])
+    assert values.dtype == np.float64
+    np.testing.assert_array_equal(values, expected)
+    assert np.isnan(values[-2:]).all()
+
+
+def test_extract_answers_string_dtypes():
+    texts = pd.Series(["The answer is 8 apples.", None, "1,250"])
+    for dtype in [object, "string", pd.StringDtype("pyarrow", na_value=np.nan)]:
+        np.testing.assert_array_equal(extract_answers(texts.astype(dtype)), [8.0, np.nan, 1250.0])
+
+
+def test_extract_answers_empty():
+    values = extract_answers(pd.Series([], dtype=object))
+    assert values.shape == (0,) and values.dtype == np.float64
@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from batching import MicroBatcher
+
+
+class Recorder:
+    """A batch backend that records the batches it is sent."""
+
+    def __init__(self, delay_s=0.0):
+        self.batches = []
+        self.delay_s = delay_s
+        self._lock = threading.Lock()
+
+    def __call__(self, model_name, prompts):
+        with self._lock:
+            self.batches.append((model_name, list(prompts)))
+        time.sleep(self.delay_s)
+        return [f"{model_name}:{prompt}" for prompt in prompts]
+
+
+def test_flushes_when_the_batch_is_full():
+    backend = Recorder()
+    # a wait far longer than the test: only a full batch can be sent
+    batcher = MicroBatcher(backend, max_batch_size=4, max_wait_ms=60_000, max_in_flight=1)
+    futures = [batcher.submit("m", str(i)) for i in range(4)]
+
+    assert [f.result(timeout=5) for f in futures] == ["m:0", "m:1", "m:2", "m:3"]
+    assert backend.batches == [("m", ["0", "1", "2", "3"])]
+    batcher.close()
+
+
+def test_flushes_a_partial_batch_after_max_wait():
+    backend = Recorder()
+    batcher = MicroBatcher(backend, max_batch_size=100, max_wait_ms=50)
+    start = time.perf_counter()
+    futures = [batcher.submit("m", str(i)) for i in range(3)]
+
+    assert [f.result(timeout=5) for f in futures] == ["m:0", "m:1", "m:2"]
+    assert time.perf_counter() - start >= 0.05
+    assert backend.batches == [("m", ["0", "1", "2"])]
+    stats = batcher.stats()["m"]
+    assert (stats["batches"], stats["requests"], stats["max_batch_size"]) == (1, 3, 3)
+    batcher.close()
+
+
+def test_models_are_batched_separately():
+    backend = Recorder()
+    batcher = MicroBatcher(backend, max_batch_size=2, max_wait_ms=60_000)
+    futures = [batcher.submit(model, "x") for model in ["a", "b", "a", "b"]]
+
+    assert [f.result(timeout=5) for f in futures] == ["a:x", "b:x", "a:x", "b:x"]
+    assert sorted(backend.batches) == [("a", ["x", "x"]), ("b", ["x", "x"])]
+    batcher.close()
+
+
+def test_backend_errors_reach_every_caller_in_the_batch():
+    def broken(model_name, prompts):
+        raise ValueError("backend down")
+
+    batcher = MicroBatcher(broken, max_batch_size=2, max_wait_ms=60_000)
+    futures = [batcher.submit("m", str(i)) for i in range(2)]
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+    batcher.close()
+
+
+def test_close_flushes_queued_prompts_and_rejects_new_ones():
+    backend = Recorder()
+    batcher = MicroBatcher(backend, max_batch_size=100, max_wait_ms=60_000)
+    futures = [batcher.submit("m", str(i)) for i in range(3)]
+
+    batcher.close()
+
+    # sent without waiting out max_wait
+    assert [f.result(timeout=5) for f in futures] == ["m:0", "m:1", "m:2"]
+    with pytest.raises(RuntimeError):
+        batcher.submit("m", "late")
+    with pytest.raises(RuntimeError):
+        batcher.submit("other", "late")
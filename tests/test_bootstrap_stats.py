@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import bootstrap_stats
+from bootstrap_stats import bootstrap_compare, paired_scores, resample_means
+
+
+def scores_frame(n_tasks=200, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for category, levels in [("math_reasoning", [0.0, 0.5, 1.0]), ("summarization", None)]:
+        for t in range(n_tasks):
+            for model, shift in [("model_a", 0.0), ("model_b", 0.2), ("model_c", 0.0)]:
+                score = rng.choice(levels) if levels else rng.random()
+                rows.append(
+                    {
+                        "task_id": f"{category}_{t}",
+                        "model_name": model,
+                        "category": category,
+                        "auto_correctness": min(1.0, score + shift),
+                    }
+                )
+    return pd.DataFrame(rows)
+
+
+def test_interval_contains_the_point_estimate():
+    df = scores_frame()
+    intervals, pairwise = bootstrap_compare(df, n_resamples=2000)
+
+    assert len(intervals) == 6
+    assert (intervals["ci_low"] <= intervals["mean"]).all()
+    assert (intervals["mean"] <= intervals["ci_high"]).all()
+    assert (pairwise["ci_low"] <= pairwise["mean_diff"]).all()
+    assert (pairwise["mean_diff"] <= pairwise["ci_high"]).all()
+
+    expected = df.groupby(["model_name", "category"])["auto_correctness"].mean()
+    got = intervals.set_index(["model_name", "category"])["mean"]
+    assert np.allclose(got, expected.loc[got.index])
+
+
+def test_pairwise_detects_a_shift():
+    _, pairwise = bootstrap_compare(scores_frame(), n_resamples=2000)
+    by_pair = pairwise.set_index(["category", "model_a", "model_b"])
+
+    # model_b is shifted up; model_a and model_c come from the same distribution
+    shifted = by_pair.loc[("summarization", "model_a", "model_b")]
+    assert shifted["ci_high"] < 0
+    assert shifted["p_value"] < 0.01
+    assert by_pair.loc[("summarization", "model_a", "model_c"), "p_value"] > 0.01
+
+
+def test_identical_models_have_no_difference():
+    df = scores_frame()
+    df = pd.concat([df, df.assign(model_name=df["model_name"] + "_copy")], ignore_index=True)
+    _, pairwise = bootstrap_compare(df, n_resamples=500)
+
+    same = pairwise[pairwise["model_b"] == pairwise["model_a"] + "_copy"]
+    assert len(same) == 6
+    assert (same["mean_diff"] == 0).all()
+    assert (same["ci_low"] == 0).all() and (same["ci_high"] == 0).all()
+    assert (same["p_value"] == 1).all()
+
+
+def test_unpaired_rows_are_dropped():
+    df = pd.DataFrame(
+        {
+            "task_id": ["t1", "t1", "t2", "t2", "t2", "t3"],
+            "model_name": ["a", "b", "a", "b", "a", "a"],
+            "auto_correctness": [1.0, 0.0, 0.5, 0.5, 0.25, 1.0],
+        }
+    )
+    models, values = paired_scores(df, "auto_correctness")
+    assert models == ["a", "b"]
+    # t2's second answer from a and t3 have no partner in b
+    assert values.tolist() == [[1.0, 0.0], [0.5, 0.5]]
+
+
+@pytest.mark.parametrize("max_distinct", [bootstrap_stats.MULTINOMIAL_MAX_DISTINCT, 0])
+def test_resample_means_matches_the_bootstrap_distribution(monkeypatch, max_distinct):
+    # 0 forces the index-matrix path; both must resample rows uniformly
+    monkeypatch.setattr(bootstrap_stats, "MULTINOMIAL_MAX_DISTINCT", max_distinct)
+    values = np.repeat([[0.0, 1.0], [1.0, 1.0], [0.5, 0.0], [1.0, 0.0]], [40, 30, 20, 10], axis=0)
+    means = resample_means(values, 20_000, np.random.default_rng(0))
+
+    assert means.shape == (20_000, 2)
+    assert np.allclose(means.mean(axis=0), values.mean(axis=0), atol=0.005)
+    expected_sd = values.std(axis=0) / np.sqrt(len(values))
+    assert np.allclose(means.std(axis=0), expected_sd, rtol=0.05)
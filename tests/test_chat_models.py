@@ -0,0 +1,48 @@
+import pytest
+
+import chat_models
+from chat_models import DummyProvider, HTTPProvider, Provider, batcher_stats, split_chunks, stream_response
+from stub_model_server import start_in_background
+
+
+def test_provider_must_implement_stream():
+    class NoStream(Provider):
+        pass
+
+    with pytest.raises(TypeError):
+        NoStream("broken")
+
+
+def test_split_chunks_joins_back():
+    text = "  The answer is\n8 apples. "
+    assert "".join(split_chunks(text)) == text
+
+
+def test_dummy_provider_streams_chunks():
+    provider = DummyProvider("echo", lambda prompt: f"Answer: {prompt}")
+    chunks = list(provider.stream("two words"))
+    assert chunks == ["Answer: ", "two ", "words"]
+    assert provider.generate_batch(["a", "b"]) == ["Answer: a", "Answer: b"]
+
+
+def test_stream_response_unknown_model():
+    assert "Unknown model" in "".join(stream_response("no_such_model", "hi"))
+
+
+def test_http_provider_streams_from_stub_server():
+    server, base_url = start_in_background()
+    provider = HTTPProvider("http:gpt4_dummy", base_url, "gpt4_dummy")
+    try:
+        chunks = list(provider.stream("What is 2 + 2?"))
+        assert len(chunks) > 1
+        assert "".join(chunks) == provider.generate_batch(["What is 2 + 2?"])[0]
+    finally:
+        provider.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_batcher_stats_do_not_create_the_batcher(monkeypatch):
+    monkeypatch.setattr(chat_models, "_BATCHER", None)
+    assert batcher_stats() == {}
+    assert chat_models._BATCHER is None
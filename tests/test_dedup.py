@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+import dedup
+from guardrails import apply_guardrails, detect_refusal, detect_toxicity
+from scoring_rubric import SCORE_COLUMNS, score_math_reasoning, score_rows, score_sentiment, simple_overlap_score
+from semantic_similarity import fit_reference_index, index_key, reference_texts
+
+ROWS = [
+    # responses repeat exactly and up to each category's normalizer
+    ("math_reasoning", "The answer is 8.", "8"),
+    ("math_reasoning", "  The answer is 8.\n", "8"),
+    ("math_reasoning", "The answer is 8.", "8"),
+    ("math_reasoning", "The answer is 7.", "8"),
+    ("math_reasoning", "No idea.", "8"),
+    ("sentiment_classification", "Positive", "positive"),
+    ("sentiment_classification", " POSITIVE ", "positive"),
+    ("sentiment_classification", "negative", "positive"),
+    ("sentiment_classification", "negative", "negative"),
+    ("summarization", "The cat sat on the mat.", "A cat sat on a mat."),
+    ("summarization", "the  CAT sat\non the mat.", "A cat sat on a mat."),
+    ("summarization", "The cat sat on the mat.", "A dog ran."),
+    ("summarization", "", "A dog ran."),
+    ("summarization", "As an AI language model, I cannot summarize. Idiot.", "A dog ran."),
+]
+
+PER_ROW = {
+    "math_reasoning": score_math_reasoning,
+    "sentiment_classification": score_sentiment,
+    "summarization": simple_overlap_score,
+}
+
+
+def merged_frame():
+    df = pd.DataFrame(ROWS, columns=["category", "response", "reference_answer"])
+    return df.assign(task_id=[f"t{i}" for i in range(len(df))], model_name="model_a")
+
+
+def test_score_rows_matches_scoring_each_row_alone():
+    df = merged_frame()
+    references = reference_texts(df)
+    similarity = fit_reference_index(references, index_key(references))
+
+    batch = score_rows(df, similarity)
+    single = pd.concat([score_rows(df.iloc[[i]], similarity) for i in range(len(df))])
+    pd.testing.assert_frame_equal(batch[SCORE_COLUMNS], single[SCORE_COLUMNS])
+
+    expected = [PER_ROW[c](p, r) for c, p, r in ROWS]
+    assert np.allclose(batch["auto_correctness"], expected, atol=1e-6)
+
+
+def test_apply_guardrails_matches_per_row_detectors():
+    df = merged_frame()
+    df = pd.concat([df, df.assign(response=df["response"].str.upper())], ignore_index=True)
+
+    flagged = apply_guardrails(df)
+    assert flagged["is_toxic"].tolist() == [detect_toxicity(t) for t in df["response"]]
+    assert flagged["is_refusal"].tolist() == [detect_refusal(t) for t in df["response"]]
+    assert flagged["is_toxic"].sum() == 2
+
+
+def test_group_codes():
+    a = pd.Series(["x", "y", "x", "x", None, None])
+    b = pd.Series([1, 1, 1, 2, 1, 1])
+    codes, first = dedup.group_codes(a, b)
+    assert codes.tolist() == [0, 1, 0, 2, 3, 3]
+    assert first.tolist() == [0, 1, 3, 4]
+
+
+def test_lower_tokens_matches_split():
+    values = pd.Series(["  The  CAT\tsat \n", "", "a b", "A  B "])
+    assert dedup.lower_tokens(values).tolist() == [" ".join(v.lower().split()) for v in values]
@@ -0,0 +1,64 @@
+import pandas as pd
+
+from fingerprints import fingerprint_rows, incremental_apply
+
+
+def square(df):
+    return df.assign(squared=df["x"].astype(float) ** 2)
+
+
+def fingerprinted(xs, version):
+    df = pd.DataFrame({"x": xs})
+    return df.assign(fp=fingerprint_rows(df, ["x"], version))
+
+
+def run(df, previous):
+    computed = []
+
+    def compute(rows):
+        computed.extend(rows["x"].tolist())
+        return square(rows)
+
+    return incremental_apply(df, "fp", previous, ["squared"], compute), computed
+
+
+def test_reuses_unchanged_rows_and_recomputes_changed_ones():
+    first, computed = run(fingerprinted([1, 2, 3], "v1"), None)
+    assert computed == [1, 2, 3]
+
+    # stored values are what gets reused: mark them to tell them apart
+    previous = first.assign(squared=first["squared"] + 0.5)
+    result, computed = run(fingerprinted([3, 4, 1], "v1"), previous)
+
+    assert computed == [4]
+    assert result["x"].tolist() == [3, 4, 1]
+    assert result["squared"].tolist() == [9.5, 16.0, 1.5]
+    assert result.columns[-1] == "fp"
+
+
+def test_version_change_recomputes_everything():
+    first, _ = run(fingerprinted([1, 2], "v1"), None)
+    _, computed = run(fingerprinted([1, 2], "v2"), first)
+    assert computed == [1, 2]
+
+
+def test_per_row_versions():
+    df = pd.DataFrame({"x": [1, 2]})
+    first, _ = run(df.assign(fp=fingerprint_rows(df, ["x"], "v1")), None)
+    # only the second row's version changes
+    versions = pd.Series(["v1", "v2"], index=df.index)
+    _, computed = run(df.assign(fp=fingerprint_rows(df, ["x"], versions)), first)
+    assert computed == [2]
+
+
+def test_previous_without_value_columns_is_ignored():
+    previous = fingerprinted([1], "v1")
+    _, computed = run(fingerprinted([1, 2], "v1"), previous)
+    assert computed == [1, 2]
+
+
+def test_numbers_and_text_fingerprint_the_same():
+    # a CSV round trip can turn "8" into 8
+    text = fingerprint_rows(pd.DataFrame({"x": ["8"]}), ["x"], "v1")
+    number = fingerprint_rows(pd.DataFrame({"x": [8]}), ["x"], "v1")
+    assert text.tolist() == number.tolist()
@@ -0,0 +1,81 @@
+import re
+
+import pandas as pd
+import pytest
+
+from guardrails import GUARDRAIL_COLUMNS, STREAM_RULES, StreamGuard, apply_guardrails, first_match, guard_stream
+
+TEXTS = [
+    "The answer is 8.",
+    "I hate you, the answer is 8.",
+    "Well, I hate this question.",
+    "Damn it, 8.",
+    "Total: 8. Damn",
+    "As an AI language model, I cannot answer that. You idiot.",
+    "Is it stupid? I'm unable to assist.",
+    "",
+]
+
+
+def run_guard(chunks):
+    guard = StreamGuard()
+    received = []
+    for chunk in chunks:
+        received.append(chunk)
+        if guard.feed(chunk):
+            break
+    guard.finish()
+    return guard, "".join(received)
+
+
+def check(text, chunks):
+    guard, received = run_guard(chunks)
+    for name, (matcher, _) in STREAM_RULES.items():
+        # every rule reports what the batch check finds in the text received
+        assert guard.matches[name] == first_match(received, matcher)
+        # and the rule that stopped the stream saw the match the full text has
+        if guard.stopped and guard.matches[name] is not None:
+            assert guard.matches[name] == first_match(text, matcher)
+    return guard, received
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_every_two_chunk_split(text):
+    for i in range(len(text) + 1):
+        check(text, [text[:i], text[i:]])
+
+
+@pytest.mark.parametrize("text", TEXTS)
+def test_character_by_character(text):
+    check(text, list(text))
+
+
+def test_longer_match_is_not_cut_short():
+    # "hate" alone would be complete after four characters; "hate you" is what first_match reports
+    guard, _ = check("I hate you", list("I hate you"))
+    assert guard.toxic_match == "hate you"
+
+
+def test_stops_and_matches_batch_flags():
+    text = "As an AI language model, I cannot answer that. " + "More text. " * 50
+    guard, received = check(text, re.findall(r"\S+\s*", text))
+    assert guard.stopped
+    assert len(received) < len(text)
+    batch = apply_guardrails(pd.DataFrame({"response": [received]}))[GUARDRAIL_COLUMNS].iloc[0]
+    assert batch["is_refusal"] == 1 and batch["refusal_match"] == guard.refusal_match
+    assert batch["is_toxic"] == 0 and guard.toxic_match is None
+
+
+def test_guard_stream_closes_source():
+    closed = []
+
+    def source():
+        try:
+            yield from ["Shut ", "up ", "and ", "listen ", "to ", "this ", "long ", "answer"]
+        finally:
+            closed.append(True)
+
+    guard = StreamGuard()
+    chunks = list(guard_stream(source(), guard))
+    assert guard.stopped and guard.toxic_match == "shut up"
+    assert chunks[-1] != "answer" and closed == [True]
@@ -0,0 +1,26 @@
+import json
+
+import instrumentation
+from instrumentation import Registry
+
+
+def test_metrics_include_peak_rss():
+    registry = Registry()
+    with registry.span("load"):
+        registry.add_rows(3)
+    assert "eval_peak_rss_bytes{" in registry.to_prometheus("job")
+    assert registry.to_trace("job")["otherData"]["peak_rss_bytes"] > 0
+
+
+def test_metrics_without_resource_module(monkeypatch):
+    # as on Windows, where the resource module does not exist
+    monkeypatch.setattr(instrumentation, "resource", None)
+    registry = Registry()
+    with registry.span("load"):
+        registry.add_rows(3)
+
+    text = registry.to_prometheus("job")
+    assert "peak_rss_bytes" not in text
+    assert 'eval_span_rows_total{job="job",span="load"} 3' in text
+    trace = json.loads(json.dumps(registry.to_trace("job")))
+    assert trace["otherData"]["peak_rss_bytes"] is None
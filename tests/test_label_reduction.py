@@ -0,0 +1,92 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from label_reduction import ALL_MODELS, agreement, reduce_labels
+
+
+def label(task_id, model_name, helpfulness, is_best=0, comments=""):
+    return {
+        "task_id": task_id,
+        "model_name": model_name,
+        "is_best": is_best,
+        "helpfulness": helpfulness,
+        "correctness_human": helpfulness,
+        "safety_human": 5,
+        "comments": comments,
+    }
+
+
+def krippendorff_interval(units):
+    """Textbook interval alpha over all pairable values, for comparison."""
+    units = [u for u in units if len(u) >= 2]
+    values = [v for u in units for v in u]
+    n = len(values)
+    observed = sum(
+        sum((a - b) ** 2 for a, b in itertools.permutations(u, 2)) / (len(u) - 1) for u in units
+    ) / n
+    expected = sum((a - b) ** 2 for a, b in itertools.permutations(values, 2)) / (n * (n - 1))
+    return 1 - observed / expected
+
+
+def test_reduce_labels_one_row_per_answer():
+    labels = pd.DataFrame(
+        [
+            label("t1", "model_a", 4, is_best=1, comments="good"),
+            label("t1", "model_a", 2, comments=" good "),
+            label("t1", "model_a", 3, is_best=1, comments="terse"),
+            label("t1", "model_b", 1),
+            label("t2", "model_a", 5, comments=""),
+        ]
+    )
+    reduced = reduce_labels(labels).set_index(["task_id", "model_name"])
+
+    assert len(reduced) == 3
+    t1a = reduced.loc[("t1", "model_a")]
+    assert t1a["is_best"] == pytest.approx(2 / 3)
+    assert t1a["helpfulness"] == pytest.approx(3.0)
+    assert t1a["helpfulness_median"] == 3.0
+    assert t1a["n_labels"] == 3
+    assert t1a["comments"] == "good | terse"
+    assert reduced.loc[("t1", "model_b"), "n_labels"] == 1
+    assert pd.isna(reduced.loc[("t2", "model_a"), "comments"])
+
+
+def test_alpha_is_one_when_annotators_agree():
+    labels = pd.DataFrame(
+        [label(f"t{t}", model, score) for t, (model, score) in enumerate([("model_a", 1), ("model_a", 4), ("model_b", 5)])]
+        * 3
+    )
+    table = agreement(labels, ["helpfulness"]).set_index("model_name")
+
+    assert table.loc[ALL_MODELS, "alpha"] == pytest.approx(1.0)
+    assert table.loc[ALL_MODELS, "n_answers"] == 3
+    assert table.loc[ALL_MODELS, "n_labels"] == 9
+    assert table.loc["model_a", "alpha"] == pytest.approx(1.0)
+    # model_b has one answer, all labels equal: nothing to compare against
+    assert np.isnan(table.loc["model_b", "alpha"])
+
+
+def test_alpha_matches_textbook_formula():
+    units = {
+        ("t1", "model_a"): [1, 2, 1],
+        ("t2", "model_a"): [4, 4],
+        ("t3", "model_a"): [2, 5, 3, 3],
+        ("t4", "model_a"): [5],
+        ("t5", "model_a"): [3, 3],
+    }
+    labels = pd.DataFrame([label(t, m, v) for (t, m), values in units.items() for v in values])
+    table = agreement(labels, ["helpfulness"]).set_index("model_name")
+
+    assert table.loc[ALL_MODELS, "alpha"] == pytest.approx(krippendorff_interval(list(units.values())))
+    # the single-label answer does not count
+    assert table.loc[ALL_MODELS, "n_answers"] == 4
+    assert table.loc[ALL_MODELS, "n_labels"] == 11
+
+
+def test_agreement_without_repeated_labels():
+    labels = pd.DataFrame([label("t1", "model_a", 3), label("t2", "model_a", 4)])
+    assert agreement(labels).empty
+    assert agreement(None).empty
@@ -0,0 +1,36 @@
+import threading
+
+import pandas as pd
+
+from label_store import LabelStore, load_labels
+
+
+def test_concurrent_open_imports_csv_once(tmp_path):
+    labels = pd.DataFrame({"task_id": ["1", "2"], "model_name": ["a", "a"], "is_best": [1, 0], "comments": ["", "ok"]})
+    labels.to_csv(tmp_path / "labels_humans.csv", index=False)
+
+    stores = []
+    barrier = threading.Barrier(8)
+
+    def open_store():
+        barrier.wait()
+        stores.append(LabelStore(tmp_path / "labels.sqlite", import_csv=tmp_path / "labels_humans.csv"))
+
+    threads = [threading.Thread(target=open_store) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert [store.count() for store in stores] == [2] * 8
+    for store in stores:
+        store.close()
+
+
+def test_load_labels_closes_store(tmp_path):
+    with LabelStore(tmp_path / "labels.sqlite") as store:
+        store.add_labels([{"task_id": "1", "model_name": "a", "is_best": 1}])
+
+    assert load_labels(tmp_path)["task_id"].astype(str).tolist() == ["1"]
+    # no connection left open, so the WAL is checkpointed and removed
+    assert not (tmp_path / "labels.sqlite-wal").exists()
@@ -0,0 +1,18 @@
+from mapped_table import MappedTable
+
+
+def test_csv_with_multiline_prompts(tmp_path, multiline_tasks):
+    tasks = multiline_tasks()
+    table = MappedTable(tmp_path / "tasks.csv", cache_dir=tmp_path / "cache")
+
+    assert len(table) == len(tasks)
+    assert table.to_pandas(["prompt"])["prompt"].tolist() == tasks["prompt"].tolist()
+
+
+def test_csv_keeps_ids_and_answers_as_text(tmp_path, multiline_tasks):
+    multiline_tasks(n_tasks=10)
+    table = MappedTable(tmp_path / "tasks.csv", cache_dir=tmp_path / "cache")
+
+    rows = table.take([0, 9], ["task_id", "reference_answer"])
+    assert rows["task_id"].tolist() == ["00000", "00009"]
+    assert rows["reference_answer"].tolist() == ["007", "007"]
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+import parallel_scoring
+from generate_tasks import build_tasks
+from guardrails import GUARDRAIL_COLUMNS, apply_guardrails_incremental
+from parallel_scoring import score_parallel
+from run_models import MODEL_CONFIGS, generate_outputs_for_model
+from scoring_rubric import apply_rubric_incremental
+
+
+@pytest.fixture
+def tasks_and_outputs():
+    # no free-text references, so no similarity index is fitted
+    tasks = build_tasks(300)
+    tasks = tasks[tasks["category"] != "summarization"].reset_index(drop=True)
+    outputs = pd.concat(
+        [generate_outputs_for_model(tasks, name, quality) for name, quality in MODEL_CONFIGS], ignore_index=True
+    )
+    serial = apply_guardrails_incremental(apply_rubric_incremental(tasks, outputs, None, log=False), None, log=False)
+    return tasks, outputs, serial
+
+
+def test_pool_matches_serial_run(tasks_and_outputs, monkeypatch):
+    tasks, outputs, serial = tasks_and_outputs
+    monkeypatch.setattr(parallel_scoring, "MIN_ROWS_PER_WORKER", 1)
+    monkeypatch.setattr(parallel_scoring, "usable_cpus", lambda: 2)
+
+    result, stats = score_parallel(tasks, outputs, workers=2, shard_size=200)
+
+    assert len(stats) >= 1 and sum(s["rows"] for s in stats.values()) == len(outputs)
+    pd.testing.assert_frame_equal(result, serial)
+
+
+def test_small_input_is_scored_serially(tasks_and_outputs):
+    tasks, outputs, serial = tasks_and_outputs
+
+    result, stats = score_parallel(tasks, outputs, workers=4, shard_size=200)
+
+    assert stats == {}
+    assert set(GUARDRAIL_COLUMNS) <= set(result.columns)
+    pd.testing.assert_frame_equal(result, serial)
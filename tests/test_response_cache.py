@@ -0,0 +1,103 @@
+import itertools
+import threading
+import types
+
+import pytest
+
+import response_cache
+from response_cache import ResponseCache, make_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # a strictly increasing clock, so access order never ties
+    ticks = itertools.count(1)
+    monkeypatch.setattr(response_cache, "time", types.SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def test_evicts_least_recently_used(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.sqlite", max_bytes=30)
+    for key in "abc":
+        cache.put(key, "m", key * 10)
+    # reading "a" makes "b" the least recently used
+    assert cache.get("a") == "a" * 10
+    cache.put("d", "m", "d" * 10)
+
+    assert sorted(cache.get_many("abcd")) == ["a", "c", "d"]
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["bytes"] == 30 and stats["entries"] == 3
+    cache.close()
+
+
+def test_replacing_a_key_does_not_count_its_size_twice(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.sqlite", max_bytes=100)
+    cache.put("a", "m", "x" * 10)
+    cache.put("a", "m", "y" * 20)
+    assert cache.get("a") == "y" * 20
+    assert cache.stats()["bytes"] == 20
+    cache.close()
+
+
+def test_hit_and_miss_counters(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = ResponseCache(path)
+    cache.put_many([("a", "m", "1"), ("b", "m", "2")])
+    assert cache.get_many(["a", "b", "c", "a"]) == {"a": "1", "b": "2"}
+    assert cache.get("c") is None
+    assert (cache.hits, cache.misses) == (2, 2)
+    cache.close()
+
+    # this process's counters start over; the database keeps the totals
+    cache = ResponseCache(path)
+    assert cache.get("a") == "1"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 0)
+    assert (stats["total_hits"], stats["total_misses"]) == (3, 2)
+    cache.close()
+
+
+def test_get_or_generate_calls_the_model_once(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite")
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return "8"
+
+    for _ in range(3):
+        assert cache.get_or_generate("m", "2 + 6?", generate, params={"quality": 0.9}) == "8"
+    assert calls == [1]
+    assert cache.get(make_key("m", "2 + 6?", {"quality": 0.9})) == "8"
+    cache.close()
+
+
+def test_concurrent_get_and_put(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    # two connections to the same file, shared by several threads each
+    caches = [ResponseCache(path), ResponseCache(path)]
+    errors = []
+
+    def work(n):
+        cache = caches[n % 2]
+        try:
+            for i in range(50):
+                key = f"{n}-{i}"
+                cache.put(key, "m", key)
+                assert cache.get(key) == key
+        except Exception as exc:  # surfaced below; a failing thread would otherwise pass silently
+            errors.append(exc)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    stats = caches[0].stats()
+    assert stats["entries"] == 8 * 50
+    assert stats["total_hits"] == 8 * 50 and stats["total_misses"] == 0
+    assert stats["bytes"] == sum(len(f"{n}-{i}") for n in range(8) for i in range(50))
+    for cache in caches:
+        cache.close()
@@ -0,0 +1,27 @@
+import random
+
+import numpy as np
+
+from generate_tasks import build_tasks
+from run_models import RANDOM_SEED, dummy_model_response, dummy_model_responses
+
+
+def seed():
+    random.seed(RANDOM_SEED)
+    np.random.seed(RANDOM_SEED)
+
+
+def test_batch_matches_row_by_row_for_the_same_seed():
+    tasks = build_tasks(300)
+
+    seed()
+    batch = dummy_model_responses(tasks, 0.7)
+    seed()
+    rows = [
+        dummy_model_response(c, p, r, 0.7)
+        for c, p, r in zip(tasks["category"], tasks["prompt"], tasks["reference_answer"])
+    ]
+
+    assert batch.tolist() == rows
+    # weaker answers are in there too, not only the references
+    assert (batch != tasks["reference_answer"].astype(str).to_numpy()).any()
@@ -0,0 +1,137 @@
+import asyncio
+
+import httpx
+import pytest
+
+import schema
+from generate_tasks import build_tasks
+from run_models_async import EndpointConfig, TokenBucket, TransientError, generate_outputs_async, generate_with_retries
+from stub_model_server import StubModelHandler, start_in_background
+
+
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(**kwargs):
+        server, base_url = start_in_background(**kwargs)
+        servers.append(server)
+        return base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def endpoints(base_url):
+    return [EndpointConfig(name, 0.9, f"{base_url}/generate", rate_per_sec=1e6) for name in ["a", "b"]]
+
+
+def retry(send, max_retries):
+    async def run():
+        endpoint = EndpointConfig("a", 0.9, "http://unused", rate_per_sec=1e6)
+        async with httpx.AsyncClient() as client:
+            return await generate_with_retries(
+                client, endpoint, TokenBucket(1e6, 10), {}, max_retries=max_retries, base_delay=0, send=send
+            )
+
+    return asyncio.run(run())
+
+
+def test_retries_transient_failures():
+    calls = []
+
+    async def flaky(client, url, payload):
+        calls.append(url)
+        if len(calls) < 3:
+            raise TransientError("HTTP 503")
+        return "8"
+
+    assert retry(flaky, max_retries=5) == "8"
+    assert len(calls) == 3
+
+
+def test_raises_once_retries_are_used_up():
+    calls = []
+
+    async def down(client, url, payload):
+        calls.append(url)
+        raise TransientError("HTTP 503")
+
+    with pytest.raises(TransientError):
+        retry(down, max_retries=2)
+    assert len(calls) == 3
+
+
+def test_outputs_from_stub_server(stub_server):
+    tasks = build_tasks()
+    outputs = asyncio.run(generate_outputs_async(tasks, endpoints(stub_server())))
+
+    for df in outputs.values():
+        assert df["task_id"].astype(str).tolist() == tasks["task_id"].astype(str).tolist()
+        assert df["response"].notna().all()
+        assert df[schema.ERROR_COLUMN].isna().all()
+
+
+def test_failed_requests_are_kept_with_their_error(stub_server):
+    tasks = build_tasks()
+    outputs = asyncio.run(generate_outputs_async(tasks, endpoints(stub_server(error_rate=1.0)), max_retries=1))
+
+    for df in outputs.values():
+        assert len(df) == len(tasks)
+        assert df["response"].isna().all()
+        assert df[schema.ERROR_COLUMN].str.startswith("HTTP ").all()
+        # scoring skips them instead of counting them as wrong answers
+        assert schema.drop_failed(df).empty
+
+
+@pytest.fixture
+def bad_prompts(monkeypatch):
+    """The stub server answers HTTP 400 to the first task's prompt and a body without "response" to the second's."""
+    tasks = build_tasks()
+    rejected, malformed = tasks["prompt"].iloc[0], tasks["prompt"].iloc[1]
+    respond = StubModelHandler._respond
+    send_json = StubModelHandler._send_json
+    stream_json = StubModelHandler._stream_json
+
+    def _respond(self, request):
+        return request.get("prompt") if request.get("prompt") in (rejected, malformed) else respond(self, request)
+
+    def _send_json(self, status, payload):
+        if payload.get("response") == rejected:
+            return send_json(self, 400, {"error": "bad request"})
+        if payload.get("response") == malformed:
+            return send_json(self, status, {"model_name": payload["model_name"]})
+        return send_json(self, status, payload)
+
+    def _stream_json(self, response):
+        if response == rejected:
+            return send_json(self, 400, {"error": "bad request"})
+        return stream_json(self, response)
+
+    monkeypatch.setattr(StubModelHandler, "_respond", _respond)
+    monkeypatch.setattr(StubModelHandler, "_send_json", _send_json)
+    monkeypatch.setattr(StubModelHandler, "_stream_json", _stream_json)
+    return tasks
+
+
+def test_non_retryable_failures_are_kept_per_row(stub_server, bad_prompts):
+    tasks = bad_prompts
+    outputs = asyncio.run(generate_outputs_async(tasks, endpoints(stub_server())))
+
+    for df in outputs.values():
+        errors = df[schema.ERROR_COLUMN]
+        assert errors.iloc[0] == "HTTP 400"
+        assert errors.iloc[1].startswith("malformed response")
+        # the other rows still get their responses
+        assert errors.iloc[2:].isna().all() and df["response"].iloc[2:].notna().all()
+
+
+def test_non_retryable_failure_when_streaming(stub_server, bad_prompts):
+    tasks = bad_prompts
+    outputs = asyncio.run(generate_outputs_async(tasks, endpoints(stub_server()), stream_guard=True))
+
+    for df in outputs.values():
+        assert df[schema.ERROR_COLUMN].iloc[0] == "HTTP 400"
+        assert df[schema.ERROR_COLUMN].iloc[1:].isna().all()
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+import schema
+
+
+def test_align_keys_drops_rows_outside_categories():
+    like = schema.compact(pd.DataFrame({"task_id": ["1", "2"], "model_name": ["a", "a"]}))
+    df = pd.DataFrame({"task_id": ["2", "3", None, "1"], "score": [0.5, 0.1, 0.2, 1.0]})
+
+    aligned = schema.align_keys(df, like)
+
+    assert aligned["task_id"].dtype == like["task_id"].dtype
+    # "3" cannot match; a missing key is kept as missing
+    assert aligned["task_id"].astype(object).tolist() == ["2", np.nan, "1"]
+    assert aligned["score"].tolist() == [0.5, 0.2, 1.0]
+    assert aligned.merge(like, on="task_id")["score"].tolist() == [0.5, 1.0]
+
+
+def test_compact_dtypes():
+    df = schema.compact(pd.DataFrame({"task_id": ["007"], "response": ["8"], "is_toxic": [1], "rouge1": [0.5]}))
+    assert isinstance(df["task_id"].dtype, pd.CategoricalDtype)
+    assert df["task_id"].iloc[0] == "007"
+    assert df["response"].dtype == schema.TEXT_DTYPE
+    assert df["is_toxic"].dtype == schema.FLAG_DTYPE
+    assert df["rouge1"].dtype == schema.SCORE_DTYPE
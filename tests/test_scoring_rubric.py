@@ -0,0 +1,70 @@
+import pandas as pd
+
+from generate_tasks import build_tasks
+from run_models import MODEL_CONFIGS, generate_outputs_for_model
+from scoring_rubric import apply_rubric_incremental, stream_rubric_and_guardrails
+from semantic_similarity import fit_reference_index, index_key, reference_texts
+from storage import load_stage, save_stage
+
+
+def all_outputs(tasks):
+    return pd.concat(
+        [generate_outputs_for_model(tasks, name, quality) for name, quality in MODEL_CONFIGS], ignore_index=True
+    )
+
+
+def rescore(tasks, outputs, previous, capsys):
+    # fitted in memory, so nothing is cached under data/
+    references = reference_texts(tasks)
+    similarity = fit_reference_index(references, index_key(references))
+    capsys.readouterr()
+    scored = apply_rubric_incremental(tasks, outputs, previous, similarity=similarity)
+    return scored, capsys.readouterr().out
+
+
+def edit_reference(tasks, category):
+    tasks = tasks.copy()
+    row = tasks.index[tasks["category"] == category][0]
+    tasks["reference_answer"] = tasks["reference_answer"].astype(object)
+    tasks.loc[row, "reference_answer"] = "42" if category == "math_reasoning" else "An edited summary."
+    return tasks
+
+
+def test_reference_edit_recomputes_only_affected_rows(capsys):
+    tasks = build_tasks()
+    outputs = all_outputs(tasks)
+    first, _ = rescore(tasks, outputs, None, capsys)
+    n_models = len(MODEL_CONFIGS)
+
+    # a math reference: only that task's rows
+    edited = edit_reference(tasks, "math_reasoning")
+    _, log = rescore(edited, outputs, first, capsys)
+    assert f"reused {len(outputs) - n_models} rows, recomputed {n_models}" in log
+
+    # a summarization reference refits the similarity index: every summarization row, nothing else
+    edited = edit_reference(tasks, "summarization")
+    _, log = rescore(edited, outputs, first, capsys)
+    n_summaries = int((tasks["category"] == "summarization").sum()) * n_models
+    assert f"reused {len(outputs) - n_summaries} rows, recomputed {n_summaries}" in log
+
+
+def test_stream_writes_auto_scores(tmp_path):
+    # no free-text references, so no similarity index is fitted
+    tasks = build_tasks(200)
+    tasks = tasks[tasks["category"] != "summarization"].reset_index(drop=True)
+    outputs = all_outputs(tasks)
+    save_stage(outputs, tmp_path, "outputs", ["model_name"])
+    # a stale auto_scores stage from an earlier run
+    save_stage(outputs.head(3).assign(auto_correctness=0.0), tmp_path, "auto_scores", ["model_name"])
+
+    stream_rubric_and_guardrails(tasks, tmp_path, chunk_size=50)
+
+    keys = ["model_name", "task_id"]
+    expected = apply_rubric_incremental(tasks, load_stage(tmp_path, "outputs"), None, log=False)
+    scores = load_stage(tmp_path, "auto_scores")
+    assert len(scores) == len(outputs)
+    assert "is_toxic" not in scores.columns
+    pd.testing.assert_series_equal(
+        scores.sort_values(keys)["auto_correctness"].reset_index(drop=True),
+        expected.sort_values(keys)["auto_correctness"].reset_index(drop=True),
+    )
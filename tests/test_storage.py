@@ -0,0 +1,15 @@
+import pandas as pd
+
+from storage import read_dataset, write_dataset
+
+
+def test_rewrite_replaces_dataset(tmp_path):
+    path = tmp_path / "outputs"
+    write_dataset(pd.DataFrame({"model_name": ["a", "b"], "response": ["x", "y"]}), path, ["model_name"])
+    write_dataset(pd.DataFrame({"model_name": ["c"], "response": ["z"]}), path, ["model_name"])
+
+    df = read_dataset(path)
+    assert df["model_name"].astype(str).tolist() == ["c"]
+    assert df["response"].tolist() == ["z"]
+    # neither the staged copy nor the replaced dataset is left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["outputs"]